@@ -0,0 +1,243 @@
+"""
+Tamanho adaptativo dos lotes da carga.
+
+Um número fixo de linhas por lote não serve para todos os arquivos: um CSV de 300
+colunas estoura a memória com lotes que, em um de 3 colunas, mal cobrem o custo fixo
+de cada executemany. BatchSizer estima a memória de uma linha em Python (texto mais o
+custo dos objetos de cada campo, medidos em uma amostra de cada lote) e o tempo de
+inserção por linha, e escolhe o lote que cabe em BATCH_MEMORY_TARGET_BYTES sem passar
+de TARGET_INSERT_SECONDS por executemany. Perto do teto de RSS os lotes encolhem. O
+mesmo teto limita a amostra da inferência e o cache de páginas do modo de carga em
+massa. As decisões vão para as métricas da carga (summary).
+"""
+import os
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+# Limites e valor inicial do lote (linhas); o lote inicial é o tamanho fixo usado antes
+MIN_BATCH_ROWS = 500
+MAX_BATCH_ROWS = 100_000
+INITIAL_BATCH_ROWS = 5000
+
+# Memória alvo de um lote em Python (linhas lidas e convertidas)
+BATCH_MEMORY_TARGET_BYTES = 32 * 1024 * 1024
+
+# Memória de um campo além do texto: o str lido, o valor convertido e os ponteiros nas listas
+FIELD_OVERHEAD_BYTES = 120
+
+# Tempo alvo de um executemany: lotes maiores atrasam o progresso e o cancelamento
+TARGET_INSERT_SECONDS = 0.25
+
+# Memória alvo das linhas guardadas na amostra da inferência, e fração do teto de RSS que ela pode usar
+SAMPLE_MEMORY_TARGET_BYTES = 256 * 1024 * 1024
+SAMPLE_RSS_SHARE = 0.25
+
+# Fração do teto de RSS que o cache de páginas do SQLite pode usar no modo de carga em massa
+PAGE_CACHE_RSS_SHARE = 0.25
+
+# Teto de RSS padrão da carga (MB); a variável de ambiente INGEST_RSS_CEILING_MB troca o valor
+RSS_CEILING_MB = int(os.environ.get("INGEST_RSS_CEILING_MB", 2048))
+
+# Acima desta fração do teto os lotes encolhem pela metade a cada lote
+RSS_HIGH_WATER = 0.85
+
+# Linhas de cada lote medidas para estimar a largura das linhas
+WIDTH_SAMPLE_ROWS = 64
+
+# Peso da medida nova nas médias móveis (largura e latência)
+SMOOTHING = 0.3
+
+# Mudança mínima (fração) para trocar o tamanho do lote: evita oscilar a cada lote
+RESIZE_THRESHOLD = 0.25
+
+ADJUSTMENT_REASONS = {
+    'memoria': "memória por linha",
+    'latencia': "tempo de inserção",
+    'rss': "teto de RSS",
+}
+
+
+def worker_rss_ceiling_mb(rss_ceiling_mb: Optional[float], workers: int) -> float:
+    """Parte do teto de RSS de cada processo de um pool (o escritor fica com uma parte igual)."""
+    return (rss_ceiling_mb or RSS_CEILING_MB) / (workers + 1)
+
+
+def current_rss_mb() -> Optional[float]:
+    """RSS atual do processo (/proc/self/statm, só Linux); None onde não há."""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+class BatchSizer:
+    """
+    Tamanho dos lotes (batch_rows) de uma carga com n_columns colunas. observe_rows mede a
+    largura das linhas lidas; observe_insert, o tempo de inserção. Os dois recalculam
+    batch_rows, que é lido a cada novo lote (ingest_core.iter_row_batches).
+    """
+
+    def __init__(self, n_columns: int, rss_ceiling_mb: Optional[float] = None):
+        self.n_columns = max(1, n_columns)
+        self.rss_ceiling_mb = rss_ceiling_mb or RSS_CEILING_MB
+        self.row_bytes: Optional[float] = None
+        self.insert_seconds_per_row: Optional[float] = None
+        # Antes de ler linhas, só o custo dos campos é conhecido: começa pequeno e cresce
+        self.batch_rows = self._clamp(min(INITIAL_BATCH_ROWS,
+                                          BATCH_MEMORY_TARGET_BYTES / (self.n_columns * FIELD_OVERHEAD_BYTES)))
+        self.initial_batch_rows = self.batch_rows
+        self.min_batch_rows = self.batch_rows
+        self.max_batch_rows = self.batch_rows
+        self.batches = 0
+        self.adjustments = Counter()
+        self.inference_rows: Optional[int] = None
+        self.peak_rss_mb: Optional[float] = None
+        self.worker_summaries: List[Dict[str, Any]] = []
+
+    @staticmethod
+    def _clamp(rows: float) -> int:
+        return int(max(MIN_BATCH_ROWS, min(MAX_BATCH_ROWS, rows)))
+
+    def sample_rows(self, sample_size: int) -> int:
+        """Linhas da amostra da inferência que cabem na memória alvo (no máximo sample_size)."""
+        budget = min(SAMPLE_MEMORY_TARGET_BYTES, self.rss_ceiling_mb * SAMPLE_RSS_SHARE * 1024 * 1024)
+        self.inference_rows = int(max(MIN_BATCH_ROWS, min(sample_size, budget / (self.n_columns * FIELD_OVERHEAD_BYTES))))
+        return self.inference_rows
+
+    def page_cache_kib(self, default_kib: int) -> int:
+        """Cache de páginas do SQLite (KiB) que cabe na fração do teto de RSS reservada a ele."""
+        return int(min(default_kib, self.rss_ceiling_mb * PAGE_CACHE_RSS_SHARE * 1024))
+
+    def observe_rows(self, rows: List[List[str]]):
+        """Mede a largura de uma amostra das linhas lidas de um lote e recalcula o lote."""
+        self.batches += 1
+        sample = rows[:WIDTH_SAMPLE_ROWS]
+        if not sample:
+            return
+        text_bytes = sum(len(value) for row in sample for value in row) / len(sample)
+        row_bytes = text_bytes + self.n_columns * FIELD_OVERHEAD_BYTES
+        self.row_bytes = row_bytes if self.row_bytes is None else \
+            SMOOTHING * row_bytes + (1 - SMOOTHING) * self.row_bytes
+        self._resize()
+
+    def observe_insert(self, rows: int, seconds: float):
+        """Registra o tempo de um executemany de rows linhas e recalcula o lote."""
+        if rows <= 0:
+            return
+        per_row = seconds / rows
+        self.insert_seconds_per_row = per_row if self.insert_seconds_per_row is None else \
+            SMOOTHING * per_row + (1 - SMOOTHING) * self.insert_seconds_per_row
+        self._resize()
+
+    def _resize(self):
+        target, reason = float(MAX_BATCH_ROWS), 'memoria'
+        if self.row_bytes:
+            target = BATCH_MEMORY_TARGET_BYTES / self.row_bytes
+        if self.insert_seconds_per_row:
+            latency_rows = TARGET_INSERT_SECONDS / self.insert_seconds_per_row
+            if latency_rows < target:
+                target, reason = latency_rows, 'latencia'
+
+        rss = current_rss_mb()
+        if rss is not None:
+            self.peak_rss_mb = rss if self.peak_rss_mb is None else max(self.peak_rss_mb, rss)
+            if rss > self.rss_ceiling_mb * RSS_HIGH_WATER:
+                target, reason = min(target, self.batch_rows / 2), 'rss'
+
+        # Cresce no máximo 2x por vez: a medida do lote maior ainda não existe
+        target = self._clamp(min(target, 2 * self.batch_rows))
+        if target == self.batch_rows:
+            return
+        if reason != 'rss' and abs(target - self.batch_rows) < RESIZE_THRESHOLD * self.batch_rows:
+            return
+        self.batch_rows = target
+        self.adjustments[reason] += 1
+        self.min_batch_rows = min(self.min_batch_rows, target)
+        self.max_batch_rows = max(self.max_batch_rows, target)
+
+    def add_worker_summary(self, summary: Optional[Dict[str, Any]]):
+        """Guarda o resumo do BatchSizer de um worker (os lotes de um pool são dimensionados nos workers)."""
+        if summary:
+            self.worker_summaries.append(summary)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Decisões do controlador, para o registro de métricas. Se houve workers, os lotes
+        são os deles (combine_summaries) e o tempo de inserção, o medido aqui no escritor.
+        """
+        if self.worker_summaries:
+            combined = combine_summaries(self.worker_summaries)
+            peaks = [rss for rss in (combined['peak_rss_mb'], self.peak_rss_mb) if rss is not None]
+            return {
+                **combined,
+                'rss_ceiling_mb': self.rss_ceiling_mb,
+                'insert_us_per_row': self._insert_us_per_row(),
+                'peak_rss_mb': round(max(peaks), 1) if peaks else None,
+                'workers': len(self.worker_summaries),
+            }
+        return {
+            'rss_ceiling_mb': self.rss_ceiling_mb,
+            'initial_batch_rows': self.initial_batch_rows,
+            'final_batch_rows': self.batch_rows,
+            'min_batch_rows': self.min_batch_rows,
+            'max_batch_rows': self.max_batch_rows,
+            'batches': self.batches,
+            'adjustments': dict(self.adjustments),
+            'row_bytes': None if self.row_bytes is None else round(self.row_bytes),
+            'insert_us_per_row': self._insert_us_per_row(),
+            'inference_rows': self.inference_rows,
+            'peak_rss_mb': None if self.peak_rss_mb is None else round(self.peak_rss_mb, 1),
+        }
+
+    def _insert_us_per_row(self) -> Optional[float]:
+        return None if self.insert_seconds_per_row is None else round(self.insert_seconds_per_row * 1e6, 2)
+
+
+def combine_summaries(summaries: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Junta os resumos de vários controladores (ex.: um por worker) em um só."""
+    summaries = [summary for summary in summaries if summary]
+    if not summaries:
+        return None
+    adjustments = Counter()
+    for summary in summaries:
+        adjustments.update(summary['adjustments'])
+    known = lambda key: [summary[key] for summary in summaries if summary[key] is not None]
+    return {
+        'rss_ceiling_mb': summaries[0]['rss_ceiling_mb'],
+        'initial_batch_rows': min(summary['initial_batch_rows'] for summary in summaries),
+        'final_batch_rows': min(summary['final_batch_rows'] for summary in summaries),
+        'min_batch_rows': min(summary['min_batch_rows'] for summary in summaries),
+        'max_batch_rows': max(summary['max_batch_rows'] for summary in summaries),
+        'batches': sum(summary['batches'] for summary in summaries),
+        'adjustments': dict(adjustments),
+        'row_bytes': max(known('row_bytes'), default=None),
+        'insert_us_per_row': max(known('insert_us_per_row'), default=None),
+        'inference_rows': min(known('inference_rows'), default=None),
+        'peak_rss_mb': max(known('peak_rss_mb'), default=None),
+    }
+
+
+def format_batch_sizing(summary: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Descreve as decisões do controlador de lotes registradas nas métricas."""
+    if not summary or not summary['batches']:
+        return None
+    if summary['min_batch_rows'] == summary['max_batch_rows']:
+        parts = [f"{summary['batches']} lote(s) de {summary['min_batch_rows']:,} linhas"]
+    else:
+        parts = [f"lotes de {summary['min_batch_rows']:,} a {summary['max_batch_rows']:,} linhas "
+                 f"(último: {summary['final_batch_rows']:,}) em {summary['batches']} lote(s)"]
+    if summary['row_bytes'] is not None:
+        parts.append(f"~{summary['row_bytes']:,} bytes por linha em memória")
+    if summary['insert_us_per_row'] is not None:
+        parts.append(f"{summary['insert_us_per_row']:.1f} µs de inserção por linha")
+    if summary['adjustments']:
+        parts.append("ajustes: " + ", ".join(f"{count} por {ADJUSTMENT_REASONS[reason]}"
+                                             for reason, count in summary['adjustments'].items()))
+    if summary['inference_rows'] is not None:
+        parts.append(f"amostra da inferência de até {summary['inference_rows']:,} linhas")
+    if summary.get('workers'):
+        parts.append(f"dimensionados em {summary['workers']} worker(s), com o teto dividido entre os processos")
+    rss = f"; pico de RSS medido {summary['peak_rss_mb']:.0f} MB" if summary['peak_rss_mb'] is not None else ""
+    return "Lotes adaptativos: " + "; ".join(parts) + f". Teto de RSS {summary['rss_ceiling_mb']:g} MB{rss}."
@@ -0,0 +1,323 @@
+"""
+Benchmark reproduzível da ingestão, sem a interface do Streamlit.
+
+Gera CSVs sintéticos determinísticos (número de linhas e colunas, proporção de
+colunas numéricas, densidade de tokens nulos, quebras de linha entre aspas, CSV
+solto, em ZIP ou compactado em gz/bz2/xz/tar.gz), carrega cada cenário com ingest_pipeline em um banco novo e
+reporta vazão, pico de memória e tempo por etapa. Cada execução roda em um
+processo próprio, para o pico de RSS ser só daquela carga.
+
+Uso:
+    python benchmark_ingest.py --save-baseline benchmark_baseline.json
+    python benchmark_ingest.py --baseline benchmark_baseline.json --threshold 0.15
+
+Com --baseline, o código de saída é 1 se algum cenário perder mais que threshold
+de vazão ou ganhar mais que threshold de pico de memória.
+"""
+import argparse
+import bz2
+import csv
+import gzip
+import hashlib
+import json
+import lzma
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import zipfile
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, List
+
+from type_inference import FALSE_TOKENS, NULL_TOKENS, TRUE_TOKENS
+
+# Cenários do benchmark. rows é multiplicado por --scale; files > 1 gera um ZIP com
+# vários CSVs (carregados por process_zip_workflow).
+SCENARIOS = {
+    'numerico': {'rows': 200000, 'columns': 8, 'numeric_ratio': 1.0},
+    'misto': {'rows': 200000, 'columns': 12, 'numeric_ratio': 0.5, 'null_density': 0.05},
+    'largo': {'rows': 40000, 'columns': 60, 'numeric_ratio': 0.5, 'null_density': 0.05},
+    'nulos': {'rows': 200000, 'columns': 8, 'numeric_ratio': 0.75, 'null_density': 0.3},
+    'aspas': {'rows': 100000, 'columns': 8, 'numeric_ratio': 0.5, 'quoted_newlines': 0.05},
+    'zip': {'rows': 200000, 'columns': 12, 'numeric_ratio': 0.5, 'null_density': 0.05, 'packaging': 'zip'},
+    'zip_varios': {'rows': 200000, 'columns': 12, 'numeric_ratio': 0.5, 'packaging': 'zip', 'files': 4},
+    'paralelo': {'rows': 200000, 'columns': 12, 'numeric_ratio': 0.5, 'null_density': 0.05, 'parallel': True},
+    'gz': {'rows': 200000, 'columns': 12, 'numeric_ratio': 0.5, 'null_density': 0.05, 'packaging': 'gz'},
+    'bz2': {'rows': 200000, 'columns': 12, 'numeric_ratio': 0.5, 'null_density': 0.05, 'packaging': 'bz2'},
+    'xz': {'rows': 200000, 'columns': 12, 'numeric_ratio': 0.5, 'null_density': 0.05, 'packaging': 'xz'},
+    'tar_gz': {'rows': 200000, 'columns': 12, 'numeric_ratio': 0.5, 'null_density': 0.05, 'packaging': 'tar.gz'},
+}
+
+# Compactação de cada empacotamento de um único CSV (zip e tar.gz à parte)
+STREAM_COMPRESSORS = {'gz': gzip.open, 'bz2': bz2.open, 'xz': lzma.open}
+SCENARIO_DEFAULTS = {
+    'rows': 100000, 'columns': 8, 'numeric_ratio': 0.5, 'null_density': 0.0, 'quoted_newlines': 0.0,
+    'packaging': 'csv', 'files': 1, 'parallel': False, 'seed': 42,
+}
+
+# Tipos das colunas não numéricas, em rodízio
+OTHER_COLUMN_KINDS = ('text', 'date', 'boolean')
+
+DEFAULT_REPEATS = 3
+DEFAULT_THRESHOLD = 0.15
+
+# ----------------------------------------------------------------------
+# GERADOR DE DADOS
+# ----------------------------------------------------------------------
+
+def column_kinds(n_columns: int, numeric_ratio: float) -> List[str]:
+    """Tipo de cada coluna: as numéricas (integer/real alternados) primeiro."""
+    n_numeric = round(n_columns * numeric_ratio)
+    numeric = ['integer' if i % 2 == 0 else 'real' for i in range(n_numeric)]
+    others = [OTHER_COLUMN_KINDS[i % len(OTHER_COLUMN_KINDS)] for i in range(n_columns - n_numeric)]
+    return numeric + others
+
+
+def generate_value(rng: random.Random, kind: str, row_index: int, null_density: float,
+                   quoted_newlines: float) -> str:
+    if null_density and rng.random() < null_density:
+        return rng.choice(('',) + NULL_TOKENS)
+    if kind == 'integer':
+        return str(rng.randint(-1000000, 1000000))
+    if kind == 'real':
+        return f"{rng.uniform(-10000, 10000):.4f}"
+    if kind == 'date':
+        return (date(2000, 1, 1) + timedelta(days=rng.randrange(10000))).isoformat()
+    if kind == 'boolean':
+        return rng.choice(TRUE_TOKENS[:1] + FALSE_TOKENS[:1])
+    text = f"item {row_index} {rng.choice(('alfa', 'beta', 'gama', 'delta'))}, lote {rng.randrange(1000)}"
+    if quoted_newlines and rng.random() < quoted_newlines:
+        # Campo com quebra de linha e aspas: sai entre aspas pelo csv.writer
+        text += '\n"observação" em outra linha'
+    return text
+
+
+def write_csv(path: Path, spec: Dict[str, Any], rows: int, seed: int):
+    """Escreve um CSV determinístico (mesmo spec e seed, mesmo conteúdo)."""
+    rng = random.Random(seed)
+    kinds = column_kinds(spec['columns'], spec['numeric_ratio'])
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow([f"{kind}_{i}" for i, kind in enumerate(kinds)])
+        for row_index in range(rows):
+            writer.writerow([
+                generate_value(rng, kind, row_index, spec['null_density'], spec['quoted_newlines'])
+                for kind in kinds
+            ])
+
+
+def generate_scenario(work_dir: Path, name: str, spec: Dict[str, Any]) -> Path:
+    """Gera (uma vez por spec) o arquivo de entrada do cenário e retorna o caminho."""
+    suffix = '.csv' if spec['packaging'] == 'csv' else f".csv.{spec['packaging']}"
+    if spec['packaging'] in ('zip', 'tar.gz'):
+        suffix = f".{spec['packaging']}"
+    spec_hash = hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:8]
+    path = work_dir / f"{name}_{spec_hash}{suffix}"
+    if path.exists():
+        return path
+
+    if spec['packaging'] == 'csv':
+        write_csv(path, spec, spec['rows'], spec['seed'])
+        return path
+
+    tmp_path = path.with_suffix('.tmp')
+    if spec['packaging'] != 'zip':
+        member_path = work_dir / f"{name}.csv"
+        write_csv(member_path, spec, spec['rows'], spec['seed'])
+        if spec['packaging'] == 'tar.gz':
+            with tarfile.open(tmp_path, 'w:gz') as tar:
+                tar.add(member_path, f"{name}.csv")
+        else:
+            with open(member_path, 'rb') as src, STREAM_COMPRESSORS[spec['packaging']](tmp_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+        member_path.unlink()
+        tmp_path.rename(path)
+        return path
+
+    with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as z:
+        rows_per_file = spec['rows'] // spec['files']
+        for i in range(spec['files']):
+            member_path = work_dir / f"{name}_{i}.csv"
+            write_csv(member_path, spec, rows_per_file, spec['seed'] + i)
+            z.write(member_path, f"{name}_{i}.csv")
+            member_path.unlink()
+    tmp_path.rename(path)
+    return path
+
+# ----------------------------------------------------------------------
+# EXECUÇÃO
+# ----------------------------------------------------------------------
+
+def run_once(input_path: Path, spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Uma carga do cenário em um banco novo (roda no processo filho)."""
+    from ingest_core import UploadSource
+    from ingest_jobs import IngestReporter
+    from ingest_pipeline import ingest_source
+
+    class BenchmarkReporter(IngestReporter):
+        def __init__(self):
+            self.record = None
+            self.errors = []
+
+        def error(self, message: str):
+            self.errors.append(message)
+
+        def metrics(self, record: Dict):
+            self.record = record
+
+    run_dir = Path(tempfile.mkdtemp(prefix="bench_", dir=input_path.parent))
+    try:
+        conn = sqlite3.connect(run_dir / "bench.sqlite")
+        # O conteúdo fica em memória, como o buffer de um upload
+        source = UploadSource(input_path.name, input_path.read_bytes(), run_dir)
+        report = BenchmarkReporter()
+        ingest_source(conn, source, "bench", parallel=spec['parallel'], report=report, metrics_file=None)
+        conn.close()
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+    if report.errors or report.record is None:
+        raise RuntimeError("; ".join(report.errors) or "a carga não gerou métricas")
+    return report.record
+
+
+def run_in_subprocess(input_path: Path, spec: Dict[str, Any]) -> Dict[str, Any]:
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--run-one', str(input_path), json.dumps(spec)],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "falha na carga")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def summarize(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Mediana das execuções de um cenário."""
+    median = lambda key: statistics.median(record[key] for record in records)
+    return {
+        'runs': len(records),
+        'rows': records[0]['rows_inserted'],
+        'bytes': records[0]['bytes_read'],
+        'load_seconds': round(median('load_seconds'), 3),
+        'rows_per_second': round(median('rows_per_second'), 1),
+        'mb_per_second': round(median('bytes_per_second') / (1024 * 1024), 2),
+        'peak_rss_mb': median('peak_rss_mb') if records[0]['peak_rss_mb'] is not None else None,
+        'stage_seconds': {
+            stage: round(statistics.median(record['stage_seconds'][stage] for record in records), 3)
+            for stage in records[0]['stage_seconds']
+        },
+        'rejected_rows': records[0]['rejected_rows'],
+        'decompress_mb_per_second': (median('decompress_mb_per_second')
+                                     if records[0].get('decompress_mb_per_second') is not None else None),
+        'batch_sizing': records[-1].get('batch_sizing'),
+    }
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Mensagens de regressão em relação ao baseline (lista vazia se não houver)."""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline['scenarios'].get(name)
+        if reference is None:
+            continue
+        change = result['rows_per_second'] / reference['rows_per_second'] - 1
+        print(f"  {name}: vazão {change:+.1%} em relação ao baseline", end="")
+        if change < -threshold:
+            regressions.append(f"{name}: vazão caiu {-change:.1%} (limite {threshold:.0%})")
+        if result['peak_rss_mb'] and reference.get('peak_rss_mb'):
+            rss_change = result['peak_rss_mb'] / reference['peak_rss_mb'] - 1
+            print(f", pico de RSS {rss_change:+.1%}", end="")
+            if rss_change > threshold:
+                regressions.append(f"{name}: pico de RSS subiu {rss_change:.1%} (limite {threshold:.0%})")
+        print()
+    return regressions
+
+
+def environment() -> Dict[str, Any]:
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'sqlite': sqlite3.sqlite_version,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark da ingestão de CSV/ZIP no SQLite.")
+    parser.add_argument('--scenarios', default=",".join(SCENARIOS),
+                        help="cenários separados por vírgula (padrão: todos)")
+    parser.add_argument('--scale', type=float, default=1.0, help="multiplica o número de linhas dos cenários")
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS, help="execuções por cenário (usa a mediana)")
+    parser.add_argument('--work-dir', default=None, help="pasta dos arquivos gerados (reaproveitados entre execuções)")
+    parser.add_argument('--output', help="grava os resultados em JSON")
+    parser.add_argument('--save-baseline', help="grava os resultados como baseline")
+    parser.add_argument('--baseline', help="compara com o baseline e falha em caso de regressão")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="perda de vazão / ganho de memória tolerado (fração, padrão 0.15)")
+    parser.add_argument('--run-one', nargs=2, metavar=('ARQUIVO', 'SPEC'), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_one:
+        print(json.dumps(run_once(Path(args.run_one[0]), json.loads(args.run_one[1]))))
+        return 0
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"cenários desconhecidos: {', '.join(unknown)}")
+
+    work_dir = Path(args.work_dir or Path(tempfile.gettempdir()) / "csv_services_benchmark")
+    work_dir.mkdir(parents=True, exist_ok=True)
+
+    results = {}
+    for name in names:
+        spec = {**SCENARIO_DEFAULTS, **SCENARIOS[name]}
+        spec['rows'] = max(1, int(spec['rows'] * args.scale))
+        input_path = generate_scenario(work_dir, name, spec)
+        records = [run_in_subprocess(input_path, spec) for _ in range(args.repeats)]
+        results[name] = {'spec': spec, **summarize(records)}
+        result = results[name]
+        slowest = max(result['stage_seconds'], key=result['stage_seconds'].get)
+        print(
+            f"{name}: {result['rows']} linhas, {result['rows_per_second']:,.0f} linhas/s, "
+            f"{result['mb_per_second']:.1f} MB/s, pico de RSS {result['peak_rss_mb']} MB, "
+            f"etapa mais lenta: {slowest} ({result['stage_seconds'][slowest]:.2f}s)"
+            + (f", descompressão {result['decompress_mb_per_second']:.1f} MB/s"
+               if result['decompress_mb_per_second'] is not None else "")
+            + (f", lotes de até {result['batch_sizing']['max_batch_rows']:,} linhas"
+               if result['batch_sizing'] else "")
+        )
+
+    report = {'environment': environment(), 'scale': args.scale, 'scenarios': results}
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('scale') != args.scale:
+            print(f"Aviso: baseline gerado com --scale {baseline.get('scale')}; a comparação pode não valer.")
+        if baseline['environment'].get('cpu_count') != os.cpu_count():
+            print("Aviso: baseline gerado em uma máquina com outro número de CPUs.")
+        print("Comparação com o baseline:")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("REGRESSÕES:")
+            for message in regressions:
+                print(f"  {message}")
+            return 1
+        print("Sem regressões acima do limite.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Preparação dos dados do gráfico automático da página de análise.
+
+O gráfico nunca recebe mais que CHART_MAX_POINTS pontos, qualquer que seja o tamanho do
+resultado. Quando dá, a agregação roda no próprio SQLite sobre a consulta inteira
+(aggregation_sql), inclusive as linhas que não foram lidas por causa do limite de
+linhas. Há dois casos:
+- barras (duas colunas numéricas): GROUP BY em faixas de x, com a soma de y (a mesma
+  altura que as barras empilhadas do resultado teriam);
+- linha (uma coluna numérica): mínimo e máximo de y em faixas de linhas (min-max).
+Se a agregação no SQLite não for possível (comando que não é SELECT, consulta abortada),
+downsample reduz o resultado em memória: as barras com as mesmas faixas, a linha com
+LTTB (Largest-Triangle-Three-Buckets), que mantém a forma da série.
+"""
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# Máximo de pontos (barras ou pontos da linha) enviados ao navegador
+CHART_MAX_POINTS = 2000
+
+
+def chart_spec(df: pd.DataFrame) -> Optional[Dict[str, str]]:
+    """Gráfico do resultado: barras de y por x (duas primeiras colunas numéricas), linha de y (uma) ou None."""
+    num_cols = df.select_dtypes(include='number').columns.tolist()
+    if len(num_cols) >= 2:
+        return {'kind': 'bar', 'x': num_cols[0], 'y': num_cols[1]}
+    if len(num_cols) == 1:
+        return {'kind': 'line', 'x': None, 'y': num_cols[0]}
+    return None
+
+
+def needs_reduction(df: pd.DataFrame, truncated: bool, max_points: int = CHART_MAX_POINTS) -> bool:
+    return truncated or len(df) > max_points
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def aggregation_sql(sql: str, spec: Dict[str, str], max_points: int = CHART_MAX_POINTS) -> str:
+    """SQL que agrega o resultado de sql (inteiro) em até max_points pontos, no formato de finish_aggregated."""
+    base = sql.strip().rstrip(';')
+    # Colunas qualificadas: nomes do resultado iguais aos apelidos (x, lo, linha...) não se confundem
+    y = f"resultado.{_quote(spec['y'])}"
+    if spec['kind'] == 'bar':
+        x = f"resultado.{_quote(spec['x'])}"
+        return (
+            f"WITH resultado AS ({base}),\n"
+            f"limites AS (SELECT MIN({x}) AS lo, MAX({x}) AS hi FROM resultado)\n"
+            f"SELECT MIN({x}) AS x, SUM({y}) AS y, COUNT(*) AS linhas\n"
+            f"FROM resultado, limites WHERE {x} IS NOT NULL\n"
+            f"GROUP BY CAST(({x} - limites.lo) * 1.0 * {max_points - 1} / (limites.hi - limites.lo) AS INTEGER)\n"
+            f"ORDER BY 1"
+        )
+    return (
+        f"WITH resultado AS ({base}),\n"
+        f"numerado AS (SELECT ROW_NUMBER() OVER () AS linha, COUNT(*) OVER () AS total, {y} AS y FROM resultado)\n"
+        f"SELECT MIN(numerado.linha) - 1 AS linha, MIN(numerado.y) AS y_min, MAX(numerado.y) AS y_max, "
+        f"COUNT(*) AS linhas\n"
+        f"FROM numerado GROUP BY (numerado.linha - 1) * {max_points // 2} / numerado.total\n"
+        f"ORDER BY 1"
+    )
+
+
+def finish_aggregated(aggregated: pd.DataFrame, spec: Dict[str, str]) -> pd.DataFrame:
+    """Resultado de aggregation_sql com os nomes de colunas do resultado original."""
+    if spec['kind'] == 'bar':
+        return aggregated[['x', 'y']].rename(columns={'x': spec['x'], 'y': spec['y']})
+    return (aggregated.set_index('linha')[['y_min', 'y_max']]
+            .rename(columns={'y_min': f"{spec['y']} (mín)", 'y_max': f"{spec['y']} (máx)"}))
+
+
+def downsample(df: pd.DataFrame, spec: Dict[str, str], max_points: int = CHART_MAX_POINTS) -> pd.DataFrame:
+    """Reduz em memória o resultado a até max_points pontos (faixas de x para barras, LTTB para a linha)."""
+    if spec['kind'] == 'bar':
+        data = df[[spec['x'], spec['y']]].dropna(subset=[spec['x']])
+        x = data[spec['x']].astype(float)
+        lo, hi = x.min(), x.max()
+        buckets = ((x - lo) * (max_points - 1) / (hi - lo)).astype(int) if hi > lo else pd.Series(0, index=x.index)
+        return data.groupby(buckets.values).agg({spec['x']: 'min', spec['y']: 'sum'}).reset_index(drop=True)
+
+    series = df[spec['y']].dropna().astype(float)
+    keep = lttb_indices(np.arange(len(series), dtype=float), series.to_numpy(), max_points)
+    return series.iloc[keep].to_frame()
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Posições dos pontos escolhidos pelo LTTB: o primeiro, o último e, em cada uma das
+    n_out - 2 faixas entre eles, o ponto que forma o maior triângulo com o ponto
+    escolhido na faixa anterior e a média da faixa seguinte.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    chosen = np.empty(n_out, dtype=int)
+    chosen[0], chosen[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        bucket_x, bucket_y = x[start:end], y[start:end]
+        area = np.abs((x[a] - avg_x) * (bucket_y - y[a]) - (x[a] - bucket_x) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        chosen[i + 1] = a
+    return chosen
@@ -0,0 +1,379 @@
+"""
+Catálogo de estatísticas das colunas, calculado durante a carga.
+
+TableProfile acompanha cada lote convertido (ingest_core.convert_batch) e acumula, por
+coluna: linhas, nulos, mín/máx e média (colunas numéricas), mín/máx e tamanho dos
+textos, número de valores distintos (estimado por HyperLogLog) e os valores mais
+frequentes (contadores limitados, top-k aproximado). O estado é combinável: os
+workers dos pools mandam o perfil parcial ao escritor (merge) e uma carga que só
+acrescenta linhas soma o seu perfil ao que já está no catálogo.
+
+O catálogo fica na tabela interna _column_stats do banco, gravada na mesma transação
+da carga; a página de análise lê o esquema e as estatísticas dela sem varrer a tabela.
+"""
+import base64
+import json
+import sqlite3
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+STATS_TABLE = "_column_stats"
+
+# HyperLogLog com 2^12 registradores: erro típico de ~1,6% na contagem de distintos
+HLL_PRECISION = 12
+
+# Valores mais frequentes mostrados por coluna e contadores mantidos para estimá-los
+TOP_K = 10
+TOP_K_CAPACITY = 200
+
+NUMERIC_TYPES = ('INTEGER', 'REAL', 'BOOLEAN')
+
+# Linhas lidas por vez ao recalcular o perfil de uma coluna a partir da tabela
+PROFILE_SCAN_ROWS = 50_000
+
+
+class HyperLogLog:
+    """Estimador de cardinalidade sobre hashes de 64 bits (atualização vetorizada)."""
+
+    def __init__(self, precision: int = HLL_PRECISION, registers: Optional[np.ndarray] = None):
+        self.precision = precision
+        self.registers = registers if registers is not None else np.zeros(1 << precision, dtype=np.uint8)
+
+    def add_hashes(self, hashes: np.ndarray):
+        if not len(hashes):
+            return
+        hashes = hashes.astype(np.uint64, copy=False)
+        rest_bits = 64 - self.precision
+        index = (hashes >> np.uint64(rest_bits)).astype(np.int64)
+        rest = hashes & np.uint64((1 << rest_bits) - 1)
+        # Posição do primeiro bit 1 nos bits restantes = rest_bits - bit_length(rest) + 1. O expoente
+        # do frexp é o bit_length, exato porque os bits restantes cabem na mantissa do float64
+        _, bit_length = np.frexp(rest.astype(np.float64))
+        rank = (rest_bits - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: "HyperLogLog"):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # Correção para cardinalidades pequenas (contagem linear)
+            return int(round(m * np.log(m / zeros)))
+        return int(round(raw))
+
+    def to_state(self) -> str:
+        return base64.b64encode(self.registers.tobytes()).decode('ascii')
+
+    @classmethod
+    def from_state(cls, state: str, precision: int = HLL_PRECISION) -> "HyperLogLog":
+        return cls(precision, np.frombuffer(base64.b64decode(state), dtype=np.uint8).copy())
+
+
+class ColumnProfile:
+    """Estatísticas combináveis de uma coluna."""
+
+    def __init__(self):
+        self.rows = 0
+        self.nulls = 0
+        self.num_count = 0
+        self.num_sum = 0.0
+        self.num_min: Optional[float] = None
+        self.num_max: Optional[float] = None
+        self.text_min: Optional[str] = None
+        self.text_max: Optional[str] = None
+        self.len_min: Optional[int] = None
+        self.len_max: Optional[int] = None
+        self.hll = HyperLogLog()
+        self.top = Counter()
+
+    def update(self, values: np.ndarray, sql_type: str):
+        """Acumula uma coluna convertida de um lote (None nos nulos)."""
+        self.rows += len(values)
+        # Tudo a partir dos valores únicos do lote (e das contagens deles)
+        if sql_type in NUMERIC_TYPES:
+            # astype converte None em NaN: a máscara de nulos sai do próprio float64
+            numbers = values.astype(np.float64)
+            null_mask = np.isnan(numbers)
+            nulls = int(null_mask.sum())
+            self.nulls += nulls
+            if nulls == len(values):
+                return
+            if nulls:
+                numbers = numbers[~null_mask]
+            uniques, counts = np.unique(numbers, return_counts=True)
+            self.num_count += len(numbers)
+            self.num_sum += float(numbers.sum())
+            self.num_min = _min(self.num_min, float(uniques[0]))
+            self.num_max = _max(self.num_max, float(uniques[-1]))
+        else:
+            # Texto (e datas ISO) já chega como str
+            null_mask = np.equal(values, None)
+            present = values[~null_mask]
+            self.nulls += len(values) - len(present)
+            if not len(present):
+                return
+            codes, uniques = pd.factorize(present)
+            counts = np.bincount(codes)
+            lengths = np.fromiter(map(len, uniques), dtype=np.int64, count=len(uniques))
+            self.text_min = _min(self.text_min, min(uniques))
+            self.text_max = _max(self.text_max, max(uniques))
+            self.len_min = _min(self.len_min, int(lengths.min()))
+            self.len_max = _max(self.len_max, int(lengths.max()))
+        self.hll.add_hashes(_hash_values(uniques))
+
+        if len(uniques) > TOP_K_CAPACITY and len(self.top) >= TOP_K_CAPACITY:
+            # Com os contadores cheios, valores que aparecem uma vez no lote não deslocam nenhum
+            # (colunas quase únicas, como identificadores, param aqui)
+            repeated = counts > 1
+            if not repeated.any():
+                return
+            uniques, counts = uniques[repeated], counts[repeated]
+        if len(uniques) > TOP_K_CAPACITY:
+            keep = np.argpartition(counts, -TOP_K_CAPACITY)[-TOP_K_CAPACITY:]
+            uniques, counts = uniques[keep], counts[keep]
+        self.top.update(dict(zip(uniques.tolist(), counts.tolist())))
+        # Corte só a cada dobro da capacidade: ordenar o contador a cada lote custa caro
+        self._trim_top(2 * TOP_K_CAPACITY)
+
+    def _trim_top(self, limit: int = TOP_K_CAPACITY):
+        if len(self.top) > limit:
+            self.top = Counter(dict(self.top.most_common(TOP_K_CAPACITY)))
+
+    def merge(self, other: "ColumnProfile"):
+        self.rows += other.rows
+        self.nulls += other.nulls
+        self.num_count += other.num_count
+        self.num_sum += other.num_sum
+        self.num_min = _min(self.num_min, other.num_min)
+        self.num_max = _max(self.num_max, other.num_max)
+        self.text_min = _min(self.text_min, other.text_min)
+        self.text_max = _max(self.text_max, other.text_max)
+        self.len_min = _min(self.len_min, other.len_min)
+        self.len_max = _max(self.len_max, other.len_max)
+        self.hll.merge(other.hll)
+        self.top.update(other.top)
+        self._trim_top()
+
+    def to_state(self) -> Dict[str, Any]:
+        self._trim_top()
+        return {
+            'rows': self.rows, 'nulls': self.nulls, 'num_count': self.num_count, 'num_sum': self.num_sum,
+            'num_min': self.num_min, 'num_max': self.num_max, 'text_min': self.text_min,
+            'text_max': self.text_max, 'len_min': self.len_min, 'len_max': self.len_max,
+            'hll': self.hll.to_state(), 'top': [[value, count] for value, count in self.top.items()],
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "ColumnProfile":
+        profile = cls()
+        for name in ('rows', 'nulls', 'num_count', 'num_sum', 'num_min', 'num_max',
+                     'text_min', 'text_max', 'len_min', 'len_max'):
+            setattr(profile, name, state[name])
+        profile.hll = HyperLogLog.from_state(state['hll'])
+        profile.top = Counter({value: count for value, count in state['top']})
+        return profile
+
+    def is_mixed(self, sql_type: str) -> bool:
+        """
+        Perfil com valores numéricos numa coluna que terminou como texto: uma coluna
+        promovida para TEXT no meio da carga tem parte das linhas só nos acumuladores
+        numéricos, e mín/máx, tamanhos e top-k de texto não as incluem.
+        """
+        return sql_type not in NUMERIC_TYPES and self.num_count > 0
+
+    def summary(self, sql_type: str) -> Dict[str, Any]:
+        """Valores do catálogo para o tipo final da coluna."""
+        numeric = sql_type in NUMERIC_TYPES and self.num_count > 0
+        return {
+            'row_count': self.rows,
+            'null_count': self.nulls,
+            'min_value': _display(self.num_min) if numeric else self.text_min,
+            'max_value': _display(self.num_max) if numeric else self.text_max,
+            'mean': self.num_sum / self.num_count if numeric else None,
+            'distinct_estimate': min(self.hll.estimate(), self.rows - self.nulls),
+            'top_values': [[_display(value), count] for value, count in self.top.most_common(TOP_K)],
+            'min_length': self.len_min,
+            'max_length': self.len_max,
+        }
+
+
+class TableProfile:
+    """Perfis das colunas de uma tabela (na ordem das colunas)."""
+
+    def __init__(self, n_columns: int):
+        self.columns = [ColumnProfile() for _ in range(n_columns)]
+
+    def update_columns(self, converted_columns: List[np.ndarray], column_types: List[Dict]):
+        for profile, values, column_type in zip(self.columns, converted_columns, column_types):
+            profile.update(values, column_type['type'])
+
+    def merge(self, state: Optional[List[Dict[str, Any]]]):
+        """Soma um perfil parcial (resultado de to_state, ex.: de um worker)."""
+        if not state:
+            return
+        for profile, column_state in zip(self.columns, state):
+            profile.merge(ColumnProfile.from_state(column_state))
+
+    def to_state(self) -> List[Dict[str, Any]]:
+        return [profile.to_state() for profile in self.columns]
+
+    @classmethod
+    def from_state(cls, state: List[Dict[str, Any]]) -> "TableProfile":
+        profile = cls(0)
+        profile.columns = [ColumnProfile.from_state(column_state) for column_state in state]
+        return profile
+
+
+def _hash_values(uniques: np.ndarray) -> np.ndarray:
+    """Hashes de 64 bits dos valores (números pelo padrão de bits do float64, textos pelo pandas)."""
+    if uniques.dtype == np.float64:
+        # Finalizador do splitmix64; + 0.0 junta -0.0 e 0.0
+        x = (uniques + 0.0).view(np.uint64)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+    # Os valores já são únicos: categorize=False evita fatorá-los de novo
+    return pd.util.hash_array(uniques, categorize=False)
+
+
+def _min(a, b):
+    return b if a is None else a if b is None else min(a, b)
+
+
+def _max(a, b):
+    return b if a is None else a if b is None else max(a, b)
+
+
+def _display(value):
+    """Números inteiros sem o '.0' do float."""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+# ----------------------------------------------------------------------
+# CATÁLOGO NO BANCO
+# ----------------------------------------------------------------------
+
+def _ensure_stats_table(cursor: sqlite3.Cursor):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {STATS_TABLE} (
+            table_name TEXT NOT NULL COLLATE NOCASE,
+            column_name TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            column_type TEXT,
+            row_count INTEGER,
+            null_count INTEGER,
+            min_value,
+            max_value,
+            mean REAL,
+            distinct_estimate INTEGER,
+            top_values TEXT,
+            min_length INTEGER,
+            max_length INTEGER,
+            state TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY (table_name, column_name)
+        )
+    """)
+
+
+def _stored_states(cursor: sqlite3.Cursor, table_name: str) -> Dict[str, Dict[str, Any]]:
+    _ensure_stats_table(cursor)
+    cursor.execute(f"SELECT column_name, state FROM {STATS_TABLE} WHERE table_name = ?", (table_name,))
+    return {column: json.loads(state) for column, state in cursor.fetchall()}
+
+
+def profile_table_column(cursor: sqlite3.Cursor, table_name: str, column: str, sql_type: str) -> ColumnProfile:
+    """Perfil de uma coluna calculado lendo a tabela (em blocos de PROFILE_SCAN_ROWS linhas)."""
+    profile = ColumnProfile()
+    cursor.execute(f"SELECT \"{column}\" FROM \"{table_name}\"")
+    while True:
+        rows = cursor.fetchmany(PROFILE_SCAN_ROWS)
+        if not rows:
+            return profile
+        profile.update(np.fromiter((row[0] for row in rows), dtype=object, count=len(rows)), sql_type)
+
+
+def save_table_profile(cursor: sqlite3.Cursor, table_name: str, columns: List[str], column_types: List[Dict],
+                       profile: TableProfile, table_is_new: bool):
+    """
+    Grava o perfil no catálogo (na transação da carga). Numa tabela nova o catálogo é
+    substituído; numa tabela existente o perfil é somado ao guardado. Uma tabela
+    existente sem catálogo (carregada antes dele) fica sem estatísticas, já que o
+    perfil cobriria só as linhas novas. Colunas promovidas para TEXT no meio da carga
+    (ColumnProfile.is_mixed) têm o perfil recalculado a partir da tabela.
+    """
+    stored = {} if table_is_new else _stored_states(cursor, table_name)
+    if not table_is_new and set(stored) != set(columns):
+        cursor.execute(f"DELETE FROM {STATS_TABLE} WHERE table_name = ?", (table_name,))
+        return
+
+    _ensure_stats_table(cursor)
+    cursor.execute(f"DELETE FROM {STATS_TABLE} WHERE table_name = ?", (table_name,))
+    now = datetime.now().isoformat(timespec='seconds')
+    for position, (column, column_type, column_profile) in enumerate(zip(columns, column_types, profile.columns)):
+        if column in stored:
+            merged = ColumnProfile.from_state(stored[column])
+            merged.merge(column_profile)
+            column_profile = merged
+        if column_profile.is_mixed(column_type['type']):
+            column_profile = profile_table_column(cursor, table_name, column, column_type['type'])
+        summary = column_profile.summary(column_type['type'])
+        cursor.execute(
+            f"INSERT INTO {STATS_TABLE} (table_name, column_name, position, column_type, row_count, null_count, "
+            f"min_value, max_value, mean, distinct_estimate, top_values, min_length, max_length, state, updated_at) "
+            f"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (table_name, column, position, column_type['type'], summary['row_count'], summary['null_count'],
+             summary['min_value'], summary['max_value'], summary['mean'], summary['distinct_estimate'],
+             json.dumps(summary['top_values'], ensure_ascii=False), summary['min_length'], summary['max_length'],
+             json.dumps(column_profile.to_state()), now),
+        )
+
+
+def get_table_profile(cursor: sqlite3.Cursor, table_name: str) -> List[Dict[str, Any]]:
+    """Estatísticas das colunas da tabela, na ordem das colunas ([] se não houver catálogo)."""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (STATS_TABLE,))
+    if cursor.fetchone() is None:
+        return []
+    cursor.execute(
+        f"SELECT column_name, column_type, row_count, null_count, min_value, max_value, mean, distinct_estimate, "
+        f"top_values, min_length, max_length, updated_at FROM {STATS_TABLE} WHERE table_name = ? ORDER BY position",
+        (table_name,),
+    )
+    names = ['column', 'type', 'row_count', 'null_count', 'min', 'max', 'mean', 'distinct', 'top_values',
+             'min_length', 'max_length', 'updated_at']
+    stats = []
+    for row in cursor.fetchall():
+        record = dict(zip(names, row))
+        record['top_values'] = json.loads(record['top_values'])
+        stats.append(record)
+    return stats
+
+
+def format_profile_for_prompt(stats: List[Dict[str, Any]], top_k: int = 5) -> str:
+    """Uma linha por coluna com tipo, nulos, distintos, faixa e valores frequentes."""
+    if not stats:
+        return ""
+    lines = [f"{stats[0]['row_count']} linhas."]
+    for s in stats:
+        parts = [f"{s['column']} ({s['type']})", f"nulos {s['null_count']}", f"~{s['distinct']} distintos"]
+        if s['min'] is not None:
+            parts.append(f"mín {s['min']}, máx {s['max']}")
+        if s['mean'] is not None:
+            parts.append(f"média {s['mean']:.6g}")
+        if s['min_length'] is not None:
+            parts.append(f"tamanho {s['min_length']}-{s['max_length']}")
+        # Valores que aparecem uma vez só (ex.: identificadores) não dizem nada
+        frequent = [(v, c) for v, c in s['top_values'][:top_k] if c > 1]
+        if frequent:
+            parts.append("frequentes: " + ", ".join(f"{v} ({c})" for v, c in frequent))
+        lines.append("- " + "; ".join(parts))
+    return "\n".join(lines)
@@ -0,0 +1,238 @@
+"""
+Pool de conexões do banco de dados, compartilhado pelas sessões do app.
+
+As leituras (página de análise) usam conexões somente leitura, abertas pela URI
+mode=ro: cada thread pega uma conexão exclusiva do pool pelo tempo do bloco `with`
+(blocos aninhados na mesma thread reaproveitam a mesma) e o número de conexões é
+limitado. As escritas (cargas, índices do assistente) passam por um único escritor.
+O banco fica em modo WAL, então as leituras continuam enquanto uma carga grava.
+Conexões paradas há algum tempo passam por um teste (SELECT 1) antes de voltar ao
+uso e são reabertas se falharem.
+"""
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+# Conexões de leitura abertas ao mesmo tempo (leitores além disso esperam uma vaga)
+READ_POOL_SIZE = 8
+
+# Espera máxima por uma conexão livre (segundos) antes de desistir
+ACQUIRE_TIMEOUT_SECONDS = 30.0
+
+# Espera do SQLite por uma trava do banco (segundos), como nas conexões do app
+BUSY_TIMEOUT_SECONDS = 30.0
+
+# Conexões paradas há mais que isso são testadas antes de voltar ao uso
+HEALTH_CHECK_IDLE_SECONDS = 60.0
+
+
+class PoolTimeout(Exception):
+    """Nenhuma conexão ficou livre dentro do tempo de espera."""
+
+
+class _PooledConnection:
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.last_used = time.monotonic()
+
+
+class ConnectionPool:
+    """Conexões somente leitura limitadas, reentrantes por thread, e um único escritor."""
+
+    def __init__(self, db_file: str, max_readers: int = READ_POOL_SIZE):
+        self.db_file = str(db_file)
+        self.max_readers = max_readers
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._idle: List[_PooledConnection] = []
+        self._opened = 0
+        self._local = threading.local()
+        self._writer_lock = threading.RLock()
+        self._writer: Optional[_PooledConnection] = None
+        self._writer_owner: Optional[int] = None
+        self.waits = 0
+        self.reconnects = 0
+
+        # O escritor é aberto já (criando o banco, se preciso) para pôr o banco em WAL:
+        # leitores mode=ro não conseguem mudar o journal_mode
+        with self.writer():
+            pass
+
+    # ------------------------------------------------------------------
+    # CONEXÕES
+    # ------------------------------------------------------------------
+
+    def _open_reader(self) -> sqlite3.Connection:
+        uri = f"{Path(self.db_file).resolve().as_uri()}?mode=ro"
+        return sqlite3.connect(uri, uri=True, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+
+    def _open_writer(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_file, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode = WAL")
+        return conn
+
+    def _healthy(self, pooled: _PooledConnection) -> bool:
+        if time.monotonic() - pooled.last_used < HEALTH_CHECK_IDLE_SECONDS:
+            return True
+        try:
+            pooled.conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, pooled: _PooledConnection):
+        with contextlib.suppress(sqlite3.Error):
+            pooled.conn.close()
+
+    @staticmethod
+    def _reset(conn: sqlite3.Connection):
+        """Devolve a conexão ao estado padrão (sem transação aberta, linhas como tuplas)."""
+        if conn.in_transaction:
+            conn.rollback()
+        conn.row_factory = None
+
+    # ------------------------------------------------------------------
+    # LEITURA
+    # ------------------------------------------------------------------
+
+    def _checkout_reader(self, timeout: Optional[float]) -> _PooledConnection:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._available:
+            while True:
+                while self._idle:
+                    pooled = self._idle.pop()
+                    if self._healthy(pooled):
+                        return pooled
+                    self._discard(pooled)
+                    self._opened -= 1
+                    self.reconnects += 1
+                if self._opened < self.max_readers:
+                    self._opened += 1
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise PoolTimeout(f"Nenhuma das {self.max_readers} conexões de leitura ficou livre "
+                                      f"em {timeout:g} s.")
+                self.waits += 1
+                self._available.wait(remaining)
+        # Abre fora da trava; se falhar, a vaga volta para o pool
+        try:
+            return _PooledConnection(self._open_reader())
+        except sqlite3.Error:
+            with self._available:
+                self._opened -= 1
+                self._available.notify()
+            raise
+
+    def _checkin_reader(self, pooled: _PooledConnection, failed: bool):
+        try:
+            self._reset(pooled.conn)
+            if failed:
+                # Depois de um erro, a conexão só volta ao pool se ainda responder
+                pooled.conn.execute("SELECT 1").fetchone()
+            broken = False
+        except sqlite3.Error:
+            broken = True
+        with self._available:
+            if broken:
+                self._discard(pooled)
+                self._opened -= 1
+                self.reconnects += 1
+            else:
+                pooled.last_used = time.monotonic()
+                self._idle.append(pooled)
+            self._available.notify()
+
+    @contextlib.contextmanager
+    def reader(self, timeout: Optional[float] = ACQUIRE_TIMEOUT_SECONDS) -> Iterator[sqlite3.Connection]:
+        """Conexão somente leitura exclusiva da thread enquanto durar o bloco."""
+        held: Optional[_PooledConnection] = getattr(self._local, 'reader', None)
+        if held is not None:
+            # Bloco aninhado na mesma thread: mesma conexão, sem ocupar outra vaga
+            yield held.conn
+            return
+
+        pooled = self._checkout_reader(timeout)
+        self._local.reader = pooled
+        failed = False
+        try:
+            yield pooled.conn
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self._local.reader = None
+            self._checkin_reader(pooled, failed)
+
+    # ------------------------------------------------------------------
+    # ESCRITA
+    # ------------------------------------------------------------------
+
+    @contextlib.contextmanager
+    def writer(self, timeout: Optional[float] = ACQUIRE_TIMEOUT_SECONDS) -> Iterator[sqlite3.Connection]:
+        """A conexão de escrita, uma thread por vez (timeout=None espera o quanto for preciso)."""
+        if not self._writer_lock.acquire(timeout=-1 if timeout is None else timeout):
+            raise PoolTimeout(f"O banco está ocupado por outra escrita (ex.: uma carga) há mais de {timeout:g} s.")
+        nested = self._writer_owner == threading.get_ident()
+        try:
+            if not nested:
+                if self._writer is not None and not self._healthy(self._writer):
+                    self._discard(self._writer)
+                    self._writer = None
+                    self.reconnects += 1
+                if self._writer is None:
+                    self._writer = _PooledConnection(self._open_writer())
+                self._writer_owner = threading.get_ident()
+            try:
+                yield self._writer.conn
+            finally:
+                if not nested:
+                    self._writer_owner = None
+                    try:
+                        self._reset(self._writer.conn)
+                    except sqlite3.Error:
+                        self._discard(self._writer)
+                        self._writer = None
+                    else:
+                        self._writer.last_used = time.monotonic()
+        finally:
+            self._writer_lock.release()
+
+    # ------------------------------------------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            idle = len(self._idle)
+            opened = self._opened
+        return {'readers_open': opened, 'readers_in_use': opened - idle, 'max_readers': self.max_readers,
+                'writer_busy': self._writer_owner is not None, 'waits': self.waits, 'reconnects': self.reconnects}
+
+    def close(self):
+        """Fecha as conexões livres e o escritor (as em uso fecham ao serem devolvidas)."""
+        with self._available:
+            for pooled in self._idle:
+                self._discard(pooled)
+            self._opened -= len(self._idle)
+            self._idle.clear()
+        with self._writer_lock:
+            if self._writer is not None:
+                self._discard(self._writer)
+                self._writer = None
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_file: str, max_readers: int = READ_POOL_SIZE) -> ConnectionPool:
+    """Pool do banco, um por arquivo no processo (as páginas do app compartilham o mesmo escritor)."""
+    key = os.path.abspath(db_file)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(db_file, max_readers)
+        return pool
@@ -0,0 +1,156 @@
+"""
+Índice de busca textual (FTS5) das colunas de texto livre de uma tabela.
+
+O índice é uma tabela virtual FTS5 de conteúdo externo (_fts_<tabela>): guarda só o
+índice invertido e lê o texto da própria tabela pelo rowid, sem duplicar os dados. As
+colunas vêm da carga (pedidas ou detectadas pelo catálogo de estatísticas, ver
+auto_text_columns). A tabela interna _fts_indexes registra as colunas e até que rowid
+a tabela foi indexada. Toda carga na tabela chama sync_fts_index na mesma transação,
+que indexa só as linhas novas (as cargas só acrescentam linhas).
+
+O prompt de geração de SQL recebe format_fts_for_prompt, para que as buscas por
+palavras usem MATCH no índice em vez de LIKE '%...%' varrendo a tabela.
+"""
+import json
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+FTS_REGISTRY_TABLE = "_fts_indexes"
+
+# Nas colunas pedidas para o índice, "*" detecta as colunas de texto livre pelo catálogo
+FTS_AUTO = "*"
+
+# Tokenizador: palavras Unicode, sem diferenciar maiúsculas nem acentos ("acao" encontra "ação")
+FTS_TOKENIZER = "unicode61 remove_diacritics 2"
+
+# Detecção automática: colunas TEXT com textos de pelo menos este tamanho máximo e esta
+# fração de valores distintos (descarta códigos, categorias e datas)
+AUTO_MIN_MAX_LENGTH = 32
+AUTO_MIN_DISTINCT_RATIO = 0.1
+
+
+def fts_table_name(table_name: str) -> str:
+    # Prefixo "_fts_": o índice e as tabelas auxiliares do FTS5 ficam fora da lista de tabelas do usuário
+    return f"_fts_{table_name}"
+
+
+def fts5_available(cursor: sqlite3.Cursor) -> bool:
+    cursor.execute("SELECT 1 FROM pragma_module_list WHERE name = 'fts5'")
+    return cursor.fetchone() is not None
+
+
+def auto_text_columns(profile: List[Dict[str, Any]]) -> List[str]:
+    """Colunas de texto livre segundo o catálogo de estatísticas (column_stats.get_table_profile)."""
+    columns = []
+    for stats in profile:
+        values = (stats['row_count'] or 0) - (stats['null_count'] or 0)
+        if (stats['type'] == 'TEXT' and values > 0 and (stats['max_length'] or 0) >= AUTO_MIN_MAX_LENGTH
+                and (stats['distinct'] or 0) >= AUTO_MIN_DISTINCT_RATIO * values):
+            columns.append(stats['column'])
+    return columns
+
+
+def get_fts_index(cursor: sqlite3.Cursor, table_name: str) -> Optional[Dict[str, Any]]:
+    """Índice FTS5 registrado para a tabela (fts_table, columns, indexed_rowid, updated_at) ou None."""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_REGISTRY_TABLE,))
+    if cursor.fetchone() is None:
+        return None
+    cursor.execute(
+        f"SELECT fts_table, columns, indexed_rowid, updated_at FROM {FTS_REGISTRY_TABLE} WHERE table_name = ?",
+        (table_name,),
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return {'fts_table': row[0], 'columns': json.loads(row[1]), 'indexed_rowid': row[2], 'updated_at': row[3]}
+
+
+def create_fts_index(cursor: sqlite3.Cursor, table_name: str, columns: Sequence[str]):
+    """
+    Cria o índice das colunas informadas (na transação da carga) e registra a tabela
+    como não indexada: o conteúdo entra no próximo sync_fts_index. Um índice existente
+    com as mesmas colunas é mantido; com outras colunas, é recriado.
+    """
+    existing = get_fts_index(cursor, table_name)
+    if existing is not None and existing['columns'] == list(columns):
+        return
+    fts_table = fts_table_name(table_name)
+    cursor.execute(f"DROP TABLE IF EXISTS \"{fts_table}\"")
+    column_list = ", ".join(f"\"{col}\"" for col in columns)
+    cursor.execute(
+        f"CREATE VIRTUAL TABLE \"{fts_table}\" USING fts5({column_list}, content='{table_name.replace(chr(39), chr(39) * 2)}', "
+        f"content_rowid='rowid', tokenize='{FTS_TOKENIZER}')"
+    )
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {FTS_REGISTRY_TABLE} (
+            table_name TEXT PRIMARY KEY,
+            fts_table TEXT NOT NULL,
+            columns TEXT NOT NULL,
+            indexed_rowid INTEGER NOT NULL,
+            updated_at TEXT
+        )
+    """)
+    cursor.execute(
+        f"INSERT OR REPLACE INTO {FTS_REGISTRY_TABLE} (table_name, fts_table, columns, indexed_rowid, updated_at) "
+        f"VALUES (?, ?, ?, 0, ?)",
+        (table_name, fts_table, json.dumps(list(columns), ensure_ascii=False), _now()),
+    )
+
+
+def drop_fts_index(cursor: sqlite3.Cursor, table_name: str):
+    fts = get_fts_index(cursor, table_name)
+    if fts is not None:
+        cursor.execute(f"DROP TABLE IF EXISTS \"{fts['fts_table']}\"")
+        cursor.execute(f"DELETE FROM {FTS_REGISTRY_TABLE} WHERE table_name = ?", (table_name,))
+
+
+def sync_fts_index(cursor: sqlite3.Cursor, table_name: str, table_is_new: bool = False) -> Optional[int]:
+    """
+    Indexa as linhas da tabela acrescentadas desde a última sincronização (na transação
+    da carga). Com table_is_new (tabela recriada ou reescrita pela promoção de tipos), o
+    conteúdo antigo do índice é descartado e a tabela é indexada inteira. Retorna as
+    linhas indexadas, ou None se a tabela não tem índice.
+    """
+    fts = get_fts_index(cursor, table_name)
+    if fts is None:
+        return None
+    fts_table = fts['fts_table']
+    indexed_rowid = fts['indexed_rowid']
+    max_rowid = cursor.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM \"{table_name}\"").fetchone()[0]
+    if table_is_new or max_rowid < indexed_rowid:
+        # Conteúdo externo: 'delete-all' limpa o índice sem ler a tabela (que já é outra)
+        cursor.execute(f"INSERT INTO \"{fts_table}\" (\"{fts_table}\") VALUES ('delete-all')")
+        indexed_rowid = 0
+    column_list = ", ".join(f"\"{col}\"" for col in fts['columns'])
+    cursor.execute(
+        f"INSERT INTO \"{fts_table}\" (rowid, {column_list}) "
+        f"SELECT rowid, {column_list} FROM \"{table_name}\" WHERE rowid > ?",
+        (indexed_rowid,),
+    )
+    indexed = cursor.rowcount
+    cursor.execute(
+        f"UPDATE {FTS_REGISTRY_TABLE} SET indexed_rowid = ?, updated_at = ? WHERE table_name = ?",
+        (max_rowid, _now(), table_name),
+    )
+    return indexed
+
+
+def format_fts_for_prompt(table_name: str, fts: Optional[Dict[str, Any]]) -> str:
+    """Instruções de uso do índice FTS5 para o prompt de geração de SQL."""
+    if fts is None:
+        return "nenhum (use LIKE para buscas em texto)."
+    fts_table = fts['fts_table']
+    columns = ", ".join(fts['columns'])
+    return (
+        f"a tabela virtual FTS5 \"{fts_table}\" indexa as colunas {columns} de '{table_name}' "
+        f"(mesmo rowid; sem diferenciar maiúsculas nem acentos). Para buscar palavras nessas colunas, "
+        f"NÃO use LIKE '%...%': filtre com "
+        f"rowid IN (SELECT rowid FROM \"{fts_table}\" WHERE \"{fts_table}\" MATCH '\"termo\"'). "
+        f"Para uma só coluna use MATCH 'coluna: \"termo\"'; para prefixos, 'term*'; "
+        f"para várias palavras, AND/OR/NOT entre termos entre aspas."
+    )
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec='seconds')
@@ -0,0 +1,139 @@
+"""
+Cliente HTTP do Gemini.
+
+Uma única requests.Session com pool de conexões (keep-alive) atende todas as
+chamadas. Respostas 429/5xx e falhas de conexão são repetidas algumas vezes com
+backoff exponencial e jitter (respeitando Retry-After). generate espera a resposta
+inteira; stream usa o endpoint streamGenerateContent (SSE) e devolve o texto em
+pedaços conforme chega. As duas preenchem um dict de latência: tempo até o primeiro
+token, tempo total e número de tentativas.
+"""
+import json
+import random
+import time
+from typing import Any, Dict, Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+GEMINI_API_BASE = "https://generativelanguage.googleapis.com/v1beta"
+
+# Conexões mantidas abertas no pool da sessão
+POOL_SIZE = 4
+
+# Tempo máximo de conexão/leitura de cada tentativa (segundos)
+REQUEST_TIMEOUT = 60
+
+# Repetições: status considerados transitórios, número máximo de novas tentativas e
+# backoff exponencial (base * 2^tentativa, limitado ao máximo, com jitter completo)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_RETRIES = 3
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 8.0
+
+
+class GeminiError(Exception):
+    """Falha da API depois das tentativas (status não repetível ou tentativas esgotadas)."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class GeminiClient:
+    """Cliente de um modelo do Gemini com sessão compartilhada e repetições."""
+
+    def __init__(self, model: str, api_base: str = GEMINI_API_BASE, timeout: float = REQUEST_TIMEOUT,
+                 max_retries: int = MAX_RETRIES):
+        self.model = model
+        self.api_base = api_base.rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+
+    def generate(self, api_key: str, prompt: str, latency: Optional[Dict[str, Any]] = None) -> str:
+        """Texto completo da resposta (generateContent)."""
+        latency = {} if latency is None else latency
+        start = time.perf_counter()
+        response = self._post(f"{self.model}:generateContent", api_key, prompt, latency, stream=False)
+        text = _candidate_text(response.json())
+        latency['ttft_seconds'] = latency['total_seconds'] = time.perf_counter() - start
+        latency['response_chars'] = len(text)
+        return text
+
+    def stream(self, api_key: str, prompt: str, latency: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """
+        Pedaços de texto da resposta conforme chegam (streamGenerateContent, SSE). Só a
+        abertura da conexão é repetida: depois do primeiro byte, uma falha é levantada.
+        """
+        latency = {} if latency is None else latency
+        start = time.perf_counter()
+        response = self._post(f"{self.model}:streamGenerateContent", api_key, prompt, latency,
+                              stream=True, params={'alt': 'sse'})
+        chars = 0
+        try:
+            # chunk_size=None entrega cada pedaço assim que chega; SSE é sempre UTF-8
+            for line in response.iter_lines(chunk_size=None):
+                if not line.startswith(b'data:'):
+                    continue
+                text = _candidate_text(json.loads(line[len(b'data:'):].decode('utf-8')))
+                if not text:
+                    continue
+                if 'ttft_seconds' not in latency:
+                    latency['ttft_seconds'] = time.perf_counter() - start
+                chars += len(text)
+                yield text
+        finally:
+            response.close()
+            latency['total_seconds'] = time.perf_counter() - start
+            latency['response_chars'] = chars
+
+    def _post(self, method: str, api_key: str, prompt: str, latency: Dict[str, Any], stream: bool,
+              params: Optional[Dict[str, str]] = None) -> requests.Response:
+        url = f"{self.api_base}/models/{method}"
+        body = {"contents": [{"parts": [{"text": prompt}]}]}
+        attempt = 0
+        while True:
+            latency['attempts'] = attempt + 1
+            retry_after = None
+            try:
+                response = self.session.post(url, params={**(params or {}), 'key': api_key}, json=body,
+                                             timeout=self.timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = GeminiError(f"Falha de conexão com a API Gemini: {e}")
+            else:
+                latency['status_code'] = response.status_code
+                if response.status_code == 200:
+                    return response
+                error = GeminiError(f"{response.status_code} - {response.text}", response.status_code)
+                retry_after = response.headers.get('Retry-After')
+                response.close()
+                if response.status_code not in RETRY_STATUSES:
+                    raise error
+            if attempt == self.max_retries:
+                raise error
+            time.sleep(_backoff_seconds(attempt, retry_after))
+            attempt += 1
+
+
+def _backoff_seconds(attempt: int, retry_after: Optional[str]) -> float:
+    """Espera antes da próxima tentativa: Retry-After, se informado, ou backoff com jitter."""
+    if retry_after is not None:
+        try:
+            return min(float(retry_after), BACKOFF_MAX_SECONDS)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+def _candidate_text(payload: Dict[str, Any]) -> str:
+    """Texto do primeiro candidato de uma resposta (ou de um pedaço do stream)."""
+    candidates = payload.get("candidates") or []
+    if not candidates:
+        return ""
+    parts = candidates[0].get("content", {}).get("parts") or []
+    return "".join(part.get("text", "") for part in parts)
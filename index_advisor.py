@@ -0,0 +1,351 @@
+"""
+Assistente de índices guiado pelo log de consultas.
+
+Cada consulta executada na página de análise é registrada (QueryLog) com o plano do
+EXPLAIN QUERY PLAN, o tempo e as linhas lidas; as respondidas pelo cache de resultados
+também (log_cache_hit, marcadas com from_cache), para que perguntas repetidas contem
+como uso das tabelas e dos índices. propose_indexes lê o log, encontra as consultas
+que fazem varredura completa (SCAN sem índice) filtrando, agrupando ou ordenando
+pelas mesmas colunas e sugere um índice por padrão repetido: colunas de igualdade
+primeiro, depois agrupamento/ordenação e uma coluna de intervalo; quando a consulta
+usa poucas colunas, as demais entram no fim (índice de cobertura).
+
+create_index mede a consulta mais lenta do padrão antes e depois de criar o índice
+(melhor de MEASURE_RUNS execuções, depois de uma de aquecimento) e o descarta se o
+ganho for pequeno. Os índices criados ficam na tabela interna _advisor_indexes do
+banco de dados; drop_unused_indexes remove os que o log mostra sem uso desde a criação.
+"""
+import re
+import sqlite3
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from query_cache import normalize_sql
+from query_results import fetch_bounded
+
+QUERY_LOG_TABLE = "query_log"
+ADVISOR_INDEXES_TABLE = "_advisor_indexes"
+
+# Varreduras completas com o mesmo padrão de colunas antes de sugerir um índice
+ADVISOR_MIN_QUERIES = 2
+
+# Ganho mínimo (tempo antes / tempo depois) para manter um índice criado
+ADVISOR_MIN_SPEEDUP = 1.2
+
+# Índices de cobertura: no máximo esta quantidade de colunas no total
+COVERING_MAX_COLUMNS = 5
+
+# Linhas lidas ao medir uma consulta antes/depois do índice e execuções medidas (vale a
+# mais rápida; uma execução de aquecimento antes, para não comparar cache de páginas frio e quente)
+MEASURE_MAX_ROWS = 100_000
+MEASURE_RUNS = 3
+
+# Consultas registradas em uma tabela sem usar um índice criado antes de removê-lo
+UNUSED_MIN_QUERIES = 20
+
+# Plano: "SCAN t", "SCAN t USING COVERING INDEX i", "SEARCH t USING INDEX i (a=?)" (SQLite < 3.36: "SCAN TABLE t")
+_PLAN_STEP = re.compile(r'^(SCAN|SEARCH) (?:TABLE )?("[^"]+"|\S+)(?: AS \S+)?(?: USING (?:COVERING )?INDEX ("[^"]+"|\S+))?')
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_CLAUSES = ('where', 'group by', 'having', 'order by', 'limit')
+
+
+class QueryLog:
+    """Log das consultas executadas, em um banco SQLite próprio (separado do banco de dados)."""
+
+    def __init__(self, db_file: str):
+        self._db_file = db_file
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {QUERY_LOG_TABLE} (
+                        id INTEGER PRIMARY KEY,
+                        executed_at TEXT NOT NULL,
+                        sql TEXT NOT NULL,
+                        tables TEXT,
+                        plan TEXT,
+                        elapsed_ms REAL,
+                        rows INTEGER,
+                        from_cache INTEGER NOT NULL DEFAULT 0
+                    )
+                """)
+                # Logs criados antes da coluna from_cache
+                columns = [row[1] for row in conn.execute(f"PRAGMA table_info({QUERY_LOG_TABLE})")]
+                if 'from_cache' not in columns:
+                    conn.execute(f"ALTER TABLE {QUERY_LOG_TABLE} ADD COLUMN from_cache INTEGER NOT NULL DEFAULT 0")
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self._db_file, timeout=30.0)
+
+    def record(self, sql: str, tables: Iterable[str], plan: List[str], elapsed_ms: Optional[float], rows: int,
+               from_cache: bool = False):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    f"INSERT INTO {QUERY_LOG_TABLE} (executed_at, sql, tables, plan, elapsed_ms, rows, from_cache) "
+                    f"VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (_now(), sql, "\n".join(tables), "\n".join(plan), elapsed_ms, rows, int(from_cache)),
+                )
+        finally:
+            conn.close()
+
+    def entries(self, since: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Consultas registradas (desde a data ISO since, se informada), da mais antiga à mais nova."""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT executed_at, sql, tables, plan, elapsed_ms, rows, from_cache FROM {QUERY_LOG_TABLE} "
+                f"WHERE executed_at >= ? ORDER BY id", (since or "",)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [
+            {'executed_at': r[0], 'sql': r[1], 'tables': r[2].split("\n") if r[2] else [],
+             'plan': r[3].split("\n") if r[3] else [], 'elapsed_ms': r[4], 'rows': r[5], 'from_cache': bool(r[6])}
+            for r in rows
+        ]
+
+
+def explain_plan(conn: sqlite3.Connection, sql: str) -> List[str]:
+    """Passos do EXPLAIN QUERY PLAN (coluna detail)."""
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def plan_usage(plan: List[str]) -> Tuple[set, set]:
+    """(tabelas varridas sem índice, índices usados) segundo o plano."""
+    full_scans, indexes = set(), set()
+    for step in plan:
+        match = _PLAN_STEP.match(step.strip())
+        if not match:
+            continue
+        kind, table, index = match.groups()
+        if index:
+            indexes.add(index.strip('"'))
+        elif kind == 'SCAN':
+            full_scans.add(table.strip('"'))
+    return full_scans, indexes
+
+
+def run_logged(conn: sqlite3.Connection, log: QueryLog, sql: str, tables: List[str],
+               max_rows: int):
+    """Executa a consulta com fetch_bounded e a registra no log com o plano e o tempo."""
+    plan = explain_plan(conn, sql)
+    start = time.perf_counter()
+    df, truncated = fetch_bounded(conn, sql, max_rows)
+    log.record(sql, tables, plan, (time.perf_counter() - start) * 1000, len(df))
+    return df, truncated
+
+
+def log_cache_hit(conn: sqlite3.Connection, log: QueryLog, sql: str, tables: List[str], rows: int):
+    """
+    Registra uma consulta respondida pelo cache de resultados, com o plano atual e sem
+    tempo (não foi executada): conta para as sugestões e para o uso dos índices.
+    """
+    log.record(sql, tables, explain_plan(conn, sql), None, rows, from_cache=True)
+
+
+def _ensure_advisor_table(cursor: sqlite3.Cursor):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {ADVISOR_INDEXES_TABLE} (
+            index_name TEXT PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            columns TEXT NOT NULL,
+            sample_sql TEXT,
+            before_ms REAL,
+            after_ms REAL,
+            created_at TEXT NOT NULL
+        )
+    """)
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info(\"{table}\")")]
+
+
+def _existing_index_columns(conn: sqlite3.Connection, table: str) -> List[List[str]]:
+    indexes = []
+    for row in conn.execute(f"PRAGMA index_list(\"{table}\")"):
+        indexes.append([info[2] for info in conn.execute(f"PRAGMA index_info(\"{row[1]}\")")])
+    return indexes
+
+
+def _column_pattern(column: str) -> str:
+    return rf'(?:"{re.escape(column)}"|\[{re.escape(column)}\]|`{re.escape(column)}`|(?<![\w."]){re.escape(column)}(?![\w"]))'
+
+
+def _split_clauses(sql: str) -> Dict[str, str]:
+    """Trechos select/where/group by/having/order by de uma consulta simples (SQL normalizado, sem literais)."""
+    positions = []
+    for clause in _CLAUSES:
+        for match in re.finditer(rf'\b{clause}\b', sql):
+            positions.append((match.start(), clause, match.end()))
+    positions.sort()
+    parts = {}
+    from_match = re.search(r'\bfrom\b', sql)
+    select_match = re.search(r'\bselect\b', sql)
+    if select_match and from_match:
+        parts['select'] = sql[select_match.end():from_match.start()]
+    for i, (_, clause, end) in enumerate(positions):
+        stop = positions[i + 1][0] if i + 1 < len(positions) else len(sql)
+        parts[clause] = parts.get(clause, "") + " " + sql[end:stop]
+    return parts
+
+
+def candidate_index(sql: str, columns: List[str]) -> Optional[Tuple[List[str], bool]]:
+    """
+    Colunas do índice sugerido para sql em uma tabela com estas colunas: igualdade,
+    agrupamento/ordenação e uma coluna de intervalo; completa com as demais colunas
+    usadas quando cabem em um índice de cobertura. Retorna (colunas, é de cobertura),
+    ou None se a consulta não filtra/agrupa/ordena por colunas da tabela.
+    """
+    text = _STRING_LITERAL.sub('?', normalize_sql(sql))
+    parts = _split_clauses(text)
+    where = parts.get('where', "")
+
+    equality, ranges, grouping = [], [], []
+    for column in columns:
+        pattern = _column_pattern(column)
+        if re.search(rf'{pattern}\s*(?:==?|\bin\b|\bis\b)', where, re.I):
+            equality.append(column)
+        elif re.search(rf'{pattern}\s*(?:[<>]=?|\bbetween\b|\blike\b)', where, re.I):
+            ranges.append(column)
+        elif re.search(pattern, parts.get('group by', "") + parts.get('order by', ""), re.I):
+            grouping.append(column)
+
+    key = equality + grouping + ranges[:1]
+    if not key:
+        return None
+
+    if '*' in parts.get('select', "").replace('count(*)', ''):
+        return key, False
+    used = [c for c in columns if c not in key and re.search(_column_pattern(c), text, re.I)]
+    if len(key) + len(used) <= COVERING_MAX_COLUMNS:
+        return key + used, True
+    return key, False
+
+
+def propose_indexes(conn: sqlite3.Connection, log: QueryLog) -> List[Dict[str, Any]]:
+    """Índices sugeridos a partir das varreduras completas repetidas no log."""
+    proposals: Dict[Tuple[str, Tuple[str, ...]], Dict[str, Any]] = {}
+    table_columns: Dict[str, List[str]] = {}
+    for entry in log.entries():
+        full_scans, _ = plan_usage(entry['plan'])
+        for table in full_scans:
+            if table not in table_columns:
+                table_columns[table] = _table_columns(conn, table)
+            if not table_columns[table]:
+                continue  # tabela não existe mais
+            candidate = candidate_index(entry['sql'], table_columns[table])
+            if not candidate:
+                continue
+            index_columns, covering = candidate
+            proposal = proposals.setdefault((table, tuple(index_columns)), {
+                'table': table, 'columns': index_columns, 'covering': covering, 'queries': 0,
+                'total_ms': 0.0, 'sample_sql': entry['sql'], 'sample_ms': -1.0,
+            })
+            proposal['queries'] += 1
+            proposal['total_ms'] += entry['elapsed_ms'] or 0.0
+            if (entry['elapsed_ms'] or 0.0) > proposal['sample_ms']:
+                proposal['sample_sql'], proposal['sample_ms'] = entry['sql'], entry['elapsed_ms'] or 0.0
+
+    result = []
+    for (table, index_columns), proposal in proposals.items():
+        if proposal['queries'] < ADVISOR_MIN_QUERIES:
+            continue
+        # Um índice existente que já começa por estas colunas atende as consultas
+        if any(existing[:len(index_columns)] == list(index_columns)
+               for existing in _existing_index_columns(conn, table)):
+            continue
+        result.append(proposal)
+    return sorted(result, key=lambda p: p['total_ms'], reverse=True)
+
+
+def _measure_ms(conn: sqlite3.Connection, sql: str) -> float:
+    """Melhor tempo de MEASURE_RUNS execuções, depois de uma de aquecimento."""
+    fetch_bounded(conn, sql, MEASURE_MAX_ROWS)
+    best = float('inf')
+    for _ in range(MEASURE_RUNS):
+        start = time.perf_counter()
+        fetch_bounded(conn, sql, MEASURE_MAX_ROWS)
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return best
+
+
+def index_name(table: str, columns: List[str]) -> str:
+    return re.sub(r'\W', '_', f"idx_auto_{table}_{'_'.join(columns)}")
+
+
+def create_index(conn: sqlite3.Connection, proposal: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Cria o índice sugerido medindo a consulta de exemplo antes e depois. O índice é
+    removido se o ganho ficar abaixo de ADVISOR_MIN_SPEEDUP. Retorna o resultado da medição.
+    """
+    table, columns, sql = proposal['table'], proposal['columns'], proposal['sample_sql']
+    name = index_name(table, columns)
+    before_ms = _measure_ms(conn, sql)
+
+    cursor = conn.cursor()
+    with conn:
+        cursor.execute("BEGIN")
+        column_list = ", ".join(f'"{c}"' for c in columns)
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS \"{name}\" ON \"{table}\" ({column_list})")
+        cursor.execute(f"ANALYZE \"{name}\"")
+    after_ms = _measure_ms(conn, sql)
+    speedup = before_ms / max(after_ms, 1e-6)
+
+    with conn:
+        cursor.execute("BEGIN")
+        if speedup < ADVISOR_MIN_SPEEDUP:
+            cursor.execute(f"DROP INDEX IF EXISTS \"{name}\"")
+        else:
+            _ensure_advisor_table(cursor)
+            cursor.execute(
+                f"INSERT OR REPLACE INTO {ADVISOR_INDEXES_TABLE} (index_name, table_name, columns, sample_sql, "
+                f"before_ms, after_ms, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (name, table, ", ".join(columns), sql, before_ms, after_ms, _now()),
+            )
+    return {'index': name, 'table': table, 'columns': ", ".join(columns), 'before_ms': round(before_ms, 1),
+            'after_ms': round(after_ms, 1), 'speedup': round(speedup, 2), 'kept': speedup >= ADVISOR_MIN_SPEEDUP}
+
+
+def advisor_indexes(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+    """Índices criados pelo assistente que ainda existem no banco."""
+    cursor = conn.cursor()
+    if not cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                          (ADVISOR_INDEXES_TABLE,)).fetchone():
+        return []
+    rows = cursor.execute(
+        f"SELECT a.index_name, a.table_name, a.columns, a.before_ms, a.after_ms, a.created_at "
+        f"FROM {ADVISOR_INDEXES_TABLE} a JOIN sqlite_master m ON m.type = 'index' AND m.name = a.index_name"
+    ).fetchall()
+    return [{'index': r[0], 'table': r[1], 'columns': r[2], 'before_ms': r[3], 'after_ms': r[4],
+             'created_at': r[5]} for r in rows]
+
+
+def drop_unused_indexes(conn: sqlite3.Connection, log: QueryLog) -> List[str]:
+    """
+    Remove os índices do assistente que nenhuma das consultas registradas na tabela
+    desde a criação usou (com ao menos UNUSED_MIN_QUERIES consultas). Retorna os removidos.
+    """
+    dropped = []
+    cursor = conn.cursor()
+    for index in advisor_indexes(conn):
+        entries = [e for e in log.entries(since=index['created_at']) if index['table'] in e['tables']]
+        if len(entries) < UNUSED_MIN_QUERIES:
+            continue
+        if any(index['index'] in plan_usage(e['plan'])[1] for e in entries):
+            continue
+        with conn:
+            cursor.execute("BEGIN")
+            cursor.execute(f"DROP INDEX IF EXISTS \"{index['index']}\"")
+            cursor.execute(f"DELETE FROM {ADVISOR_INDEXES_TABLE} WHERE index_name = ?", (index['index'],))
+        dropped.append(index['index'])
+    return dropped
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec='seconds')
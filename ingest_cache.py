@@ -0,0 +1,178 @@
+"""
+Cache de ingestão endereçado por conteúdo.
+
+Para cada tabela carregada a partir de um CSV, a tabela _ingest_cache do banco guarda
+o hash SHA-256 dos bytes carregados (o CSV já descompactado), até que byte o conteúdo
+foi lido, quantas linhas ele gerou e as colunas/tipos usados. Um novo upload para a
+mesma tabela é comparado só pelo prefixo: se for idêntico nada é carregado; se for o
+conteúdo anterior mais linhas novas, só a cauda é lida.
+
+A tabela _table_versions guarda uma versão de dados por tabela, incrementada por
+cada carga que altera a tabela (na mesma transação). O cache de consultas da página
+de análise usa essas versões para descartar resultados antigos.
+"""
+import hashlib
+import io
+import json
+import sqlite3
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+INGEST_CACHE_TABLE = "_ingest_cache"
+TABLE_VERSIONS_TABLE = "_table_versions"
+
+# Tamanho das leituras ao calcular o hash do prefixo
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class HashingReader(io.RawIOBase):
+    """Repassa as leituras de um stream binário calculando o SHA-256 e contando os bytes lidos."""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self.hasher = hashlib.sha256()
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        n = self._stream.readinto(b)
+        if n:
+            self.hasher.update(memoryview(b)[:n])
+            self.bytes_read += n
+        return n
+
+    def hexdigest(self) -> str:
+        return self.hasher.hexdigest()
+
+
+def ensure_ingest_cache_table(cursor: sqlite3.Cursor):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS "{INGEST_CACHE_TABLE}" (
+            table_name TEXT PRIMARY KEY COLLATE NOCASE,
+            source_name TEXT,
+            content_hash TEXT NOT NULL,
+            byte_offset INTEGER NOT NULL,
+            row_count INTEGER NOT NULL,
+            columns TEXT NOT NULL,
+            column_types TEXT NOT NULL,
+            loaded_at TEXT NOT NULL
+        )
+    """)
+
+
+def get_previous_load(cursor: sqlite3.Cursor, table_name: str) -> Optional[Dict]:
+    """Registro da última carga na tabela, ou None (sem registro ou tabela já removida)."""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (INGEST_CACHE_TABLE,))
+    if cursor.fetchone() is None:
+        return None
+    cursor.execute(
+        f"SELECT c.table_name, c.source_name, c.content_hash, c.byte_offset, c.row_count, c.columns, "
+        f"c.column_types, c.loaded_at FROM \"{INGEST_CACHE_TABLE}\" c "
+        f"JOIN sqlite_master m ON m.type = 'table' AND m.name = c.table_name COLLATE NOCASE "
+        f"WHERE c.table_name = ?",
+        (table_name,),
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    keys = ('table_name', 'source_name', 'content_hash', 'byte_offset', 'row_count', 'columns',
+            'column_types', 'loaded_at')
+    record = dict(zip(keys, row))
+    record['columns'] = json.loads(record['columns'])
+    record['column_types'] = json.loads(record['column_types'])
+    return record
+
+
+def save_load(cursor: sqlite3.Cursor, table_name: str, source_name: str, content_hash: str, byte_offset: int,
+              row_count: int, columns: List[str], column_types: List[Dict]):
+    """
+    Registra (ou substitui) a carga da tabela: hash do conteúdo carregado e até que byte
+    ele foi lido (HashingReader.hexdigest/bytes_read). Deve rodar na mesma transação da carga.
+    """
+    ensure_ingest_cache_table(cursor)
+    cursor.execute(
+        f"INSERT OR REPLACE INTO \"{INGEST_CACHE_TABLE}\" "
+        f"(table_name, source_name, content_hash, byte_offset, row_count, columns, column_types, loaded_at) "
+        f"VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (table_name, source_name, content_hash, byte_offset, row_count,
+         json.dumps(columns), json.dumps(column_types), datetime.now().isoformat(timespec='seconds')),
+    )
+
+
+def combined_content_hash(content_hashes: List[str]) -> str:
+    """Hash de uma carga de vários CSVs numa tabela (os hashes deles, na ordem da carga)."""
+    if len(content_hashes) == 1:
+        # Um CSV só: o mesmo hash da carga de um arquivo, que permite acrescentar a cauda depois
+        return content_hashes[0]
+    return hashlib.sha256("\n".join(content_hashes).encode('ascii')).hexdigest()
+
+
+def match_loaded_prefix(content: HashingReader, previous_load: Dict) -> Tuple[bool, bool]:
+    """
+    Lê exatamente os byte_offset primeiros bytes de content e compara o hash com o da
+    última carga. Retorna (prefixo igual, prefixo termina em fim de linha); a leitura
+    pode continuar de content a partir desse ponto.
+    """
+    remaining = previous_load['byte_offset']
+    last_byte = b''
+    while remaining > 0:
+        chunk = content.read(min(remaining, HASH_CHUNK_SIZE))
+        if not chunk:
+            return False, False
+        remaining -= len(chunk)
+        last_byte = chunk[-1:]
+    return content.hexdigest() == previous_load['content_hash'], last_byte == b'\n'
+
+
+def skip_line_break(stream) -> bool:
+    """
+    Consome a quebra de linha (\n, \r\n ou \r) no início de stream (um BufferedReader).
+    Uma carga anterior que terminou sem quebra de linha tem o último registro completado
+    por ela no novo upload; retorna False se o upload continua a última linha.
+    """
+    first = stream.read(1)
+    if first == b'\r':
+        if stream.peek(1)[:1] == b'\n':
+            stream.read(1)
+        return True
+    return first == b'\n'
+
+
+def drain(stream):
+    """Lê o que restar de um stream (para o hash cobrir o conteúdo inteiro)."""
+    while stream.read(HASH_CHUNK_SIZE):
+        pass
+
+
+def bump_table_version(cursor: sqlite3.Cursor, table_name: str):
+    """Incrementa a versão de dados da tabela; deve rodar na mesma transação da carga."""
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS "{TABLE_VERSIONS_TABLE}" (
+            table_name TEXT PRIMARY KEY COLLATE NOCASE,
+            version INTEGER NOT NULL
+        )
+    """)
+    cursor.execute(
+        f"INSERT INTO \"{TABLE_VERSIONS_TABLE}\" (table_name, version) VALUES (?, 1) "
+        f"ON CONFLICT(table_name) DO UPDATE SET version = version + 1",
+        (table_name,),
+    )
+
+
+def get_table_versions(cursor: sqlite3.Cursor, table_names: List[str]) -> Dict[str, int]:
+    """Versão de dados de cada tabela (0 para tabelas nunca carregadas pelo app)."""
+    versions = dict.fromkeys(table_names, 0)
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (TABLE_VERSIONS_TABLE,))
+    if cursor.fetchone() is None or not table_names:
+        return versions
+    placeholders = ", ".join("?" * len(table_names))
+    cursor.execute(
+        f"SELECT table_name, version FROM \"{TABLE_VERSIONS_TABLE}\" WHERE table_name IN ({placeholders})",
+        list(table_names),
+    )
+    by_lower = {name.lower(): name for name in table_names}
+    for name, version in cursor.fetchall():
+        versions[by_lower.get(name.lower(), name)] = version
+    return versions
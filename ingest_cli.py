@@ -0,0 +1,149 @@
+"""
+Carga de arquivos CSV no SQLite pela linha de comando, sem o Streamlit.
+
+Usa a mesma carga da página principal (ingest_pipeline.ingest_files): um arquivo é
+carregado como no upload (cache de ingestão, leitura paralela opcional de .csv); vários
+arquivos são lidos em paralelo, um processo por CSV, com um único escritor. Aceita os
+formatos de ingest_input (.csv, .zip, .gz, .bz2, .xz, .tar...). As mensagens e o
+progresso vão para a saída de erro; o resumo (ou o resultado em JSON, com --json), para
+a saída padrão.
+
+Uso:
+    python ingest_cli.py vendas_*.csv.gz --db db.sqlite --table vendas
+    python ingest_cli.py a.csv b.csv --separate-tables --workers 4 --json
+    python ingest_cli.py chamados.csv --table chamados --fts descricao,comentarios
+
+O código de saída é 1 se a carga ou algum dos arquivos falhar e 130 se ela for
+interrompida (Ctrl+C), com a transação desfeita.
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+# Intervalo mínimo entre atualizações da linha de progresso (segundos)
+PROGRESS_INTERVAL_SECONDS = 0.5
+
+# Prefixo das mensagens na saída de erro, por nível
+LEVEL_PREFIXES = {'info': "", 'success': "OK: ", 'warning': "AVISO: ", 'error': "ERRO: ", 'caption': "  "}
+
+
+def default_table_name(path: Path) -> str:
+    """Nome de tabela sugerido a partir do arquivo, como na página principal."""
+    return re.sub(r'[^a-zA-Z0-9_]', '_', path.name.split('.')[0]).lower() or "dados_csv"
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Carga de arquivos CSV no SQLite, sem a interface.")
+    parser.add_argument('files', nargs='+', help="arquivos a carregar (.csv, .zip, .gz, .bz2, .xz, .tar...)")
+    parser.add_argument('--db', default="db.sqlite", help="banco SQLite de destino (padrão: db.sqlite)")
+    parser.add_argument('--table', help="tabela de destino (padrão: nome do primeiro arquivo)")
+    parser.add_argument('--separate-tables', action='store_true',
+                        help="com vários CSVs, uma tabela por CSV (tabela_<nome do arquivo>) em vez de juntar "
+                             "os CSVs de mesmo cabeçalho")
+    parser.add_argument('--sampling', choices=("head", "reservoir"), default="head",
+                        help="amostragem da inferência de tipos (padrão: head)")
+    parser.add_argument('--no-bulk-load', action='store_true', help="desliga o modo de carga em massa")
+    parser.add_argument('--index', default="", help="colunas para indexar após a carga, separadas por vírgula")
+    parser.add_argument('--fts', default="",
+                        help="colunas para o índice de busca textual (FTS5), separadas por vírgula; "
+                             "* detecta as colunas de texto livre")
+    parser.add_argument('--parallel', action='store_true', help="leitura paralela de um único .csv grande")
+    parser.add_argument('--no-preserve-order', action='store_true',
+                        help="na leitura paralela, não mantém a ordem das linhas")
+    parser.add_argument('--workers', type=int, default=None, help="processos para vários arquivos (padrão: CPUs)")
+    parser.add_argument('--rss-ceiling-mb', type=float, default=None,
+                        help="teto de memória (RSS) da carga em MB, que limita o tamanho dos lotes "
+                             "(padrão: INGEST_RSS_CEILING_MB ou 2048)")
+    parser.add_argument('--metrics-file', default=None,
+                        help="arquivo JSONL das métricas (padrão: o da página principal)")
+    parser.add_argument('--no-metrics', action='store_true', help="não grava as métricas da carga")
+    parser.add_argument('--quiet', action='store_true', help="mostra só os erros e o resumo")
+    parser.add_argument('--json', action='store_true', help="escreve o resultado em JSON na saída padrão")
+    return parser
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    paths = [Path(file) for file in args.files]
+    missing = [str(path) for path in paths if not path.is_file()]
+    if missing:
+        parser.error(f"arquivos não encontrados: {', '.join(missing)}")
+
+    # Imports da carga (pandas, numpy) só depois dos argumentos: --help e erros de uso são imediatos
+    import pandas as pd
+
+    from db_pool import get_pool
+    from ingest_core import normalize_header
+    from ingest_jobs import CallbackReporter
+    from ingest_pipeline import MAX_WORKERS, METRICS_FILE, ingest_files
+
+    progress_state = {'last': 0.0, 'shown': False}
+    show_progress = not args.quiet and sys.stderr.isatty()
+
+    def clear_progress():
+        if progress_state['shown']:
+            sys.stderr.write("\r\033[K")
+            progress_state['shown'] = False
+
+    def on_message(level: str, message: str):
+        if args.quiet and level != 'error':
+            return
+        clear_progress()
+        print(f"{LEVEL_PREFIXES[level]}{message}", file=sys.stderr)
+
+    def on_table(title: str, records):
+        if args.quiet or not records:
+            return
+        clear_progress()
+        print(f"{title}:\n{pd.DataFrame(records).to_string(index=False)}", file=sys.stderr)
+
+    def on_progress(rows, bytes_done, fraction):
+        now = time.monotonic()
+        if not show_progress or rows is None or now - progress_state['last'] < PROGRESS_INTERVAL_SECONDS:
+            return
+        progress_state['last'] = now
+        progress_state['shown'] = True
+        done = f", {bytes_done / (1024 * 1024):.1f} MB" if bytes_done else ""
+        sys.stderr.write(f"\r\033[K{rows:,} linhas{done}")
+        sys.stderr.flush()
+
+    report = CallbackReporter(on_message=on_message, on_progress=on_progress, on_table=on_table)
+    table_name = args.table or default_table_name(paths[0])
+    index_columns = normalize_header([c.strip() for c in args.index.split(',') if c.strip()])
+    fts_columns = normalize_header([c.strip() for c in args.fts.split(',') if c.strip()])
+    metrics_file = None if args.no_metrics else (args.metrics_file or METRICS_FILE)
+
+    try:
+        with get_pool(args.db).writer(timeout=None) as conn:
+            result = ingest_files(
+                conn, paths, table_name, args.sampling, not args.no_bulk_load, index_columns,
+                not args.separate_tables, args.parallel, not args.no_preserve_order,
+                args.workers or MAX_WORKERS, report=report, metrics_file=metrics_file,
+                rss_ceiling_mb=args.rss_ceiling_mb, fts_columns=fts_columns,
+            )
+    except KeyboardInterrupt:
+        clear_progress()
+        print("Carga interrompida; a transação foi desfeita.", file=sys.stderr)
+        return 130
+    clear_progress()
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, default=str))
+    elif 'tables' in result:
+        for table in result['tables']:
+            print(f"{table['table']}: {table['rows']} linhas")
+        for stats in result['member_stats']:
+            if stats['erro']:
+                print(f"{stats['membro']}: ERRO {stats['erro']}")
+    elif result['ddl'] is not None:
+        print(f"{table_name}: {result['rows']} linhas")
+    failed_members = any(stats['erro'] for stats in result.get('member_stats', []))
+    return 1 if report.errors or failed_members else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
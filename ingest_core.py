@@ -0,0 +1,647 @@
+"""
+Etapas da carga de CSV que não dependem da interface: leitura do upload sem cópias
+(ou de um arquivo em disco, na CLI), normalização do cabeçalho,
+DDL, conversão dos lotes para os tipos inferidos e os workers que processam em
+paralelo os membros de um ZIP ou os trechos de um CSV grande.
+
+Fica em um módulo próprio (sem Streamlit) para poder ser importado pelos processos
+do pool.
+"""
+import csv
+import io
+import itertools
+import mmap
+import multiprocessing
+import os
+import queue
+import sqlite3
+import sys
+import time
+import uuid
+import zipfile
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import resource  # Indisponível no Windows: o pico de RSS fica sem medição
+except ImportError:
+    resource = None
+
+from batch_sizing import BatchSizer
+from column_stats import TableProfile
+from ingest_cache import HashingReader, drain
+from ingest_input import open_csv_stream
+from ingest_metrics import IngestMetrics
+from type_inference import (
+    FALSE_TOKENS, TRUE_TOKENS, TypeInferenceEngine, date_storage_format, integral_mask, join_types,
+    matches_tokens, null_mask_of, parse_dates, parse_float_column, strip_values,
+)
+
+# Buffer de leitura dos streams sobre o conteúdo do upload
+UPLOAD_READ_BUFFER_SIZE = 1024 * 1024
+
+# Lotes convertidos aguardando o escritor, por worker (limita a memória da fila)
+QUEUE_BATCHES_PER_WORKER = 4
+
+# Tipos gravados em forma normalizada (números, 1/0, datas ISO), que não volta ao texto
+# original: '007' e '3.0' viram 7 e 3.0, que em TEXT seriam '7' e '3'
+NORMALIZED_TYPES = ('INTEGER', 'REAL', 'BOOLEAN', 'DATE', 'DATETIME')
+
+
+class ParallelLoadFallback(Exception):
+    """A carga paralela não reproduziria o caminho serial; o arquivo deve ser lido em série."""
+
+
+class LossyPromotion(Exception):
+    """
+    Colunas numéricas, BOOLEAN ou de data foram promovidas para TEXT depois de já haver
+    linhas gravadas na forma normalizada (NORMALIZED_TYPES): essas linhas precisam ser
+    convertidas de novo a partir da origem, já como TEXT. columns são as posições das colunas.
+    """
+
+    def __init__(self, columns: List[int]):
+        super().__init__(f"colunas promovidas para TEXT: {columns}")
+        self.columns = columns
+
+# ----------------------------------------------------------------------
+# CONTEÚDO DO UPLOAD E MEDIÇÃO DE RECURSOS
+# ----------------------------------------------------------------------
+
+class _BufferReader(io.RawIOBase):
+    """Stream binário posicionável sobre um buffer (memoryview/mmap), lido em pedaços sem cópia do todo."""
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer)
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        n = max(0, min(len(b), self._view.nbytes - self._pos))
+        b[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: self._view.nbytes}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def close(self):
+        if not self.closed:
+            self._view.release()
+        super().close()
+
+
+class UploadSource:
+    """
+    Conteúdo de um arquivo enviado. É lido direto do buffer do upload (memoryview), sem
+    gravar nada em disco; spill() grava o conteúdo uma única vez em um arquivo temporário,
+    que passa a ser lido por mmap e cujo caminho é usado pelos pools de processos.
+    """
+
+    def __init__(self, name: str, buffer, spill_dir: Path):
+        self.name = name
+        self.suffix = Path(name).suffix.lower()
+        self.path: Optional[Path] = None
+        self._buffer = memoryview(buffer)
+        self.size = self._buffer.nbytes
+        self._spill_dir = Path(spill_dir)
+        self._mmap = None
+
+    def open(self) -> io.BufferedReader:
+        """Novo stream binário sobre o conteúdo (buffer do upload ou mmap do arquivo temporário)."""
+        content = self._mmap if self._mmap is not None else self._buffer
+        return io.BufferedReader(_BufferReader(content), UPLOAD_READ_BUFFER_SIZE)
+
+    def spill(self) -> Path:
+        """Grava o conteúdo em um arquivo temporário (só na primeira chamada) e retorna o caminho."""
+        if self.path is None:
+            path = self._spill_dir / f"{uuid.uuid4()}{self.suffix}"
+            with open(path, "wb") as f:
+                f.write(self._buffer)
+            self.path = path
+            if self.size:
+                with open(path, "rb") as f:
+                    self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.path
+
+    def close(self) -> Optional[Path]:
+        """Libera o mmap e remove o arquivo temporário; retorna o caminho removido, se havia."""
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass  # Ainda há um stream aberto sobre o mmap; o GC fecha depois
+            self._mmap = None
+        path, self.path = self.path, None
+        if path is not None and path.exists():
+            path.unlink()
+            return path
+        return None
+
+
+class FileSource:
+    """
+    Arquivo em disco com a mesma interface de UploadSource (usado pela CLI e pelos
+    workers). Já está em disco: spill() só retorna o caminho e close() não o remove.
+    """
+
+    def __init__(self, path, name: Optional[str] = None):
+        self.path = Path(path)
+        self.name = name or self.path.name
+        self.suffix = Path(self.name).suffix.lower()
+        self.size = os.path.getsize(self.path)
+
+    def open(self) -> io.BufferedReader:
+        return open(self.path, "rb", buffering=UPLOAD_READ_BUFFER_SIZE)
+
+    def spill(self) -> Path:
+        return self.path
+
+    def close(self) -> Optional[Path]:
+        return None
+
+
+def resource_usage() -> Dict[str, Optional[float]]:
+    """
+    Pico de RSS deste processo e dos processos filhos já encerrados (workers dos pools)
+    e MB lidos/gravados em disco por este processo até agora (/proc/self/io, só Linux).
+    """
+    mb = 1024 * 1024
+    usage = {'peak_rss_mb': None, 'children_peak_rss_mb': None, 'disk_read_mb': None, 'disk_write_mb': None}
+    if resource is not None:
+        # ru_maxrss vem em KiB no Linux e em bytes no macOS
+        scale = 1 if sys.platform == "darwin" else 1024
+        usage['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / mb
+        usage['children_peak_rss_mb'] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale / mb
+    try:
+        with open("/proc/self/io") as f:
+            fields = dict(line.strip().split(": ") for line in f if ": " in line)
+        usage['disk_read_mb'] = int(fields['read_bytes']) / mb
+        usage['disk_write_mb'] = int(fields['write_bytes']) / mb
+    except (OSError, KeyError, ValueError):
+        pass
+    return usage
+
+# ----------------------------------------------------------------------
+# CABEÇALHO, DDL E PROMOÇÃO DE TIPOS
+# ----------------------------------------------------------------------
+
+def normalize_header(header: List[str]) -> List[str]:
+    """
+    Normaliza o cabeçalho como o pandas fazia (Unnamed, duplicadas com sufixo .N) e
+    devolve os nomes de coluna usados no DDL.
+    """
+    names = []
+    counts: Dict[str, int] = {}
+    for i, raw in enumerate(header):
+        name = raw if raw != '' else f"Unnamed: {i}"
+        cur_count = counts.get(name, 0)
+        while cur_count > 0:
+            counts[name] = cur_count + 1
+            name = f"{name}.{cur_count}"
+            cur_count = counts.get(name, 0)
+        counts[name] = cur_count + 1
+        names.append(name)
+
+    return [str(name).strip().replace(' ', '_').replace('.', '_').lower().replace('-', '_') for name in names]
+
+
+def build_create_table_ddl(table_name: str, columns: List[str], column_types: List[Dict]) -> str:
+    """Monta o CREATE TABLE com o tipo inferido de cada coluna (e o formato de origem das datas)."""
+    column_lines = []
+    for col, column_type in zip(columns, column_types):
+        line = f"    \"{col}\" {column_type['type']}"
+        if column_type['format']:
+            line += f" /* formato de origem: {column_type['format']} */"
+        column_lines.append(line)
+    return f"CREATE TABLE IF NOT EXISTS \"{table_name}\" (\n" + ",\n".join(column_lines) + "\n);"
+
+
+def table_exists(cursor: sqlite3.Cursor, table_name: str) -> bool:
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name = ? COLLATE NOCASE", (table_name,))
+    return cursor.fetchone() is not None
+
+
+def copy_table_rows(cursor: sqlite3.Cursor, source_table: str, target_table: str,
+                    columns: List[str], target_types: List[Dict]):
+    """
+    Copia as linhas de source_table para target_table, na ordem de inserção. Valores
+    inteiros gravados como REAL voltam a ser '5' (e não '5.0') nas colunas TEXT do destino.
+    """
+    select_exprs = []
+    for col, column_type in zip(columns, target_types):
+        if column_type['type'] == 'TEXT':
+            select_exprs.append(
+                f"CASE WHEN typeof(\"{col}\") = 'real' AND \"{col}\" = CAST(\"{col}\" AS INTEGER) "
+                f"THEN CAST(CAST(\"{col}\" AS INTEGER) AS TEXT) ELSE \"{col}\" END"
+            )
+        else:
+            select_exprs.append(f"\"{col}\"")
+    column_names = ', '.join(f'"{col}"' for col in columns)
+    cursor.execute(
+        f"INSERT INTO \"{target_table}\" ({column_names}) "
+        f"SELECT {', '.join(select_exprs)} FROM \"{source_table}\" ORDER BY rowid"
+    )
+
+
+def promote_table_columns(cursor: sqlite3.Cursor, table_name: str, columns: List[str], column_types: List[Dict]):
+    """
+    Reescreve a tabela com os tipos de column_types (INTEGER → REAL, qualquer tipo → TEXT),
+    mantendo os índices. Só INTEGER → REAL preserva os valores: números, booleanos e
+    datas gravados não voltam ao texto original ('007' gravado como 7 viraria '7'), então
+    a promoção para TEXT de uma tabela com linhas exige convertê-las de novo a partir da
+    origem (ver LossyPromotion).
+    """
+    cursor.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table_name,)
+    )
+    index_ddls = [sql for (sql,) in cursor.fetchall()]
+    staging_name = f"{table_name}__promocao"
+    cursor.execute(f"DROP TABLE IF EXISTS \"{staging_name}\"")
+    cursor.execute(build_create_table_ddl(staging_name, columns, column_types))
+
+    copy_table_rows(cursor, table_name, staging_name, columns, column_types)
+    cursor.execute(f"DROP TABLE \"{table_name}\"")
+    cursor.execute(f"ALTER TABLE \"{staging_name}\" RENAME TO \"{table_name}\"")
+    for index_ddl in index_ddls:
+        cursor.execute(index_ddl)
+
+
+def lossy_promotions(previous_types: List[Dict], column_types: List[Dict]) -> List[int]:
+    """Posições das colunas de NORMALIZED_TYPES em previous_types que viraram TEXT em column_types."""
+    return [
+        i for i, (previous, current) in enumerate(zip(previous_types, column_types))
+        if previous['type'] in NORMALIZED_TYPES and current['type'] == 'TEXT'
+    ]
+
+# ----------------------------------------------------------------------
+# CONVERSÃO DOS LOTES
+# ----------------------------------------------------------------------
+
+TEXT_TYPE = {'type': 'TEXT', 'format': None}
+
+
+def convert_column(raw_values: Tuple[str, ...], column_type: Dict) -> Tuple[np.ndarray, Dict]:
+    """
+    Converte uma coluna de um lote para o tipo da coluna: INTEGER/REAL viram números,
+    BOOLEAN vira 1/0, DATE/DATETIME viram texto ISO e TEXT mantém o valor original.
+    Se algum valor não cabe no tipo, o lote é convertido no tipo promovido
+    (INTEGER → REAL → TEXT), que é devolvido junto com os valores.
+    """
+    sql_type = column_type['type']
+    values = np.array(raw_values, dtype=object)
+
+    if sql_type in ('INTEGER', 'REAL'):
+        # Caminho rápido: coluna só com números, convertida direto pelo float() do numpy
+        try:
+            numbers = values.astype(np.float64)
+        except ValueError:
+            numbers = None
+
+        if numbers is not None and not np.isnan(numbers).any():
+            null_mask = np.zeros(len(values), dtype=bool)
+            is_numeric = ~null_mask
+        else:
+            _, stripped = strip_values(raw_values)
+            null_mask = null_mask_of(stripped)
+            numbers, parsed = parse_float_column(stripped, ~null_mask)
+            is_numeric = parsed & ~np.isnan(numbers)
+            if not (is_numeric | null_mask).all():
+                return convert_column(raw_values, TEXT_TYPE)
+
+        if sql_type == 'INTEGER':
+            is_integer = integral_mask(numbers, is_numeric)
+            if (is_integer != is_numeric).any():
+                return convert_column(raw_values, join_types(column_type, {'type': 'REAL', 'format': None}))
+            values[is_numeric] = numbers[is_numeric].astype(np.int64)
+        else:
+            values[is_numeric] = numbers[is_numeric]
+        values[null_mask] = None
+        return values, column_type
+
+    _, stripped = strip_values(raw_values)
+    null_mask = null_mask_of(stripped)
+
+    if sql_type == 'BOOLEAN':
+        is_true = matches_tokens(stripped, TRUE_TOKENS)
+        is_false = matches_tokens(stripped, FALSE_TOKENS)
+        if not (is_true | is_false | null_mask).all():
+            return convert_column(raw_values, TEXT_TYPE)
+        values[is_true] = 1
+        values[is_false] = 0
+
+    elif sql_type in ('DATE', 'DATETIME'):
+        candidates = ~null_mask
+        dates = parse_dates(stripped[candidates], column_type['format'])
+        if dates.isna().any():
+            return convert_column(raw_values, TEXT_TYPE)
+        values[candidates] = dates.dt.strftime(date_storage_format(column_type['format'])).to_numpy(dtype=object)
+
+    values[null_mask] = None
+    return values, column_type
+
+
+def convert_batch(rows: List[List[str]], column_types: List[Dict],
+                  profile: Optional[TableProfile] = None) -> Tuple[List[List], List[Dict]]:
+    """
+    Converte um lote de linhas completas coluna a coluna e retorna as linhas prontas
+    para o executemany e os tipos das colunas (promovidos se algum valor não coube).
+    Com profile, as colunas convertidas entram nas estatísticas do catálogo.
+    """
+    converted_columns = []
+    new_types = []
+    for raw_values, column_type in zip(zip(*rows), column_types):
+        values, column_type = convert_column(raw_values, column_type)
+        converted_columns.append(values)
+        new_types.append(column_type)
+    if profile is not None:
+        profile.update_columns(converted_columns, new_types)
+    return np.column_stack(converted_columns).tolist(), new_types
+
+
+def convert_rows(batch: List[List[str]], n_columns: int, column_types: List[Dict],
+                 rejected: Optional[Counter] = None, profile: Optional[TableProfile] = None,
+                 written_rows: int = 0) -> List[List]:
+    """
+    Converte um lote do reader, atualizando column_types (e profile, se informado).
+    Linhas com número incorreto de colunas não são inseridas (e são contadas em
+    rejected, se informado). Com written_rows > 0 (linhas já gravadas com os tipos
+    atuais), promover para TEXT uma coluna de NORMALIZED_TYPES levanta LossyPromotion,
+    com column_types já promovido.
+    """
+    full_rows = [row for row in batch if len(row) == n_columns]
+    if rejected is not None and len(full_rows) < len(batch):
+        rejected['wrong_column_count'] += len(batch) - len(full_rows)
+    if not full_rows:
+        return []
+
+    previous_types = list(column_types)
+    batch_data, column_types[:] = convert_batch(full_rows, column_types, profile)
+    if written_rows:
+        lossy = lossy_promotions(previous_types, column_types)
+        if lossy:
+            raise LossyPromotion(lossy)
+    return batch_data
+
+
+def iter_row_batches(rows, batch_size):
+    """
+    Agrupa as linhas não vazias do reader em lotes de até batch_size linhas. Com um
+    BatchSizer, o tamanho é lido dele a cada lote e cada lote lido é medido por ele.
+    """
+    sizer = batch_size if isinstance(batch_size, BatchSizer) else None
+    while True:
+        chunk = list(itertools.islice(rows, sizer.batch_rows if sizer is not None else batch_size))
+        if not chunk:
+            return
+        batch = [row for row in chunk if row]
+        if batch:
+            if sizer is not None:
+                sizer.observe_rows(batch)
+            yield batch
+
+
+def sample_for_inference(engine: TypeInferenceEngine, reader, n_columns: int, sample_reader=None,
+                         sizer: Optional[BatchSizer] = None) -> List[List[List[str]]]:
+    """
+    Alimenta o engine de inferência. Com sample_reader (estratégia "reservoir") a amostra
+    vem dele inteiro; senão vem das primeiras linhas de reader, que são devolvidas em
+    lotes para serem reaproveitadas na inserção. A amostra fica inteira em memória (o
+    BatchSizer já limita engine.sample_size): os lotes dela têm o tamanho de lote do
+    engine e só são medidos por sizer.
+    """
+    if sample_reader is not None:
+        engine.sample_stream(sample_reader)
+        return []
+
+    sample_batches = list(iter_row_batches(itertools.islice(reader, engine.sample_size), engine.batch_size))
+    if sizer is not None:
+        for batch in sample_batches:
+            sizer.observe_rows(batch)
+    for batch in sample_batches:
+        if engine.finished:
+            break
+        engine.observe([row for row in batch if len(row) == n_columns])
+    return sample_batches
+
+# ----------------------------------------------------------------------
+# WORKERS DOS POOLS DE CARGA (ZIP E TRECHOS DE CSV)
+# ----------------------------------------------------------------------
+
+# Definidos em cada processo do pool por init_pool_worker
+_results_queue = None
+_cancel_event = None
+
+
+def process_pool_context():
+    """Contexto de multiprocessing do pool: forkserver onde existe (seguro com as threads do Streamlit)."""
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    context = multiprocessing.get_context("forkserver")
+    # O servidor importa numpy/pandas uma vez; cada worker nasce de um fork dele
+    context.set_forkserver_preload(["ingest_core"])
+    return context
+
+
+def init_pool_worker(results_queue, cancel_event):
+    """Inicializador do pool: guarda a fila de resultados e o evento de cancelamento."""
+    global _results_queue, _cancel_event
+    _results_queue = results_queue
+    _cancel_event = cancel_event
+
+
+def _send(message: Tuple) -> bool:
+    """Envia uma mensagem ao escritor; retorna False se a carga foi cancelada."""
+    while not _cancel_event.is_set():
+        try:
+            _results_queue.put(message, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def list_zip_csv_members(zip_file) -> List[str]:
+    """Membros .csv do ZIP (caminho ou stream binário), na ordem do arquivo."""
+    with zipfile.ZipFile(zip_file, "r") as z:
+        return [name for name in z.namelist() if name.lower().endswith(".csv")]
+
+
+@contextmanager
+def open_csv_input(path, member: Optional[str]):
+    """Stream binário do membro member do ZIP em path ou, sem member, do CSV do arquivo (ingest_input)."""
+    if member is None:
+        with open_csv_stream(FileSource(path)) as f:
+            yield f
+    else:
+        with zipfile.ZipFile(path, "r") as z, z.open(member, "r") as f:
+            yield f
+
+
+def load_csv_input(key: str, path, member: Optional[str], sampling_strategy: str, sample_size: int,
+                   rss_ceiling_mb: float, column_types: Optional[List[Dict]] = None):
+    """
+    Worker: lê um CSV (membro de um ZIP ou arquivo em disco, ver open_csv_input), infere
+    os tipos (ou usa column_types, numa releitura) e envia ao escritor as mensagens
+    ('header', key, columns, column_types, summary, rows_sampled),
+    ('batch', key, rows, column_types) e, ao final, ('done', key, stats) ou
+    ('error', key, mensagem). stats inclui o perfil das colunas (column_stats), o hash
+    e o tamanho do CSV (para o cache de ingestão) e as decisões do BatchSizer, que
+    dimensiona os lotes sob rss_ceiling_mb.
+    """
+    start = time.perf_counter()
+    metrics = IngestMetrics()
+    rows_read = 0
+    rows_converted = 0
+    try:
+        with open_csv_input(path, member) as f:
+            # O hash do conteúdo é calculado durante a própria leitura
+            content = HashingReader(f)
+            stream = io.BufferedReader(content, UPLOAD_READ_BUFFER_SIZE)
+            reader = csv.reader(io.TextIOWrapper(stream, encoding='utf-8'))
+            header = next(reader, None)
+            if not header:
+                raise ValueError("o CSV não contém colunas válidas")
+
+            columns = normalize_header(header)
+            n_columns = len(columns)
+            sizer = BatchSizer(n_columns, rss_ceiling_mb)
+            if column_types is not None:
+                column_types = list(column_types)
+                sample_batches, summary, rows_sampled = [], [], 0
+            else:
+                engine = TypeInferenceEngine(n_columns, sample_size=sizer.sample_rows(sample_size),
+                                             strategy=sampling_strategy)
+                with metrics.stage('inference'):
+                    if sampling_strategy == "reservoir":
+                        with open_csv_input(path, member) as sample_f:
+                            sample_reader = csv.reader(io.TextIOWrapper(sample_f, encoding='utf-8'))
+                            next(sample_reader, None)
+                            sample_batches = sample_for_inference(engine, reader, n_columns, sample_reader)
+                    else:
+                        sample_batches = sample_for_inference(engine, reader, n_columns, sizer=sizer)
+                    column_types = engine.column_types()
+                summary, rows_sampled = engine.summary(), engine.rows_sampled
+            if not _send(('header', key, columns, list(column_types), summary, rows_sampled)):
+                return
+
+            profile = TableProfile(n_columns)
+            batches = itertools.chain(sample_batches, iter_row_batches(reader, sizer))
+            for batch in metrics.timed('parse', batches):
+                rows_read += len(batch)
+                with metrics.stage('convert'):
+                    batch_data = convert_rows(batch, n_columns, column_types, metrics.rejected, profile)
+                if batch_data:
+                    rows_converted += len(batch_data)
+                    if not _send(('batch', key, batch_data, list(column_types))):
+                        return
+            drain(stream)
+
+        _send(('done', key, {
+            'rows_read': rows_read,
+            'rows_rejected': rows_read - rows_converted,
+            'seconds': time.perf_counter() - start,
+            'metrics': metrics.to_stats(),
+            'profile': profile.to_state(),
+            'content_hash': content.hexdigest(),
+            'bytes_read': content.bytes_read,
+            'batch_sizing': sizer.summary(),
+        }))
+    except Exception as e:
+        _send(('error', key, str(e)))
+
+
+def find_record_end(data, pos: int, quote_parity: int) -> Tuple[int, int]:
+    """
+    Primeira posição após um '\\n' a partir de pos que fecha um registro, isto é, com um
+    número par de aspas desde o início do arquivo (quote_parity é a paridade em pos).
+    Retorna (posição, paridade nela); (len(data), paridade) se não houver.
+    """
+    while True:
+        newline = data.find(b'\n', pos)
+        if newline == -1:
+            return len(data), (quote_parity + data[pos:].count(b'"')) % 2
+        quote_parity = (quote_parity + data[pos:newline].count(b'"')) % 2
+        pos = newline + 1
+        if quote_parity == 0:
+            return pos, 0
+
+
+def split_csv_ranges(file_path, range_bytes: int) -> List[Tuple[int, int]]:
+    """
+    Divide os dados de um CSV (depois do cabeçalho) em trechos de ~range_bytes que
+    começam e terminam em fronteiras de registro. Quebras de linha dentro de campos
+    entre aspas são respeitadas contando a paridade das aspas desde o início, o que
+    vale para CSVs no padrão RFC 4180 (aspas só delimitando campos, escapadas como "").
+    """
+    if os.path.getsize(file_path) == 0:
+        return []
+
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        size = len(data)
+        start, parity = find_record_end(data, 0, 0)
+        if start == size:
+            if data.find(b'\n') == -1 and size:
+                raise ParallelLoadFallback("o arquivo não usa '\\n' como quebra de linha")
+            return []
+
+        ranges = []
+        while start < size:
+            nominal_end = min(start + range_bytes, size)
+            parity = (parity + data[start:nominal_end].count(b'"')) % 2
+            end, parity = find_record_end(data, nominal_end, parity) if nominal_end < size else (size, parity)
+            ranges.append((start, end))
+            start = end
+        return ranges
+
+
+def load_csv_range(file_path, range_index: int, start: int, end: int, n_columns: int,
+                   column_types: List[Dict], rss_ceiling_mb: float):
+    """
+    Worker: lê e converte o trecho [start, end) do CSV com os tipos inferidos, enviando
+    ao escritor ('batch', range_index, rows, column_types) e, ao final,
+    ('done', range_index, stats) ou ('error', range_index, mensagem). stats inclui o
+    perfil das colunas do trecho (column_stats) e as decisões do BatchSizer.
+    """
+    started = time.perf_counter()
+    metrics = IngestMetrics()
+    rows_converted = 0
+    try:
+        with open(file_path, 'rb') as f:
+            f.seek(start)
+            data = f.read(end - start)
+        # Mesma decodificação (e tradução de quebras de linha) do open() do caminho serial
+        reader = csv.reader(io.TextIOWrapper(io.BytesIO(data), encoding='utf-8'))
+        column_types = list(column_types)
+        profile = TableProfile(n_columns)
+        sizer = BatchSizer(n_columns, rss_ceiling_mb)
+        for batch in metrics.timed('parse', iter_row_batches(reader, sizer)):
+            with metrics.stage('convert'):
+                batch_data = convert_rows(batch, n_columns, column_types, metrics.rejected, profile)
+            if batch_data:
+                rows_converted += len(batch_data)
+                if not _send(('batch', range_index, batch_data, list(column_types))):
+                    return
+
+        _send(('done', range_index, {
+            'rows': rows_converted,
+            'seconds': time.perf_counter() - started,
+            'metrics': metrics.to_stats(),
+            'profile': profile.to_state(),
+            'batch_sizing': sizer.summary(),
+        }))
+    except Exception as e:
+        _send(('error', range_index, str(e)))
@@ -0,0 +1,290 @@
+"""
+Camada de entrada da carga: abre o CSV de dentro do arquivo enviado, seja ele solto,
+compactado (.gz, .bz2, .xz) ou dentro de um pacote (.zip, .tar e .tar.gz/.bz2/.xz).
+
+Cada formato é um InputFormat registrado em INPUT_FORMATS (register_format inclui
+outros). Nos formatos compactados, a descompressão roda em uma thread de leitura
+antecipada (ReadAheadReader), que enche buffers grandes e reaproveitados enquanto o
+parse e a inserção consomem os anteriores: o zlib, o bz2 e o lzma liberam o GIL, então
+a descompressão se sobrepõe ao resto da carga. O leitor mede o tempo de descompressão e
+a espera do consumidor, que entram nas métricas da carga (input_record_fields).
+"""
+import bz2
+import contextlib
+import gzip
+import io
+import lzma
+import queue
+import tarfile
+import threading
+import time
+import zipfile
+from typing import Any, Callable, Dict, List, Optional
+
+# Buffers da leitura antecipada: tamanho de cada um e quantos ficam em circulação
+# (a memória usada é READ_AHEAD_CHUNK_BYTES * READ_AHEAD_DEPTH)
+READ_AHEAD_CHUNK_BYTES = 4 * 1024 * 1024
+READ_AHEAD_DEPTH = 4
+
+# Buffer do stream entregue à carga (o mesmo dos streams sobre o upload)
+STREAM_BUFFER_BYTES = 1024 * 1024
+
+# Intervalo em que a thread de leitura verifica se o leitor foi fechado (segundos)
+READ_AHEAD_POLL_SECONDS = 0.1
+
+# Fim dos dados, na fila de buffers cheios
+_EOF = object()
+
+
+class InputFormat:
+    """
+    Formato de entrada: nome, sufixos do arquivo e a função que abre o CSV. opener recebe
+    o stream binário do arquivo e um ExitStack (onde registra o que precisa ser fechado
+    depois) e retorna o stream binário do CSV. list_members lista os CSVs de um pacote.
+    """
+
+    def __init__(self, name: str, suffixes: List[str], opener: Optional[Callable] = None,
+                 list_members: Optional[Callable] = None, label: str = ""):
+        self.name = name
+        self.suffixes = suffixes
+        self.opener = opener
+        self.list_members = list_members
+        self.label = label or name
+
+    @property
+    def compressed(self) -> bool:
+        return self.opener is not None
+
+
+def _first_csv(names: List[str], kind: str) -> str:
+    csv_files = [name for name in names if name.lower().endswith(".csv")]
+    if not csv_files:
+        raise ValueError(f"{kind} não contém arquivos CSV.")
+    return csv_files[0]
+
+
+def _open_gzip(fileobj, stack: contextlib.ExitStack):
+    return gzip.GzipFile(fileobj=fileobj, mode="rb")
+
+
+def _open_bz2(fileobj, stack: contextlib.ExitStack):
+    return bz2.BZ2File(fileobj, "rb")
+
+
+def _open_xz(fileobj, stack: contextlib.ExitStack):
+    return lzma.LZMAFile(fileobj, "rb")
+
+
+def _open_zip(fileobj, stack: contextlib.ExitStack):
+    z = stack.enter_context(zipfile.ZipFile(fileobj, "r"))
+    return z.open(_first_csv(z.namelist(), "ZIP"), "r")
+
+
+def _open_tar(fileobj, stack: contextlib.ExitStack):
+    # Modo stream (r|*): o pacote é lido uma vez, sem voltar, e a compressão é detectada
+    tar = stack.enter_context(tarfile.open(fileobj=fileobj, mode="r|*"))
+    for member in tar:
+        if member.isfile() and member.name.lower().endswith(".csv"):
+            return tar.extractfile(member)
+    raise ValueError("TAR não contém arquivos CSV.")
+
+
+def _list_zip(fileobj) -> List[str]:
+    with zipfile.ZipFile(fileobj, "r") as z:
+        return [name for name in z.namelist() if name.lower().endswith(".csv")]
+
+
+def _list_tar(fileobj) -> List[str]:
+    with tarfile.open(fileobj=fileobj, mode="r|*") as tar:
+        return [member.name for member in tar if member.isfile() and member.name.lower().endswith(".csv")]
+
+
+# Formatos suportados. Sufixos compostos (.tar.gz) têm precedência sobre os simples (.gz).
+INPUT_FORMATS: Dict[str, InputFormat] = {}
+
+
+def register_format(input_format: InputFormat):
+    """Registra (ou substitui) um formato de entrada."""
+    INPUT_FORMATS[input_format.name] = input_format
+
+
+register_format(InputFormat("csv", [".csv"], label="CSV"))
+register_format(InputFormat("zip", [".zip"], _open_zip, _list_zip, label="ZIP"))
+register_format(InputFormat("gz", [".gz"], _open_gzip, label="gzip"))
+register_format(InputFormat("bz2", [".bz2"], _open_bz2, label="bzip2"))
+register_format(InputFormat("xz", [".xz"], _open_xz, label="xz"))
+register_format(InputFormat("tar", [".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz"],
+                            _open_tar, _list_tar, label="TAR"))
+
+
+def supported_suffixes() -> List[str]:
+    """Sufixos aceitos, sem o ponto (para o seletor de arquivos)."""
+    return sorted({suffix.rsplit(".", 1)[-1] for fmt in INPUT_FORMATS.values() for suffix in fmt.suffixes})
+
+
+def detect_format(name: str) -> InputFormat:
+    """Formato de entrada pelo nome do arquivo (o sufixo mais longo que casar)."""
+    name = name.lower()
+    matches = [(len(suffix), fmt) for fmt in INPUT_FORMATS.values() for suffix in fmt.suffixes
+               if name.endswith(suffix)]
+    if not matches:
+        accepted = ", ".join(suffix for fmt in INPUT_FORMATS.values() for suffix in fmt.suffixes)
+        raise ValueError(f"Formato inválido. Formatos aceitos: {accepted}.")
+    return max(matches, key=lambda match: match[0])[1]
+
+
+def list_csv_members(source) -> List[str]:
+    """CSVs dentro de um pacote (ZIP/TAR); lista vazia para os demais formatos."""
+    input_format = detect_format(source.name)
+    if input_format.list_members is None:
+        return []
+    with source.open() as fileobj:
+        return input_format.list_members(fileobj)
+
+# ----------------------------------------------------------------------
+# LEITURA ANTECIPADA
+# ----------------------------------------------------------------------
+
+class ReadAheadReader(io.RawIOBase):
+    """
+    Stream binário que lê stream em uma thread própria, um buffer à frente do consumidor.
+    Os buffers (depth, de chunk_bytes cada) circulam entre a fila de livres e a de cheios,
+    sem alocação por leitura. Erros da leitura reaparecem no consumidor. on_close é
+    chamado depois que a thread termina, para fechar stream e o que estiver por baixo.
+    """
+
+    def __init__(self, stream, on_close: Optional[Callable[[], Any]] = None,
+                 chunk_bytes: int = READ_AHEAD_CHUNK_BYTES, depth: int = READ_AHEAD_DEPTH):
+        self._stream = stream
+        self._on_close = on_close
+        self._free: queue.Queue = queue.Queue()
+        self._filled: queue.Queue = queue.Queue()
+        for _ in range(depth):
+            self._free.put(bytearray(chunk_bytes))
+        self._stop = threading.Event()
+        self._current: Optional[bytearray] = None
+        self._pos = 0
+        self._end = 0
+        self._eof = False
+        self.read_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.bytes_read = 0
+        self._thread = threading.Thread(target=self._fill, name="read-ahead", daemon=True)
+        self._thread.start()
+
+    def _fill(self):
+        try:
+            while True:
+                try:
+                    buffer = self._free.get(timeout=READ_AHEAD_POLL_SECONDS)
+                except queue.Empty:
+                    if self._stop.is_set():
+                        return
+                    continue
+                if self._stop.is_set():
+                    return
+                start = time.perf_counter()
+                n = 0
+                with memoryview(buffer) as view:
+                    while n < len(buffer):
+                        read = self._stream.readinto(view[n:])
+                        if not read:
+                            break
+                        n += read
+                self.read_seconds += time.perf_counter() - start
+                self.bytes_read += n
+                self._filled.put((buffer, n))
+                if n < len(buffer):
+                    return
+        except BaseException as e:
+            self._filled.put(e)
+        finally:
+            self._filled.put(_EOF)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while self._pos >= self._end:
+            if self._current is not None:
+                self._free.put(self._current)
+                self._current = None
+            if self._eof:
+                return 0
+            start = time.perf_counter()
+            item = self._filled.get()
+            self.wait_seconds += time.perf_counter() - start
+            if item is _EOF:
+                self._eof = True
+                return 0
+            if isinstance(item, BaseException):
+                self._eof = True
+                raise item
+            self._current, self._end = item
+            self._pos = 0
+        n = min(len(b), self._end - self._pos)
+        with memoryview(self._current) as view:
+            b[:n] = view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._stop.set()
+            self._thread.join()
+            if self._on_close is not None:
+                self._on_close()
+        super().close()
+
+
+def open_csv_stream(source) -> io.BufferedIOBase:
+    """
+    Stream binário do CSV do upload (ingest_core.UploadSource). Nos pacotes, é o primeiro
+    CSV; nos formatos compactados, o stream lê de um ReadAheadReader.
+    """
+    input_format = detect_format(source.name)
+    if not input_format.compressed:
+        return source.open()
+    stack = contextlib.ExitStack()
+    try:
+        fileobj = stack.enter_context(source.open())
+        stream = stack.enter_context(input_format.opener(fileobj, stack))
+    except BaseException:
+        stack.close()
+        raise
+    return io.BufferedReader(ReadAheadReader(stream, on_close=stack.close), STREAM_BUFFER_BYTES)
+
+
+def input_record_fields(source, stream) -> Dict[str, Any]:
+    """Campos do registro de métricas sobre a entrada: formato e vazão da descompressão."""
+    fields = {
+        'input_format': detect_format(source.name).name,
+        'compressed_mb': None,
+        'uncompressed_mb': None,
+        'decompress_seconds': None,
+        'decompress_mb_per_second': None,
+        'read_ahead_wait_seconds': None,
+    }
+    stream = getattr(stream, 'raw', stream)
+    if isinstance(stream, ReadAheadReader):
+        uncompressed_mb = stream.bytes_read / (1024 * 1024)
+        fields.update({
+            'compressed_mb': round(source.size / (1024 * 1024), 1),
+            'uncompressed_mb': round(uncompressed_mb, 1),
+            'decompress_seconds': round(stream.read_seconds, 3),
+            'decompress_mb_per_second': round(uncompressed_mb / max(stream.read_seconds, 1e-9), 1),
+            'read_ahead_wait_seconds': round(stream.wait_seconds, 3),
+        })
+    return fields
+
+
+def format_input_throughput(record: Dict[str, Any]) -> Optional[str]:
+    """Descreve a descompressão registrada em input_record_fields (None se a entrada não é compactada)."""
+    if record.get('decompress_seconds') is None:
+        return None
+    label = INPUT_FORMATS[record['input_format']].label
+    return (
+        f"Entrada {label}: {record['uncompressed_mb']:.1f} MB descompactados de {record['compressed_mb']:.1f} MB "
+        f"em {record['decompress_seconds']:.2f}s ({record['decompress_mb_per_second']:.1f} MB/s, leitura antecipada); "
+        f"a carga esperou {record['read_ahead_wait_seconds']:.2f}s pela descompressão."
+    )
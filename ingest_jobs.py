@@ -0,0 +1,323 @@
+"""
+Fila de jobs de ingestão em segundo plano.
+
+As cargas rodam nas threads de um pool próprio, fora da thread do script do
+Streamlit, e informam o andamento por um IngestReporter. O estado de cada job fica
+em memória para o polling da interface e é persistido na tabela ingest_jobs de um
+banco SQLite separado do banco de dados (assim a gravação do progresso não disputa
+a trava de escrita com a própria carga).
+"""
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+FINAL_STATUSES = ('done', 'failed', 'cancelled', 'interrupted')
+
+# Intervalo mínimo entre gravações do progresso de um job no banco de jobs
+PERSIST_INTERVAL_SECONDS = 1.0
+
+
+class JobCancelled(Exception):
+    """Levantada no próximo ponto de progresso de um job cancelado; a transação da carga é desfeita."""
+
+
+class IngestReporter:
+    """
+    Interface pela qual as cargas informam mensagens e progresso. Esta implementação
+    descarta tudo; JobReporter guarda no job e CallbackReporter repassa a funções.
+    """
+
+    def info(self, message: str):
+        pass
+
+    def success(self, message: str):
+        pass
+
+    def warning(self, message: str):
+        pass
+
+    def error(self, message: str):
+        pass
+
+    def caption(self, message: str):
+        pass
+
+    def table(self, title: str, records: List[Dict]):
+        pass
+
+    def details(self, title: str, data: Dict):
+        pass
+
+    def metrics(self, record: Dict):
+        """Registro de métricas da carga (ingest_metrics.IngestMetrics.finish)."""
+
+    def progress(self, rows: Optional[int] = None, bytes_done: Optional[int] = None,
+                 fraction: Optional[float] = None):
+        """Atualiza o progresso (valores acumulados); é também o ponto de cancelamento."""
+
+
+class CallbackReporter(IngestReporter):
+    """
+    Reporter para quem usa a carga como biblioteca (ex.: a CLI): repassa as mensagens a
+    on_message(level, message), as tabelas a on_table(title, records), o registro de
+    métricas a on_metrics(record) e o progresso a on_progress(rows, bytes_done, fraction).
+    Os callbacks são opcionais. Com cancel_event setado, o próximo ponto de progresso
+    levanta JobCancelled. Os erros reportados ficam em errors.
+    """
+
+    def __init__(self, on_message: Optional[Callable[[str, str], Any]] = None,
+                 on_progress: Optional[Callable[[Optional[int], Optional[int], Optional[float]], Any]] = None,
+                 on_table: Optional[Callable[[str, List[Dict]], Any]] = None,
+                 on_metrics: Optional[Callable[[Dict], Any]] = None,
+                 cancel_event: Optional[threading.Event] = None):
+        self._on_message = on_message
+        self._on_progress = on_progress
+        self._on_table = on_table
+        self._on_metrics = on_metrics
+        self._cancel_event = cancel_event
+        self.errors: List[str] = []
+
+    def _message(self, level: str, message: str):
+        if self._on_message is not None:
+            self._on_message(level, message)
+
+    def info(self, message: str):
+        self._message('info', message)
+
+    def success(self, message: str):
+        self._message('success', message)
+
+    def warning(self, message: str):
+        self._message('warning', message)
+
+    def error(self, message: str):
+        self.errors.append(message)
+        self._message('error', message)
+
+    def caption(self, message: str):
+        self._message('caption', message)
+
+    def table(self, title: str, records: List[Dict]):
+        if self._on_table is not None:
+            self._on_table(title, records)
+
+    def details(self, title: str, data: Dict):
+        self.table(title, [data])
+
+    def metrics(self, record: Dict):
+        if self._on_metrics is not None:
+            self._on_metrics(record)
+
+    def progress(self, rows: Optional[int] = None, bytes_done: Optional[int] = None,
+                 fraction: Optional[float] = None):
+        if self._cancel_event is not None and self._cancel_event.is_set():
+            raise JobCancelled()
+        if self._on_progress is not None:
+            self._on_progress(rows, bytes_done, fraction)
+
+
+class JobReporter(IngestReporter):
+    """Reporter de um job: mensagens e progresso vão para o estado do job."""
+
+    def __init__(self, manager: "JobManager", job_id: str, cancel_event: threading.Event):
+        self._manager = manager
+        self._job_id = job_id
+        self._cancel_event = cancel_event
+
+    def _message(self, level: str, message: str):
+        self._manager._update(self._job_id, append_message=(level, message))
+
+    def info(self, message: str):
+        self._message('info', message)
+
+    def success(self, message: str):
+        self._message('success', message)
+
+    def warning(self, message: str):
+        self._message('warning', message)
+
+    def error(self, message: str):
+        # Um erro reportado pela carga faz o job terminar como 'failed'
+        self._manager._update(self._job_id, append_message=('error', message), failed=True)
+
+    def caption(self, message: str):
+        self._message('caption', message)
+
+    def table(self, title: str, records: List[Dict]):
+        self._manager._update(self._job_id, append_table=(title, records))
+
+    def details(self, title: str, data: Dict):
+        self._manager._update(self._job_id, append_details=(title, data))
+
+    def progress(self, rows: Optional[int] = None, bytes_done: Optional[int] = None,
+                 fraction: Optional[float] = None):
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+        self._manager._update(self._job_id, rows=rows, bytes_done=bytes_done, fraction=fraction)
+
+
+class JobManager:
+    """
+    Pool de threads que executa os jobs de ingestão em ordem de chegada. Cada job é
+    uma função que recebe o JobReporter e retorna um resultado serializável em JSON.
+    """
+
+    def __init__(self, jobs_db_file: str, workers: int = 1):
+        self._jobs_db_file = jobs_db_file
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._cancel_events: Dict[str, threading.Event] = {}
+        self._futures = {}
+        self._last_persist: Dict[str, float] = {}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest-job")
+
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS ingest_jobs (
+                    id TEXT PRIMARY KEY,
+                    session_id TEXT,
+                    source_name TEXT,
+                    table_name TEXT,
+                    status TEXT NOT NULL,
+                    rows_processed INTEGER,
+                    bytes_processed INTEGER,
+                    total_bytes INTEGER,
+                    messages TEXT,
+                    result TEXT,
+                    created_at TEXT,
+                    started_at TEXT,
+                    finished_at TEXT
+                )
+            """)
+            # Jobs que estavam na fila ou rodando quando o servidor parou não vão continuar
+            conn.execute("UPDATE ingest_jobs SET status = 'interrupted' WHERE status IN ('queued', 'running')")
+        conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self._jobs_db_file, timeout=30.0)
+
+    def submit(self, session_id: str, source_name: str, table_name: str, total_bytes: Optional[int],
+               run: Callable[[JobReporter], Any]) -> str:
+        """Coloca um job na fila e retorna o id."""
+        job_id = uuid.uuid4().hex
+        job = {
+            'id': job_id, 'session_id': session_id, 'source_name': source_name, 'table_name': table_name,
+            'status': 'queued', 'rows_processed': 0, 'bytes_processed': 0, 'total_bytes': total_bytes,
+            'fraction': None, 'messages': [], 'tables': [], 'details': [], 'result': None, 'failed': False,
+            'created_at': _now(), 'started_at': None, 'finished_at': None,
+        }
+        cancel_event = threading.Event()
+        with self._lock:
+            self._jobs[job_id] = job
+            self._cancel_events[job_id] = cancel_event
+            self._persist(job)
+            self._futures[job_id] = self._executor.submit(self._run, job_id, run, cancel_event)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cópia do estado atual do job (ou None se não for deste processo)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {**job, 'messages': list(job['messages']), 'tables': list(job['tables']),
+                    'details': list(job['details'])}
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancela um job na fila ou pede a interrupção de um job em andamento."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['status'] in FINAL_STATUSES:
+                return False
+            self._cancel_events[job_id].set()
+            if self._futures[job_id].cancel():
+                job['status'] = 'cancelled'
+                job['finished_at'] = _now()
+                self._persist(job)
+            return True
+
+    def _run(self, job_id: str, run: Callable[[JobReporter], Any], cancel_event: threading.Event):
+        reporter = JobReporter(self, job_id, cancel_event)
+        with self._lock:
+            job = self._jobs[job_id]
+            if cancel_event.is_set():
+                # Cancelado entre sair da fila e começar
+                job['status'] = 'cancelled'
+                job['finished_at'] = _now()
+                self._persist(job)
+                return
+            job['status'] = 'running'
+            job['started_at'] = _now()
+            self._persist(job)
+
+        try:
+            result = run(reporter)
+            status = 'done'
+        except JobCancelled:
+            result = None
+            status = 'cancelled'
+            reporter.warning("Job cancelado: a transação da carga foi desfeita.")
+        except Exception as e:
+            result = None
+            status = 'failed'
+            reporter.error(f"Erro Crítico durante o processamento: {str(e)}")
+
+        with self._lock:
+            if status == 'done' and job['failed']:
+                status = 'failed'
+            job['status'] = status
+            job['result'] = result
+            job['finished_at'] = _now()
+            self._persist(job)
+
+    def _update(self, job_id: str, rows: Optional[int] = None, bytes_done: Optional[int] = None,
+                fraction: Optional[float] = None, append_message=None, append_table=None,
+                append_details=None, failed: bool = False):
+        with self._lock:
+            job = self._jobs[job_id]
+            if rows is not None:
+                job['rows_processed'] = rows
+            if bytes_done is not None:
+                job['bytes_processed'] = bytes_done
+                if fraction is None and job['total_bytes']:
+                    fraction = bytes_done / job['total_bytes']
+            if fraction is not None:
+                job['fraction'] = min(1.0, fraction)
+            if append_message is not None:
+                job['messages'].append(append_message)
+            if append_table is not None:
+                job['tables'].append(append_table)
+            if append_details is not None:
+                job['details'].append(append_details)
+            job['failed'] = job['failed'] or failed
+
+            now = time.monotonic()
+            if now - self._last_persist.get(job_id, 0.0) >= PERSIST_INTERVAL_SECONDS:
+                self._persist(job)
+
+    def _persist(self, job: Dict[str, Any]):
+        """Grava o estado do job no banco de jobs (chamado com self._lock adquirido)."""
+        self._last_persist[job['id']] = time.monotonic()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO ingest_jobs (id, session_id, source_name, table_name, status, "
+                    "rows_processed, bytes_processed, total_bytes, messages, result, created_at, started_at, "
+                    "finished_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job['id'], job['session_id'], job['source_name'], job['table_name'], job['status'],
+                     job['rows_processed'], job['bytes_processed'], job['total_bytes'],
+                     json.dumps(job['messages'], default=str), json.dumps(job['result'], default=str),
+                     job['created_at'], job['started_at'], job['finished_at']),
+                )
+        finally:
+            conn.close()
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec='seconds')
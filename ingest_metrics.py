@@ -0,0 +1,114 @@
+"""
+Métricas de ingestão por etapa.
+
+IngestMetrics acumula o tempo de cada etapa da carga e as linhas descartadas por
+motivo. Os workers dos pools usam a mesma classe e mandam o resultado (to_stats) ao
+escritor, que soma tudo (merge). Ao fim da carga, finish monta o registro mostrado
+na interface e acrescentado como uma linha JSON ao arquivo de métricas.
+"""
+import contextlib
+import json
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+# Etapas medidas, na ordem em que aparecem na carga. Parse e conversão da leitura
+# paralela são somados entre os processos (podem passar do tempo de parede).
+STAGES = ('inference', 'ddl', 'parse', 'convert', 'insert', 'index', 'verify')
+STAGE_LABELS = {
+    'inference': "Inferência de tipos (amostra)",
+    'ddl': "DDL e promoção de colunas",
+    'parse': "Leitura e parse do CSV",
+    'convert': "Conversão dos valores",
+    'insert': "Inserção no SQLite",
+    'index': "Índices e ANALYZE",
+    'verify': "Verificação",
+}
+
+# Motivos de descarte de linhas
+REJECT_REASONS = {
+    'wrong_column_count': "número de colunas diferente do cabeçalho",
+}
+
+
+class IngestMetrics:
+    """Tempo por etapa e linhas descartadas por motivo de uma carga (ou de um worker)."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stage_seconds = dict.fromkeys(STAGES, 0.0)
+        self.rejected = Counter()
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds[name] += time.perf_counter() - start
+
+    def timed(self, name: str, iterable: Iterable):
+        """Repassa os itens de iterable contando o tempo de obter cada um na etapa name."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.stage_seconds[name] += time.perf_counter() - start
+            yield item
+
+    def to_stats(self) -> Dict[str, Any]:
+        """Métricas em um dict serializável (enviado pelos workers ao escritor)."""
+        return {'stage_seconds': dict(self.stage_seconds), 'rejected': dict(self.rejected)}
+
+    def merge(self, stats: Optional[Dict[str, Any]]):
+        """Soma as métricas de um worker (resultado de to_stats)."""
+        if not stats:
+            return
+        for name, seconds in stats['stage_seconds'].items():
+            self.stage_seconds[name] += seconds
+        self.rejected.update(stats['rejected'])
+
+    def finish(self, rows: int, bytes_read: int, load_seconds: float,
+               usage_before: Dict[str, Optional[float]], usage_after: Dict[str, Optional[float]],
+               **fields) -> Dict[str, Any]:
+        """
+        Registro da carga: campos informados (origem, tabela, modo...), totais, vazão,
+        tempo por etapa, descartes e recursos (pico de RSS; I/O de disco da carga).
+        """
+        load_seconds = max(load_seconds, 1e-9)
+        record = {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            **fields,
+            'rows_inserted': rows,
+            'bytes_read': bytes_read,
+            'total_seconds': round(time.perf_counter() - self.started, 3),
+            'load_seconds': round(load_seconds, 3),
+            'rows_per_second': round(rows / load_seconds, 1),
+            'bytes_per_second': round(bytes_read / load_seconds, 1),
+            'stage_seconds': {name: round(seconds, 3) for name, seconds in self.stage_seconds.items()},
+            'rejected_rows': dict(self.rejected),
+            'peak_rss_mb': _round_mb(usage_after['peak_rss_mb']),
+            'peak_rss_before_mb': _round_mb(usage_before['peak_rss_mb']),
+            'children_peak_rss_mb': _round_mb(usage_after['children_peak_rss_mb']),
+            'disk_read_mb': None,
+            'disk_write_mb': None,
+        }
+        if usage_after['disk_read_mb'] is not None:
+            record['disk_read_mb'] = _round_mb(usage_after['disk_read_mb'] - usage_before['disk_read_mb'])
+            record['disk_write_mb'] = _round_mb(usage_after['disk_write_mb'] - usage_before['disk_write_mb'])
+        return record
+
+
+def _round_mb(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 1)
+
+
+def append_metrics_record(path, record: Dict[str, Any]):
+    """Acrescenta o registro de uma carga como uma linha JSON ao arquivo de métricas."""
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
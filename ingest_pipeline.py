@@ -0,0 +1,1220 @@
+"""
+Fluxos de carga de CSV/ZIP no SQLite, sem dependência do Streamlit.
+
+process_full_workflow (um CSV, ou o primeiro CSV de um ZIP) e process_zip_workflow
+(todos os CSVs de um ZIP) recebem a conexão de destino e informam mensagens e
+progresso por um IngestReporter. São usados pelos jobs da interface e pelo
+benchmark de ingestão (benchmark_ingest.py).
+"""
+import contextlib
+import csv
+import io
+import itertools
+import os
+import queue
+import re
+import sqlite3
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from batch_sizing import BatchSizer, format_batch_sizing, worker_rss_ceiling_mb
+from column_stats import TableProfile, get_table_profile, save_table_profile
+from fts_index import (
+    FTS_AUTO, auto_text_columns, create_fts_index, drop_fts_index, fts5_available, get_fts_index, sync_fts_index,
+)
+from ingest_cache import (
+    HashingReader, bump_table_version, combined_content_hash, drain, get_previous_load, match_loaded_prefix,
+    save_load, skip_line_break,
+)
+from ingest_core import (
+    QUEUE_BATCHES_PER_WORKER, UPLOAD_READ_BUFFER_SIZE, FileSource, LossyPromotion, ParallelLoadFallback,
+    UploadSource, build_create_table_ddl, convert_rows, copy_table_rows, init_pool_worker, iter_row_batches,
+    list_zip_csv_members, load_csv_input, load_csv_range, lossy_promotions, normalize_header,
+    process_pool_context, promote_table_columns, resource_usage, sample_for_inference, split_csv_ranges,
+    table_exists,
+)
+from ingest_input import format_input_throughput, input_record_fields, list_csv_members, open_csv_stream
+from ingest_jobs import IngestReporter, JobCancelled
+from ingest_metrics import REJECT_REASONS, STAGE_LABELS, IngestMetrics, append_metrics_record
+from type_inference import TypeInferenceEngine, join_types
+
+# ----------------------------------------------------------------------
+# CONFIGURAÇÕES DA CARGA
+# ----------------------------------------------------------------------
+
+# Linhas analisadas para inferir os tipos das colunas (no máximo: o BatchSizer reduz a amostra
+# de arquivos largos). O tamanho dos lotes de inserção é adaptativo (batch_sizing.BatchSizer).
+INFERENCE_SAMPLE_SIZE = 50000
+
+# Processos dos pools de carga (membros de um ZIP, trechos de um CSV grande)
+MAX_WORKERS = os.cpu_count() or 1
+
+# Acima deste tamanho o upload vai para um arquivo temporário lido por mmap
+SPILL_THRESHOLD_BYTES = 256 * 1024 * 1024
+
+# Carga paralela de CSV: sugerida a partir deste tamanho, em trechos deste tamanho
+PARALLEL_CSV_MIN_BYTES = 64 * 1024 * 1024
+PARALLEL_RANGE_BYTES = 4 * 1024 * 1024
+
+# PRAGMAs do modo de carga em massa (synchronous/cache_size/temp_store são restaurados ao fim)
+BULK_LOAD_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "OFF",
+    "cache_size": -262144,  # negativo = KiB: 256 MiB de cache de páginas
+    "temp_store": "MEMORY",
+}
+# Tamanho de página aplicado quando o banco ainda está vazio
+BULK_LOAD_PAGE_SIZE = 65536
+REPORTED_PRAGMAS = ("journal_mode", "synchronous", "cache_size", "page_size", "temp_store")
+
+# Métricas de cada carga (tempo por etapa, vazão, descartes, memória), uma linha JSON por carga
+METRICS_FILE = "ingest_metrics.jsonl"
+
+# ----------------------------------------------------------------------
+# FUNÇÕES DE BANCO DE DADOS E PROCESSAMENTO
+# ----------------------------------------------------------------------
+
+def execute_batch_insert_sqlite(cursor: sqlite3.Cursor, table_name: str, columns: List[str], batch_data: List[Tuple],
+                                sizer: Optional[BatchSizer] = None):
+    """Executa um INSERT em lote usando executemany; com sizer, o tempo da inserção é informado a ele."""
+    column_names = ', '.join(f'"{col}"' for col in columns)
+    placeholders = ', '.join(['?'] * len(columns))
+    insert_query_str = f"INSERT INTO \"{table_name}\" ({column_names}) VALUES ({placeholders})"
+    start = time.perf_counter()
+    cursor.executemany(insert_query_str, batch_data)
+    if sizer is not None:
+        sizer.observe_insert(len(batch_data), time.perf_counter() - start)
+
+def read_pragmas(conn: sqlite3.Connection, names) -> Dict[str, Any]:
+    """Lê os valores atuais dos PRAGMAs informados."""
+    return {name: conn.execute(f"PRAGMA {name}").fetchone()[0] for name in names}
+
+@contextlib.contextmanager
+def bulk_load_mode(conn: sqlite3.Connection, cache_kib: Optional[int] = None):
+    """
+    Ajusta os PRAGMAs para carga em massa e devolve os valores efetivos. cache_kib troca
+    o cache de páginas de BULK_LOAD_PRAGMAS (ex.: BatchSizer.page_cache_kib). Ao sair,
+    restaura synchronous/cache_size/temp_store e faz o checkpoint do WAL (o WAL é
+    mantido: também permite leituras durante cargas futuras).
+    """
+    previous = read_pragmas(conn, ("synchronous", "cache_size", "temp_store"))
+    if conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0] == 0:
+        # page_size só pode mudar com o banco ainda vazio
+        conn.execute(f"PRAGMA page_size = {BULK_LOAD_PAGE_SIZE}")
+    pragmas = dict(BULK_LOAD_PRAGMAS)
+    if cache_kib is not None:
+        pragmas['cache_size'] = -cache_kib
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+
+    try:
+        yield read_pragmas(conn, REPORTED_PRAGMAS)
+    finally:
+        for name, value in previous.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        # Leva o conteúdo do WAL para o banco já com o synchronous seguro
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+def create_deferred_indexes(cursor: sqlite3.Cursor, table_name: str, index_columns: List[str]):
+    """Cria um índice por coluna pedida (chamado depois que os dados já estão na tabela)."""
+    for col in index_columns:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS \"idx_{table_name}_{col}\" ON \"{table_name}\" (\"{col}\")")
+
+def apply_fts_index(cursor: sqlite3.Cursor, table_name: str, columns: List[str], fts_columns: Sequence[str],
+                    table_is_new: bool, report: IngestReporter) -> Optional[int]:
+    """
+    Índice de busca textual da tabela (fts_index), no fim da carga e na mesma transação:
+    cria o índice das colunas de fts_columns que existem na tabela (FTS_AUTO inclui as de
+    texto livre do catálogo de estatísticas) e indexa as linhas ainda não indexadas.
+    Retorna as linhas indexadas, ou None se a tabela não tem índice.
+    """
+    fts = get_fts_index(cursor, table_name)
+    if fts is not None and any(col not in columns for col in fts['columns']):
+        drop_fts_index(cursor, table_name)
+        report.warning(f"Índice de busca textual de '{table_name}' removido: as colunas mudaram.")
+    if fts_columns:
+        if not fts5_available(cursor):
+            report.warning("O SQLite não tem o módulo FTS5: índice de busca textual ignorado.")
+        else:
+            requested = set(fts_columns)
+            if FTS_AUTO in requested:
+                requested.update(auto_text_columns(get_table_profile(cursor, table_name)))
+            fts_table_columns = [col for col in columns if col in requested]
+            if fts_table_columns:
+                create_fts_index(cursor, table_name, fts_table_columns)
+            else:
+                report.caption(f"Nenhuma coluna de texto livre em '{table_name}' para o índice de busca textual.")
+
+    indexed = sync_fts_index(cursor, table_name, table_is_new)
+    if indexed is not None:
+        fts = get_fts_index(cursor, table_name)
+        report.caption(
+            f"Busca textual (FTS5) em '{table_name}': {indexed} linha(s) indexada(s) "
+            f"nas colunas {', '.join(fts['columns'])}."
+        )
+    return indexed
+
+def execute_select_limit(conn: sqlite3.Connection, table_name: str, limit: int = 50) -> List[Dict[str, Any]]:
+    """Seleciona as primeiras N linhas da tabela para verificação."""
+    query = f"SELECT * FROM \"{table_name}\" LIMIT {limit}"
+    
+    conn.row_factory = sqlite3.Row 
+    cursor = conn.cursor()
+    cursor.execute(query)
+    
+    rows = cursor.fetchall()
+    return [dict(row) for row in rows]
+
+
+def format_resource_usage(record: Dict[str, Any]) -> Optional[str]:
+    """Descreve o pico de RSS e o I/O de disco do registro de métricas de uma carga."""
+    parts = []
+    if record['peak_rss_mb'] is not None:
+        parts.append(f"pico de RSS {record['peak_rss_mb']:.0f} MB (antes da carga: {record['peak_rss_before_mb']:.0f} MB)")
+        parts.append(f"pico dos workers {record['children_peak_rss_mb']:.0f} MB")
+    if record['disk_read_mb'] is not None:
+        parts.append(f"disco: {record['disk_read_mb']:.1f} MB lidos e {record['disk_write_mb']:.1f} MB gravados")
+    if parts:
+        return "Recursos da carga: " + "; ".join(parts) + "."
+    return None
+
+
+def load_record_fields(source_name: str, source_bytes: int, table_name: str, mode: str, bulk_load: bool,
+                       sampling_strategy: str, workers: int = 1) -> Dict[str, Any]:
+    """Campos que identificam a carga no registro de métricas."""
+    return {
+        'source': source_name,
+        'source_bytes': source_bytes,
+        'table': table_name,
+        'mode': mode,
+        'bulk_load': bulk_load,
+        'sampling_strategy': sampling_strategy,
+        'workers': workers,
+    }
+
+
+def report_ingest_metrics(report: IngestReporter, record: Dict[str, Any], metrics_file: Optional[str] = METRICS_FILE):
+    """Grava o registro de métricas da carga em metrics_file (se informado) e mostra as métricas."""
+    if metrics_file:
+        append_metrics_record(metrics_file, record)
+    report.metrics(record)
+
+    total_seconds = record['total_seconds'] or 1e-9
+    report.table("Tempo por etapa", [
+        {
+            'etapa': STAGE_LABELS[name],
+            'segundos': seconds,
+            '% do total': round(100 * seconds / total_seconds, 1),
+        }
+        for name, seconds in record['stage_seconds'].items()
+    ])
+    rejected = record['rejected_rows']
+    if rejected:
+        report.warning(
+            f"{sum(rejected.values())} linha(s) descartada(s): " +
+            "; ".join(f"{count} com {REJECT_REASONS[reason]}" for reason, count in rejected.items()) + "."
+        )
+    usage = format_resource_usage(record)
+    if usage:
+        report.caption(usage)
+    throughput = format_input_throughput(record)
+    if throughput:
+        report.caption(throughput)
+    batch_sizing = format_batch_sizing(record.get('batch_sizing'))
+    if batch_sizing:
+        report.caption(batch_sizing)
+
+# ----------------------------------------------------------------------
+# FUNÇÃO DE ANÁLISE E INSERÇÃO COMPLETA
+# ----------------------------------------------------------------------
+
+def insert_csv_ranges_parallel(cursor: sqlite3.Cursor, file_path: Path, table_name: str, columns: List[str],
+                               column_types: List[Dict], table_is_new: bool, preserve_order: bool = True,
+                               report: Optional[IngestReporter] = None,
+                               metrics: Optional[IngestMetrics] = None,
+                               profile: Optional[TableProfile] = None,
+                               sizer: Optional[BatchSizer] = None) -> int:
+    """
+    Insere os dados de um CSV lidos em paralelo: o arquivo é dividido em trechos
+    alinhados a registros (ingest_core.split_csv_ranges), convertidos por um pool de
+    processos e inseridos por este único escritor, que consome uma fila limitada.
+
+    Com preserve_order as linhas entram na ordem do arquivo: os lotes de trechos
+    adiantados ficam em memória até a vez deles (no máximo 2 trechos por worker em
+    andamento). Promoções INTEGER → REAL são aplicadas como no caminho serial; uma
+    promoção para TEXT depende da ordem das linhas e levanta ParallelLoadFallback.
+    Os perfis das colunas calculados pelos workers são somados em profile. Cada worker
+    dimensiona os próprios lotes com uma parte do teto de RSS de sizer, que recebe os
+    resumos deles e mede o tempo das inserções.
+    Atualiza column_types e retorna o número de linhas inseridas.
+    """
+    report = report or IngestReporter()
+    metrics = metrics or IngestMetrics()
+    sizer = sizer or BatchSizer(len(columns))
+    ranges = split_csv_ranges(file_path, PARALLEL_RANGE_BYTES)
+    if not ranges:
+        return 0
+
+    inferred_types = list(column_types)
+    table_types = list(column_types)
+    row_count = 0
+
+    def write_batch(batch_data: List[List], batch_types: List[Dict]):
+        nonlocal table_types, row_count
+        if batch_types != table_types:
+            for col, batch_type, inferred_type in zip(columns, batch_types, inferred_types):
+                if batch_type['type'] == 'TEXT' and inferred_type['type'] != 'TEXT':
+                    raise ParallelLoadFallback(f"a coluna '{col}' precisou ser promovida para TEXT")
+            new_types = [join_types(table_type, batch_type) for table_type, batch_type in zip(table_types, batch_types)]
+            if table_is_new and new_types != table_types:
+                with metrics.stage('ddl'):
+                    promote_table_columns(cursor, table_name, columns, new_types)
+            table_types = new_types
+        with metrics.stage('insert'):
+            execute_batch_insert_sqlite(cursor, table_name, columns, batch_data, sizer)
+        row_count += len(batch_data)
+
+    workers = min(MAX_WORKERS, len(ranges))
+    worker_ceiling_mb = worker_rss_ceiling_mb(sizer.rss_ceiling_mb, workers)
+    max_in_flight = 2 * workers
+    mp_context = process_pool_context()
+    results_queue = mp_context.Queue(maxsize=QUEUE_BATCHES_PER_WORKER * workers)
+    cancel_event = mp_context.Event()
+    report.caption(f"Leitura paralela: {len(ranges)} trechos de até {PARALLEL_RANGE_BYTES // (1024 * 1024)} MB em {workers} processo(s).")
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context,
+                             initializer=init_pool_worker,
+                             initargs=(results_queue, cancel_event)) as executor:
+        futures = []
+
+        def submit_next_range():
+            range_index = len(futures)
+            if range_index < len(ranges):
+                start, end = ranges[range_index]
+                futures.append(executor.submit(load_csv_range, str(file_path), range_index, start, end,
+                                               len(columns), inferred_types, worker_ceiling_mb))
+
+        try:
+            for _ in range(max_in_flight):
+                submit_next_range()
+
+            buffered: Dict[int, List] = {}
+            finished = set()
+            next_to_write = 0
+            while len(finished) < len(ranges):
+                try:
+                    message = results_queue.get(timeout=0.5)
+                except queue.Empty:
+                    report.progress()
+                    # Worker que morreu sem conseguir avisar (ex.: falta de memória)
+                    for future in futures:
+                        if future.done() and future.exception():
+                            raise future.exception()
+                    continue
+
+                kind, range_index = message[0], message[1]
+                if kind == 'error':
+                    start, end = ranges[range_index]
+                    raise ValueError(f"trecho de bytes {start}-{end}: {message[2]}")
+
+                if kind == 'batch':
+                    if preserve_order and range_index != next_to_write:
+                        buffered.setdefault(range_index, []).append(message[2:])
+                    else:
+                        write_batch(*message[2:])
+                    report.progress(rows=row_count)
+
+                elif kind == 'done':
+                    # Parse e conversão foram medidos (e as colunas perfiladas) nos workers
+                    metrics.merge(message[2]['metrics'])
+                    if profile is not None:
+                        profile.merge(message[2]['profile'])
+                    sizer.add_worker_summary(message[2]['batch_sizing'])
+                    finished.add(range_index)
+                    submit_next_range()
+                    report.progress(rows=row_count, fraction=len(finished) / len(ranges))
+                    # Avança a vez para os próximos trechos, gravando o que já chegou deles
+                    while preserve_order and next_to_write in finished:
+                        next_to_write += 1
+                        for batch in buffered.pop(next_to_write, []):
+                            write_batch(*batch)
+        finally:
+            # Libera workers bloqueados na fila se o escritor parou antes do fim
+            cancel_event.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    column_types[:] = table_types
+    return row_count
+
+
+def load_appended_tail(conn: sqlite3.Connection, stream, content: HashingReader, table_name: str,
+                       previous_load: Dict, source_name: str, bulk_load: bool = True,
+                       report: Optional[IngestReporter] = None,
+                       metrics: Optional[IngestMetrics] = None,
+                       sizer: Optional[BatchSizer] = None) -> Tuple[int, List[Dict]]:
+    """
+    Carrega só as linhas acrescentadas depois da última carga: stream já está posicionado
+    no byte em que ela terminou. Parte das colunas e dos tipos registrados no cache; um
+    valor da cauda que não cabe no tipo promove a coluna INTEGER → REAL reescrevendo a
+    tabela, como na carga inteira. Uma coluna que viraria TEXT desfaz a carga com
+    ValueError: as linhas já gravadas (números, booleanos, datas) perderiam o texto
+    original. Atualiza o registro do cache, as estatísticas das colunas (somadas às já
+    catalogadas) e o índice de busca textual, se houver. Os lotes são dimensionados por
+    sizer.
+    Retorna (linhas inseridas, tipos usados).
+    """
+    report = report or IngestReporter()
+    metrics = metrics or IngestMetrics()
+    columns = previous_load['columns']
+    sizer = sizer or BatchSizer(len(columns))
+    column_types = list(previous_load['column_types'])
+    table_column_types = list(column_types)
+    reader = csv.reader(io.TextIOWrapper(stream, encoding='utf-8'))
+    row_count = 0
+    profile = TableProfile(len(columns))
+
+    load_mode = bulk_load_mode(conn, sizer.page_cache_kib(-BULK_LOAD_PRAGMAS['cache_size'])) \
+        if bulk_load else contextlib.nullcontext()
+    with load_mode:
+        with conn: # 'with conn' garante o commit/rollback
+            cursor = conn.cursor()
+            cursor.execute("BEGIN")
+            for batch in metrics.timed('parse', iter_row_batches(reader, sizer)):
+                with metrics.stage('convert'):
+                    try:
+                        batch_data = convert_rows(batch, len(columns), column_types, metrics.rejected, profile,
+                                                  previous_load['row_count'] + row_count)
+                    except LossyPromotion as promotion:
+                        promoted = ", ".join(f"'{columns[i]}'" for i in promotion.columns)
+                        raise ValueError(
+                            f"as linhas acrescentadas não cabem no tipo da(s) coluna(s) {promoted} da tabela "
+                            f"'{table_name}' e as linhas já gravadas (números, booleanos, datas) não guardam o "
+                            f"texto original. Carregue o arquivo em uma nova tabela."
+                        ) from None
+
+                if column_types != table_column_types:
+                    # Um valor da cauda não coube no tipo da tabela: promove a coluna
+                    with metrics.stage('ddl'):
+                        promote_table_columns(cursor, table_name, columns, column_types)
+                    table_column_types = list(column_types)
+
+                if batch_data:
+                    with metrics.stage('insert'):
+                        execute_batch_insert_sqlite(cursor, table_name, columns, batch_data, sizer)
+                    row_count += len(batch_data)
+                report.progress(rows=row_count, bytes_done=content.bytes_read)
+
+            drain(stream)
+            save_load(cursor, table_name, source_name, content.hexdigest(), content.bytes_read,
+                      previous_load['row_count'] + row_count, columns, column_types)
+            bump_table_version(cursor, table_name)
+            save_table_profile(cursor, table_name, columns, column_types, profile, table_is_new=False)
+            # A tabela reescrita pela promoção tem o índice de busca textual refeito por inteiro
+            rewritten = column_types != previous_load['column_types']
+            with metrics.stage('index'):
+                apply_fts_index(cursor, table_name, columns, (), rewritten, report)
+                cursor.execute(f"ANALYZE \"{table_name}\"")
+
+    return row_count, column_types
+
+
+def process_full_workflow(conn: sqlite3.Connection, source: UploadSource, table_name: str,
+                          sampling_strategy: str = "head", bulk_load: bool = True, index_columns: List[str] = (),
+                          parallel: bool = False, preserve_order: bool = True,
+                          report: Optional[IngestReporter] = None, metrics_file: Optional[str] = METRICS_FILE,
+                          rss_ceiling_mb: Optional[float] = None, fts_columns: Sequence[str] = ()):
+    """
+    Gerencia DDL, criação de tabela e inserção em lote.
+
+    Os tipos são inferidos por amostragem (type_inference.TypeInferenceEngine). Com a
+    estratégia "head" a amostra são as primeiras INFERENCE_SAMPLE_SIZE linhas e o
+    arquivo é lido uma única vez; com "reservoir" a amostra vem do arquivo inteiro, ao
+    custo de uma leitura extra. Se um valor posterior não cabe no tipo inferido, a
+    coluna é promovida (INTEGER → REAL → TEXT) reescrevendo a tabela. Uma coluna
+    promovida para TEXT depois de linhas gravadas (LossyPromotion) desfaz a carga, que é
+    refeita desde o início do arquivo com a coluna já como TEXT: '007' e '3.0' ficam como
+    no arquivo, o mesmo resultado de uma inferência sobre o arquivo inteiro.
+
+    Com bulk_load, a carga roda com os PRAGMAs de BULK_LOAD_PRAGMAS; os índices de
+    index_columns são criados só depois dos dados, seguidos de ANALYZE. As colunas de
+    fts_columns ganham um índice de busca textual FTS5 (apply_fts_index), mantido em dia
+    pelas cargas seguintes na tabela.
+
+    O tamanho dos lotes, a amostra da inferência e o cache de páginas são dimensionados
+    por um BatchSizer (batch_sizing) a partir da largura das linhas e do tempo de
+    inserção medidos, sob o teto rss_ceiling_mb (padrão: batch_sizing.RSS_CEILING_MB).
+
+    Com parallel (só .csv), os dados são lidos por insert_csv_ranges_parallel, com o
+    mesmo resultado do caminho serial (a menos da ordem das linhas sem preserve_order).
+
+    O conteúdo é lido direto do buffer do upload; só vai para um arquivo temporário
+    (lido por mmap) acima de SPILL_THRESHOLD_BYTES ou para os workers da leitura paralela.
+    Arquivos compactados (ingest_input) são descompactados por uma thread de leitura
+    antecipada, em paralelo com o parse e a inserção.
+
+    As estatísticas das colunas (column_stats) são calculadas durante a conversão e
+    gravadas no catálogo na mesma transação.
+
+    Cada carga fica registrada no cache de ingestão (ingest_cache): um upload idêntico
+    ao último carregado na tabela não é carregado de novo e um upload que só acrescenta
+    linhas ao anterior tem apenas a cauda carregada (load_appended_tail).
+
+    Mensagens e progresso vão para report. Em um job cancelado, report.progress levanta
+    JobCancelled e a transação da carga é desfeita. As métricas da carga (IngestMetrics)
+    são mostradas no fim e gravadas em metrics_file (se informado).
+    """
+    report = report or IngestReporter()
+    metrics = IngestMetrics()
+    usage_before = resource_usage()
+    row_count = 0
+    ddl_query = ""
+
+    try:
+        parallel = parallel and source.suffix == ".csv"
+        if parallel or source.size >= SPILL_THRESHOLD_BYTES:
+            source.spill()
+
+        # 0. CACHE DE INGESTÃO: o conteúdo já foi carregado nesta tabela?
+        previous_load = get_previous_load(conn.cursor(), table_name)
+        if previous_load is not None:
+            with open_csv_stream(source) as f:
+                content = HashingReader(f)
+                prefix_matches, ends_at_record = match_loaded_prefix(content, previous_load)
+                stream = io.BufferedReader(content, UPLOAD_READ_BUFFER_SIZE)
+                if prefix_matches and not stream.peek(1):
+                    report.success(
+                        f"Conteúdo idêntico ao já carregado em '{table_name}' "
+                        f"({previous_load['source_name']}, {previous_load['loaded_at']}): nada a inserir."
+                    )
+                    ddl_query = build_create_table_ddl(table_name, previous_load['columns'], previous_load['column_types'])
+                    if fts_columns:
+                        # Nada a carregar, mas o índice de busca textual pedido é criado
+                        for col in fts_columns:
+                            if col != FTS_AUTO and col not in previous_load['columns']:
+                                report.warning(f"Coluna '{col}' não existe na tabela; índice ignorado.")
+                        with metrics.stage('index'), conn:
+                            cursor = conn.cursor()
+                            cursor.execute("BEGIN")
+                            if apply_fts_index(cursor, table_name, previous_load['columns'], fts_columns,
+                                               False, report) is not None:
+                                bump_table_version(cursor, table_name)
+                    with metrics.stage('verify'):
+                        verification_rows = execute_select_limit(conn, table_name)
+                    report_ingest_metrics(report, metrics.finish(
+                        0, content.bytes_read, time.perf_counter() - metrics.started, usage_before, resource_usage(),
+                        **load_record_fields(source.name, source.size, table_name, "cache_hit", bulk_load, sampling_strategy),
+                        **input_record_fields(source, f),
+                    ), metrics_file)
+                    return ddl_query, 0, verification_rows
+
+                if prefix_matches and not ends_at_record:
+                    # A última carga terminou sem quebra de linha: se o upload só a completa, a cauda
+                    # começa logo depois; se continua a última linha, recarregar duplicaria a tabela
+                    if not skip_line_break(stream):
+                        report.error(
+                            f"O arquivo repete o conteúdo já carregado em '{table_name}', mas altera a última "
+                            f"linha dele (a carga anterior terminou sem quebra de linha). Carregar o arquivo "
+                            f"inteiro duplicaria as linhas; carregue-o em uma nova tabela."
+                        )
+                        return None, 0, []
+                    ends_at_record = True
+
+                if prefix_matches and ends_at_record:
+                    report.info(
+                        f"O arquivo repete o conteúdo já carregado em '{table_name}' e acrescenta linhas: "
+                        f"carregando só os dados a partir do byte {previous_load['byte_offset']}..."
+                    )
+                    load_start = time.perf_counter()
+                    sizer = BatchSizer(len(previous_load['columns']), rss_ceiling_mb)
+                    row_count, column_types = load_appended_tail(conn, stream, content, table_name, previous_load,
+                                                                 source.name, bulk_load, report, metrics, sizer)
+                    load_seconds = time.perf_counter() - load_start
+                    report.success(f"Inserção em lote concluída! Total de {row_count} linhas novas inseridas.")
+                    ddl_query = build_create_table_ddl(table_name, previous_load['columns'], column_types)
+                    with metrics.stage('verify'):
+                        verification_rows = execute_select_limit(conn, table_name)
+                    report_ingest_metrics(report, metrics.finish(
+                        row_count, content.bytes_read - previous_load['byte_offset'], load_seconds,
+                        usage_before, resource_usage(),
+                        **load_record_fields(source.name, source.size, table_name, "append", bulk_load, sampling_strategy),
+                        **input_record_fields(source, f),
+                        batch_sizing=sizer.summary(),
+                    ), metrics_file)
+                    return ddl_query, row_count, verification_rows
+
+            report.caption("O conteúdo difere do último arquivo carregado nesta tabela: o arquivo será carregado inteiro.")
+
+        with open_csv_stream(source) as f, contextlib.ExitStack() as reopened:
+            # O hash do conteúdo é calculado durante a própria leitura
+            content = HashingReader(f)
+            read_progress = content
+            stream = io.BufferedReader(content, UPLOAD_READ_BUFFER_SIZE)
+            text_stream = io.TextIOWrapper(stream, encoding='utf-8')
+            reader = csv.reader(text_stream)
+
+            # 1. INFERÊNCIA DE TIPOS POR AMOSTRAGEM E GERAÇÃO DO DDL
+            report.info("Passo 1/4: Inferindo os tipos das colunas por amostragem para gerar o DDL...")
+            header = next(reader, None)
+            if not header:
+                report.error("O arquivo CSV não contém colunas válidas. Abortando.")
+                return None, 0, []
+
+            columns_to_insert = normalize_header(header)
+            n_columns = len(columns_to_insert)
+            sizer = BatchSizer(n_columns, rss_ceiling_mb)
+            engine = TypeInferenceEngine(n_columns, sample_size=sizer.sample_rows(INFERENCE_SAMPLE_SIZE),
+                                         strategy=sampling_strategy)
+
+            with metrics.stage('inference'):
+                if sampling_strategy == "reservoir":
+                    # A amostra cobre o arquivo inteiro: exige uma leitura a mais antes da carga
+                    with open_csv_stream(source) as sample_f:
+                        sample_stream = io.TextIOWrapper(sample_f, encoding='utf-8')
+                        sample_reader = csv.reader(sample_stream)
+                        next(sample_reader, None)
+                        sample_batches = sample_for_inference(engine, reader, n_columns, sample_reader)
+                else:
+                    # As linhas da amostra inicial são reaproveitadas na inserção
+                    sample_batches = sample_for_inference(engine, reader, n_columns, sizer=sizer)
+
+                column_types = engine.column_types()
+            ddl_query = build_create_table_ddl(table_name, columns_to_insert, column_types)
+
+            inference_summary = pd.DataFrame(engine.summary(), index=columns_to_insert)
+            report.caption(f"Tipos inferidos a partir de {engine.rows_sampled} linhas de amostra ({sampling_strategy}).")
+            report.table(
+                "Tipos inferidos",
+                inference_summary.drop(columns=['ambiguous_formats']).rename_axis('coluna').reset_index().to_dict('records'),
+            )
+            for col, info in inference_summary.iterrows():
+                if info['ambiguous_formats']:
+                    report.warning(
+                        f"Coluna '{col}': formato de data ambíguo na amostra "
+                        f"({', '.join(info['ambiguous_formats'])}). Usando {info['format']}."
+                    )
+
+            # Modo de carga em massa: PRAGMAs ajustados só durante a carga
+            if bulk_load:
+                load_mode = bulk_load_mode(conn, sizer.page_cache_kib(-BULK_LOAD_PRAGMAS['cache_size']))
+            else:
+                load_mode = contextlib.nullcontext(read_pragmas(conn, REPORTED_PRAGMAS))
+            with load_mode as sqlite_settings:
+                load_start = time.perf_counter()
+                # O DDL, a carga e eventuais promoções rodam em uma única transação. A carga
+                # paralela que não pode reproduzir o caminho serial é desfeita e refeita em série.
+                inferred_types = list(column_types)
+                load_paths = ["parallel", "serial"] if parallel else ["serial"]
+                for load_path in load_paths:
+                    try:
+                        with conn: # 'with conn' garante o commit/rollback
+                            cursor = conn.cursor()
+                            cursor.execute("BEGIN")
+
+                            # 2. CRIAÇÃO DA TABELA
+                            report.info("Passo 2/4: Executando DDL para criar a tabela...")
+                            table_is_new = not table_exists(cursor, table_name)
+                            with metrics.stage('ddl'):
+                                cursor.execute(ddl_query)
+                            table_column_types = list(column_types)
+                            profile = TableProfile(n_columns)
+                            report.success("Tabela criada/verificada com sucesso.")
+
+                            # 3. INSERÇÃO DE DADOS EM LOTE
+                            report.info("Passo 3/4: Iniciando inserção de dados em lote...")
+                            if load_path == "parallel":
+                                row_count = insert_csv_ranges_parallel(
+                                    cursor, source.path, table_name, columns_to_insert, column_types,
+                                    table_is_new, preserve_order, report, metrics, profile, sizer
+                                )
+                            else:
+                                remaining_batches = iter_row_batches(reader, sizer)
+
+                                # O parse das linhas da amostra já entrou no tempo da inferência
+                                batches = itertools.chain(sample_batches, remaining_batches)
+                                for batch in metrics.timed('parse', batches):
+                                    with metrics.stage('convert'):
+                                        batch_data = convert_rows(batch, n_columns, column_types, metrics.rejected,
+                                                                  profile, row_count)
+
+                                    if table_is_new and column_types != table_column_types:
+                                        # Um valor não coube no tipo inferido: promove a coluna
+                                        with metrics.stage('ddl'):
+                                            promote_table_columns(cursor, table_name, columns_to_insert, column_types)
+                                        table_column_types = list(column_types)
+
+                                    if batch_data:
+                                        with metrics.stage('insert'):
+                                            execute_batch_insert_sqlite(cursor, table_name, columns_to_insert,
+                                                                        batch_data, sizer)
+                                        row_count += len(batch_data)
+                                    report.progress(rows=row_count, bytes_done=read_progress.bytes_read)
+
+                            ddl_query = build_create_table_ddl(table_name, columns_to_insert, column_types)
+
+                            # A leitura paralela não passa pelo stream principal: o hash termina de ser lido aqui
+                            drain(stream)
+                            save_load(cursor, table_name, source.name, content.hexdigest(), content.bytes_read,
+                                      row_count, columns_to_insert, column_types)
+                            bump_table_version(cursor, table_name)
+                            save_table_profile(cursor, table_name, columns_to_insert, column_types,
+                                               profile, table_is_new)
+
+                            # Índices só depois dos dados: construir de uma vez é bem mais barato que
+                            # manter o índice a cada INSERT
+                            valid_index_columns = [col for col in index_columns if col in columns_to_insert]
+                            for col in [*index_columns, *fts_columns]:
+                                if col != FTS_AUTO and col not in columns_to_insert:
+                                    report.warning(f"Coluna '{col}' não existe na tabela; índice ignorado.")
+                            with metrics.stage('index'):
+                                if valid_index_columns:
+                                    report.info(f"Criando {len(valid_index_columns)} índice(s) após a carga...")
+                                    create_deferred_indexes(cursor, table_name, valid_index_columns)
+                                apply_fts_index(cursor, table_name, columns_to_insert, fts_columns, table_is_new, report)
+                                cursor.execute(f"ANALYZE \"{table_name}\"")
+
+                        break
+                    except ParallelLoadFallback as fallback:
+                        report.warning(f"Carga paralela desfeita ({fallback}). Carregando o arquivo em série...")
+                        row_count = 0
+                        column_types[:] = inferred_types
+                        metrics.rejected.clear()
+                        sizer.worker_summaries.clear()
+                    except LossyPromotion as promotion:
+                        # As linhas gravadas têm números, 1/0 ou datas ISO no lugar do texto: o arquivo é
+                        # relido do início com os tipos promovidos (o hash segue no stream original)
+                        promoted = ", ".join(f"'{columns_to_insert[i]}'" for i in promotion.columns)
+                        report.warning(
+                            f"Coluna(s) {promoted} promovida(s) para TEXT depois de linhas já gravadas. "
+                            f"Carga desfeita; relendo o arquivo com os valores originais..."
+                        )
+                        row_count = 0
+                        inferred_types = list(column_types)
+                        ddl_query = build_create_table_ddl(table_name, columns_to_insert, column_types)
+                        metrics.rejected.clear()
+                        sizer.worker_summaries.clear()
+                        read_progress = HashingReader(reopened.enter_context(open_csv_stream(source)))
+                        reader = csv.reader(io.TextIOWrapper(
+                            io.BufferedReader(read_progress, UPLOAD_READ_BUFFER_SIZE), encoding='utf-8'
+                        ))
+                        next(reader, None)
+                        sample_batches = []
+                        load_paths.append("serial")
+
+                load_seconds = time.perf_counter() - load_start
+
+        if row_count == 0 and engine.rows_sampled == 0:
+            report.warning("O arquivo CSV está vazio após o cabeçalho. Nada para inserir.")
+            return ddl_query, 0, []
+
+        report.success(f"Inserção em lote concluída! Total de {row_count} linhas inseridas.")
+        file_mb = source.size / (1024 * 1024)
+        report.info(
+            f"Carga em {load_seconds:.2f}s: {row_count / load_seconds:,.0f} linhas/s, "
+            f"{file_mb / load_seconds:.1f} MB/s do arquivo enviado "
+            f"(modo {'carga em massa' if bulk_load else 'padrão'})."
+        )
+        report.details("Configurações do SQLite usadas na carga", sqlite_settings)
+
+
+        # 4. VERIFICAÇÃO FINAL
+        report.info("Passo 4/4: Selecionando as primeiras 50 linhas para verificação...")
+        with metrics.stage('verify'):
+            verification_rows = execute_select_limit(conn, table_name)
+
+        report_ingest_metrics(report, metrics.finish(
+            row_count, content.bytes_read, load_seconds, usage_before, resource_usage(),
+            **load_record_fields(source.name, source.size, table_name, load_path, bulk_load, sampling_strategy,
+                                 MAX_WORKERS if load_path == "parallel" else 1),
+            **input_record_fields(source, f),
+            batch_sizing=sizer.summary(),
+        ), metrics_file)
+        return ddl_query, row_count, verification_rows
+
+    except JobCancelled:
+        raise
+    except sqlite3.Error as db_error:
+        report.error(f"Erro de Banco de Dados SQLite: {str(db_error)}")
+        return None, 0, []
+    except Exception as e:
+        report.error(f"Erro Crítico durante o processamento: {str(e)}")
+        return None, 0, []
+    finally:
+        # 5. LIMPEZA
+        removed_path = source.close()
+        if removed_path is not None:
+            report.caption(f"Arquivo temporário removido do disco: {removed_path.name}")
+
+def zip_member_table_names(table_name: str, members: List[str]) -> Dict[str, str]:
+    """Nome de tabela de cada membro do ZIP: tabela_<nome do arquivo>, sem repetições."""
+    names = {}
+    used = set()
+    for member in members:
+        stem = re.sub(r'[^a-zA-Z0-9_]', '_', Path(member).stem).lower()
+        name = f"{table_name}_{stem}"
+        suffix = 2
+        while name in used:
+            name = f"{table_name}_{stem}_{suffix}"
+            suffix += 1
+        used.add(name)
+        names[member] = name
+    return names
+
+
+def declared_column_types(cursor: sqlite3.Cursor, table_name: str, columns: List[str]) -> List[Dict]:
+    """Tipos declarados das colunas de uma tabela já existente."""
+    cursor.execute(f"PRAGMA table_info(\"{table_name}\")")
+    declared = {row[1]: row[2] for row in cursor.fetchall()}
+    return [{'type': declared.get(col, 'TEXT'), 'format': None} for col in columns]
+
+
+def process_zip_workflow(conn: sqlite3.Connection, source: UploadSource, table_name: str,
+                         sampling_strategy: str = "head", bulk_load: bool = True, index_columns: List[str] = (),
+                         merge_matching_headers: bool = True,
+                         report: Optional[IngestReporter] = None, metrics_file: Optional[str] = METRICS_FILE,
+                         rss_ceiling_mb: Optional[float] = None, fts_columns: Sequence[str] = ()):
+    """
+    Carrega todos os CSVs de um ZIP (process_csv_inputs_workflow sobre os membros). Os
+    workers leem o ZIP pelo caminho, então o upload sempre vai para um arquivo temporário.
+
+    Retorna (tabelas carregadas, estatísticas por membro).
+    """
+    report = report or IngestReporter()
+    try:
+        zip_path = source.spill()
+        members = list_zip_csv_members(zip_path)
+        if not members:
+            report.error("ZIP não contém arquivos CSV.")
+            return [], []
+        with zipfile.ZipFile(zip_path, "r") as z:
+            csv_bytes = sum(z.getinfo(member).file_size for member in members)
+        return process_csv_inputs_workflow(
+            conn, {member: (zip_path, member) for member in members}, table_name, sampling_strategy, bulk_load,
+            index_columns, merge_matching_headers, report, metrics_file,
+            source_name=source.name, source_bytes=source.size, csv_bytes=csv_bytes, mode="zip",
+            rss_ceiling_mb=rss_ceiling_mb, fts_columns=fts_columns,
+        )
+    except JobCancelled:
+        raise
+    except Exception as e:
+        report.error(f"Erro Crítico durante o processamento: {str(e)}")
+        return [], []
+    finally:
+        # LIMPEZA
+        removed_path = source.close()
+        if removed_path is not None:
+            report.caption(f"Arquivo temporário removido do disco: {removed_path.name}")
+
+
+def process_csv_inputs_workflow(conn: sqlite3.Connection, inputs: Dict[str, Tuple[Any, Optional[str]]],
+                                table_name: str, sampling_strategy: str = "head", bulk_load: bool = True,
+                                index_columns: List[str] = (), merge_matching_headers: bool = True,
+                                report: Optional[IngestReporter] = None,
+                                metrics_file: Optional[str] = METRICS_FILE, source_name: str = "",
+                                source_bytes: int = 0, csv_bytes: int = 0, mode: str = "files",
+                                workers: int = MAX_WORKERS, rss_ceiling_mb: Optional[float] = None,
+                                fts_columns: Sequence[str] = ()):
+    """
+    Carrega vários CSVs: os membros de um ZIP ou arquivos em disco (CLI). inputs mapeia o
+    nome de cada CSV para (caminho, membro do ZIP ou None; ver ingest_core.open_csv_input).
+    Os CSVs são lidos e convertidos em paralelo por um pool de processos
+    (ingest_core.load_csv_input); esta função é o único escritor do SQLite e consome os
+    lotes por uma fila limitada. Cada worker dimensiona os próprios lotes (BatchSizer)
+    com uma parte igual do teto rss_ceiling_mb.
+
+    Cada CSV é carregado em uma tabela de staging própria, o que permite descartar só
+    o que falhou. Ao final, com merge_matching_headers, CSVs com o mesmo cabeçalho vão
+    para uma única tabela (com os tipos unidos); senão cada CSV vira a tabela
+    tabela_<nome do arquivo>. Os índices (index_columns e o de busca textual de
+    fts_columns) são criados em cada tabela de destino que tem as colunas.
+
+    Cada tabela de destino fica registrada no cache de ingestão com o hash dos CSVs
+    dela (ingest_cache.combined_content_hash, calculado pelos workers durante a
+    leitura): um destino cuja última carga teve exatamente esse conteúdo não recebe as
+    linhas de novo. A comparação só é possível depois da leitura, então o reenvio
+    idêntico ainda custa a leitura dos CSVs, mas não duplica a tabela.
+
+    Retorna (tabelas carregadas, estatísticas por CSV).
+    """
+    report = report or IngestReporter()
+    metrics = IngestMetrics()
+    usage_before = resource_usage()
+    tables = []
+    member_stats: Dict[str, Dict[str, Any]] = {}
+    members = list(inputs)
+
+    try:
+        staging_names = {member: f"{table_name}__carga_{i}" for i, member in enumerate(members)}
+        member_tables = zip_member_table_names(table_name, members)
+        for member in members:
+            member_stats[member] = {
+                'membro': member, 'tabela': None, 'linhas': 0, 'descartadas': 0,
+                'tempo_worker_s': None, 'tempo_escrita_s': 0.0, 'erro': None,
+            }
+        loaded = {}  # membro -> {'columns', 'column_types'} da tabela de staging
+        member_content: Dict[str, Tuple[str, int]] = {}  # membro -> (hash, bytes) do CSV
+        member_profiles: Dict[str, TableProfile] = {}  # perfis das colunas calculados pelos workers
+
+        workers = max(1, min(workers, len(members)))
+        sizer = BatchSizer(1, rss_ceiling_mb)  # só mede as inserções e junta os resumos dos workers
+        worker_ceiling_mb = worker_rss_ceiling_mb(sizer.rss_ceiling_mb, workers)
+        mp_context = process_pool_context()
+        # CSVs com colunas numéricas, BOOLEAN ou de data promovidas para TEXT depois de linhas já gravadas
+        reread = set()
+
+        report.info(f"Passo 1/3: Lendo {len(members)} CSVs em {workers} processo(s)...")
+
+        if bulk_load:
+            load_mode = bulk_load_mode(conn, sizer.page_cache_kib(-BULK_LOAD_PRAGMAS['cache_size']))
+        else:
+            load_mode = contextlib.nullcontext(read_pragmas(conn, REPORTED_PRAGMAS))
+        with load_mode as sqlite_settings:
+            load_start = time.perf_counter()
+            with conn: # 'with conn' garante o commit/rollback
+                cursor = conn.cursor()
+                cursor.execute("BEGIN")
+
+                def discard_member(member: str, error: str):
+                    member_stats[member]['erro'] = error
+                    member_stats[member]['linhas'] = 0
+                    loaded.pop(member, None)
+                    member_profiles.pop(member, None)
+                    cursor.execute(f"DROP TABLE IF EXISTS \"{staging_names[member]}\"")
+
+                def read_members(to_read: Dict[str, Optional[List[Dict]]]):
+                    """Lê os CSVs de to_read (membro -> tipos impostos ou None para inferir) para o staging."""
+                    results_queue = mp_context.Queue(maxsize=QUEUE_BATCHES_PER_WORKER * workers)
+                    cancel_event = mp_context.Event()
+                    with ProcessPoolExecutor(max_workers=min(workers, len(to_read)), mp_context=mp_context,
+                                             initializer=init_pool_worker,
+                                             initargs=(results_queue, cancel_event)) as executor:
+                        futures = {
+                            executor.submit(load_csv_input, member, str(inputs[member][0]), inputs[member][1],
+                                            sampling_strategy, INFERENCE_SAMPLE_SIZE, worker_ceiling_mb,
+                                            forced_types): member
+                            for member, forced_types in to_read.items()
+                        }
+                        pending = set(to_read)
+                        try:
+                            # 2. ESCRITA: único escritor, lotes na ordem em que ficam prontos
+                            while pending:
+                                try:
+                                    message = results_queue.get(timeout=0.5)
+                                except queue.Empty:
+                                    report.progress()
+                                    # Worker que morreu sem conseguir avisar (ex.: falta de memória)
+                                    for future, member in futures.items():
+                                        if member in pending and future.done() and future.exception():
+                                            discard_member(member, str(future.exception()))
+                                            pending.discard(member)
+                                    continue
+
+                                kind, member = message[0], message[1]
+                                if member not in pending:
+                                    continue
+
+                                if kind == 'header':
+                                    _, _, columns, column_types, summary, _ = message
+                                    staging = staging_names[member]
+                                    with metrics.stage('ddl'):
+                                        cursor.execute(f"DROP TABLE IF EXISTS \"{staging}\"")
+                                        cursor.execute(build_create_table_ddl(staging, columns, column_types))
+                                    loaded[member] = {'columns': columns, 'column_types': column_types}
+                                    member_stats[member]['linhas'] = 0
+                                    for col, info in zip(columns, summary):
+                                        if info['ambiguous_formats']:
+                                            report.warning(
+                                                f"{member}, coluna '{col}': formato de data ambíguo na amostra "
+                                                f"({', '.join(info['ambiguous_formats'])}). Usando {info['format']}."
+                                            )
+
+                                elif kind == 'batch':
+                                    _, _, batch_data, column_types = message
+                                    write_start = time.perf_counter()
+                                    info = loaded[member]
+                                    if column_types != info['column_types']:
+                                        if member_stats[member]['linhas'] and lossy_promotions(info['column_types'], column_types):
+                                            # O staging já tem números, 1/0 ou datas ISO nessa coluna: o CSV é relido no fim
+                                            reread.add(member)
+                                        # Um valor não coube no tipo inferido: promove a coluna
+                                        with metrics.stage('ddl'):
+                                            promote_table_columns(cursor, staging_names[member], info['columns'], column_types)
+                                        info['column_types'] = column_types
+                                    with metrics.stage('insert'):
+                                        execute_batch_insert_sqlite(cursor, staging_names[member], info['columns'],
+                                                                    batch_data, sizer)
+                                    member_stats[member]['linhas'] += len(batch_data)
+                                    member_stats[member]['tempo_escrita_s'] += time.perf_counter() - write_start
+                                    report.progress(rows=sum(stats['linhas'] for stats in member_stats.values()))
+
+                                elif kind == 'done':
+                                    stats = message[2]
+                                    worker_metrics = stats['metrics']
+                                    if to_read[member] is not None:
+                                        # Releitura: as linhas descartadas já foram contadas na primeira leitura
+                                        worker_metrics = {**worker_metrics, 'rejected': {}}
+                                    # Inferência, parse e conversão foram medidos nos workers
+                                    metrics.merge(worker_metrics)
+                                    member_profiles[member] = TableProfile.from_state(stats['profile'])
+                                    member_content[member] = (stats['content_hash'], stats['bytes_read'])
+                                    member_stats[member]['descartadas'] = stats['rows_rejected']
+                                    member_stats[member]['tempo_worker_s'] = round(stats['seconds'], 3)
+                                    sizer.add_worker_summary(stats['batch_sizing'])
+                                    pending.discard(member)
+                                    report.progress(fraction=(len(to_read) - len(pending)) / len(to_read))
+
+                                elif kind == 'error':
+                                    discard_member(member, message[2])
+                                    pending.discard(member)
+                                    report.progress(fraction=(len(to_read) - len(pending)) / len(to_read))
+                        finally:
+                            # Libera workers bloqueados na fila se o escritor parou antes do fim
+                            cancel_event.set()
+                            executor.shutdown(wait=False, cancel_futures=True)
+
+                def plan_targets() -> List[Tuple[str, List[str], List[str], bool, List[Dict]]]:
+                    """(destino, membros, colunas, destino novo, tipos do destino) de cada grupo de CSVs."""
+                    groups: Dict[Any, List[str]] = {}
+                    for member in members:
+                        if member in loaded:
+                            key = tuple(loaded[member]['columns']) if merge_matching_headers else member
+                            groups.setdefault(key, []).append(member)
+                    plan = []
+                    for group_index, group_members in enumerate(groups.values()):
+                        first = group_members[0]
+                        # O primeiro grupo fica com o nome escolhido; os demais, com o nome do CSV
+                        target = table_name if merge_matching_headers and group_index == 0 else member_tables[first]
+                        columns = loaded[first]['columns']
+                        target_is_new = not table_exists(cursor, target)
+                        if not target_is_new:
+                            target_types = declared_column_types(cursor, target, columns)
+                        else:
+                            target_types = [
+                                reduce(join_types, types)
+                                for types in zip(*(loaded[member]['column_types'] for member in group_members))
+                            ]
+                        plan.append((target, group_members, columns, target_is_new, target_types))
+                    return plan
+
+                def group_content_hash(group_members: List[str]) -> str:
+                    return combined_content_hash([member_content[member][0] for member in group_members])
+
+                def group_content_bytes(group_members: List[str]) -> int:
+                    return sum(member_content[member][1] for member in group_members)
+
+                read_members({member: None for member in members})
+
+                # Cache de ingestão: destinos cuja última carga foi exatamente estes CSVs
+                unchanged = {}
+                for target, group_members, columns, target_is_new, target_types in plan_targets():
+                    previous_load = None if target_is_new else get_previous_load(cursor, target)
+                    if (previous_load is not None
+                            and previous_load['content_hash'] == group_content_hash(group_members)
+                            and previous_load['byte_offset'] == group_content_bytes(group_members)):
+                        unchanged[target] = previous_load
+
+                # Colunas numéricas, BOOLEAN ou de data que viram TEXT (no próprio CSV ou na união
+                # com os outros CSVs do destino) teriam valores normalizados misturados ao texto original:
+                # esses CSVs são relidos com os tipos finais, guardando o texto como veio
+                to_reread = {}
+                for target, group_members, columns, target_is_new, target_types in plan_targets():
+                    if target in unchanged:
+                        continue
+                    for member in group_members:
+                        member_types = loaded[member]['column_types']
+                        if member in reread or lossy_promotions(member_types, target_types):
+                            # O formato de data vem do CSV (os tipos declarados de um destino existente não têm)
+                            to_reread[member] = [
+                                current if final['type'] == current['type'] else join_types(final, current)
+                                for final, current in zip(target_types, member_types)
+                            ]
+                if to_reread:
+                    report.warning(f"Relendo {len(to_reread)} CSV(s) com colunas numéricas, BOOLEAN ou de data "
+                                   f"promovidas para TEXT: {', '.join(to_reread)}")
+                    read_members(to_reread)
+
+                # 3. TABELAS FINAIS: staging renomeado ou copiado para o destino
+                report.info("Passo 2/3: Consolidando as tabelas de destino...")
+                for target, group_members, columns, target_is_new, target_types in plan_targets():
+                    first = group_members[0]
+                    if target in unchanged:
+                        previous_load = unchanged[target]
+                        report.success(
+                            f"Conteúdo idêntico ao já carregado em '{target}' "
+                            f"({previous_load['source_name']}, {previous_load['loaded_at']}): nada a inserir."
+                        )
+                        for member in group_members:
+                            cursor.execute(f"DROP TABLE \"{staging_names[member]}\"")
+                            member_stats[member]['tabela'] = target
+                            member_stats[member]['linhas'] = 0
+                        tables.append({
+                            'table': target,
+                            'ddl': build_create_table_ddl(target, columns, previous_load['column_types']),
+                            'rows': 0,
+                        })
+                        continue
+                    if not target_is_new:
+                        to_copy = group_members
+                    else:
+                        with metrics.stage('ddl'):
+                            cursor.execute(f"ALTER TABLE \"{staging_names[first]}\" RENAME TO \"{target}\"")
+                            if loaded[first]['column_types'] != target_types:
+                                promote_table_columns(cursor, target, columns, target_types)
+                        to_copy = group_members[1:]
+
+                    with metrics.stage('insert'):
+                        for member in to_copy:
+                            copy_table_rows(cursor, staging_names[member], target, columns, target_types)
+                            cursor.execute(f"DROP TABLE \"{staging_names[member]}\"")
+
+                    with metrics.stage('index'):
+                        target_index_columns = [col for col in index_columns if col in columns]
+                        if target_index_columns:
+                            create_deferred_indexes(cursor, target, target_index_columns)
+                        cursor.execute(f"ANALYZE \"{target}\"")
+                    bump_table_version(cursor, target)
+                    # Os tipos declarados de um destino existente não têm o formato das datas: vem do CSV
+                    recorded_types = [
+                        current if final['type'] == current['type'] else final
+                        for final, current in zip(target_types, loaded[first]['column_types'])
+                    ]
+                    save_load(cursor, target, source_name, group_content_hash(group_members),
+                              group_content_bytes(group_members),
+                              sum(member_stats[member]['linhas'] for member in group_members),
+                              columns, recorded_types)
+
+                    target_profile = member_profiles[first]
+                    for member in group_members[1:]:
+                        target_profile.merge(member_profiles[member].to_state())
+                    save_table_profile(cursor, target, columns, target_types, target_profile, target_is_new)
+                    # Depois do catálogo: a detecção automática das colunas de texto usa as estatísticas
+                    with metrics.stage('index'):
+                        apply_fts_index(cursor, target, columns, fts_columns, target_is_new, report)
+
+                    for member in group_members:
+                        member_stats[member]['tabela'] = target
+                    tables.append({
+                        'table': target,
+                        'ddl': build_create_table_ddl(target, columns, target_types),
+                        'rows': sum(member_stats[member]['linhas'] for member in group_members),
+                    })
+
+            load_seconds = time.perf_counter() - load_start
+
+        for col in [*index_columns, *fts_columns]:
+            if col != FTS_AUTO and not any(col in loaded[member]['columns'] for member in loaded):
+                report.warning(f"Coluna '{col}' não existe em nenhum dos CSVs; índice ignorado.")
+
+        total_rows = sum(table['rows'] for table in tables)
+        file_mb = source_bytes / (1024 * 1024)
+        report.success(f"Carga concluída! {total_rows} linhas em {len(tables)} tabela(s).")
+        report.info(
+            f"Carga em {load_seconds:.2f}s: {total_rows / load_seconds:,.0f} linhas/s, "
+            f"{file_mb / load_seconds:.1f} MB/s {'do ZIP enviado' if mode == 'zip' else 'dos arquivos'} "
+            f"(modo {'carga em massa' if bulk_load else 'padrão'})."
+        )
+        report.details("Configurações do SQLite usadas na carga", sqlite_settings)
+
+        # 4. VERIFICAÇÃO FINAL
+        report.info("Passo 3/3: Selecionando as primeiras 50 linhas de cada tabela para verificação...")
+        with metrics.stage('verify'):
+            for table in tables:
+                table['verification'] = execute_select_limit(conn, table['table'])
+
+        report_ingest_metrics(report, metrics.finish(
+            total_rows, csv_bytes, load_seconds, usage_before, resource_usage(),
+            **load_record_fields(source_name, source_bytes, table_name, mode, bulk_load, sampling_strategy, workers),
+            csv_files=len(members),
+            batch_sizing=sizer.summary(),
+        ), metrics_file)
+
+        for stats in member_stats.values():
+            stats['tempo_escrita_s'] = round(stats['tempo_escrita_s'], 3)
+        return tables, list(member_stats.values())
+
+    except JobCancelled:
+        raise
+    except sqlite3.Error as db_error:
+        report.error(f"Erro de Banco de Dados SQLite: {str(db_error)}")
+        return [], list(member_stats.values())
+    except Exception as e:
+        report.error(f"Erro Crítico durante o processamento: {str(e)}")
+        return [], list(member_stats.values())
+
+# ----------------------------------------------------------------------
+# API DA CARGA (página principal, CLI e benchmark)
+# ----------------------------------------------------------------------
+
+def ingest_source(conn: sqlite3.Connection, source, table_name: str, sampling_strategy: str = "head",
+                  bulk_load: bool = True, index_columns: List[str] = (), merge_matching_headers: bool = True,
+                  parallel: bool = False, preserve_order: bool = True,
+                  report: Optional[IngestReporter] = None, metrics_file: Optional[str] = METRICS_FILE,
+                  rss_ceiling_mb: Optional[float] = None, fts_columns: Sequence[str] = ()) -> Dict[str, Any]:
+    """
+    Carrega um arquivo (ingest_core.UploadSource ou FileSource, em qualquer formato de
+    ingest_input) na tabela table_name. Um ZIP com vários CSVs vai para
+    process_zip_workflow; o resto, para process_full_workflow. Retorna
+    {'ddl', 'rows', 'verification'} ou, no ZIP com vários CSVs, {'tables', 'member_stats'}.
+    """
+    zip_members = list_csv_members(source) if source.suffix == ".zip" else []
+    if len(zip_members) > 1:
+        tables, member_stats = process_zip_workflow(
+            conn, source, table_name, sampling_strategy, bulk_load, index_columns, merge_matching_headers,
+            report=report, metrics_file=metrics_file, rss_ceiling_mb=rss_ceiling_mb, fts_columns=fts_columns
+        )
+        return {'tables': tables, 'member_stats': member_stats}
+    ddl, total_rows, verification_rows = process_full_workflow(
+        conn, source, table_name, sampling_strategy, bulk_load, index_columns, parallel, preserve_order,
+        report=report, metrics_file=metrics_file, rss_ceiling_mb=rss_ceiling_mb, fts_columns=fts_columns
+    )
+    return {'ddl': ddl, 'rows': total_rows, 'verification': verification_rows}
+
+
+def ingest_files(conn: sqlite3.Connection, paths: List, table_name: str, sampling_strategy: str = "head",
+                 bulk_load: bool = True, index_columns: List[str] = (), merge_matching_headers: bool = True,
+                 parallel: bool = False, preserve_order: bool = True, workers: int = MAX_WORKERS,
+                 report: Optional[IngestReporter] = None, metrics_file: Optional[str] = METRICS_FILE,
+                 rss_ceiling_mb: Optional[float] = None, fts_columns: Sequence[str] = ()) -> Dict[str, Any]:
+    """
+    Carrega arquivos em disco. Um único arquivo segue ingest_source (com o cache de
+    ingestão e a leitura paralela de .csv). Vários são lidos em paralelo, um processo por
+    CSV, por process_csv_inputs_workflow, com um único escritor: cada membro de um ZIP
+    conta como um CSV; dos demais formatos é lido o (primeiro) CSV do arquivo.
+    Retorna o mesmo que ingest_source.
+    """
+    report = report or IngestReporter()
+    paths = [Path(path) for path in paths]
+    if len(paths) == 1:
+        return ingest_source(conn, FileSource(paths[0]), table_name, sampling_strategy, bulk_load, index_columns,
+                             merge_matching_headers, parallel, preserve_order, report, metrics_file,
+                             rss_ceiling_mb, fts_columns)
+
+    inputs: Dict[str, Tuple[Path, Optional[str]]] = {}
+    try:
+        for path in paths:
+            if path.suffix.lower() == ".zip":
+                members = [(f"{path.name}/{member}", member) for member in list_zip_csv_members(path)]
+            else:
+                members = [(path.name, None)]
+            for name, member in members:
+                if name in inputs:
+                    # Arquivos de mesmo nome em pastas diferentes ficam com o caminho completo
+                    name = str(path / member) if member else str(path)
+                inputs[name] = (path, member)
+        source_bytes = sum(os.path.getsize(path) for path in paths)
+    except (OSError, zipfile.BadZipFile) as e:
+        report.error(f"Erro Crítico durante o processamento: {str(e)}")
+        return {'tables': [], 'member_stats': []}
+
+    tables, member_stats = process_csv_inputs_workflow(
+        conn, inputs, table_name, sampling_strategy, bulk_load, index_columns, merge_matching_headers,
+        report, metrics_file, source_name=f"{len(paths)} arquivos", source_bytes=source_bytes,
+        csv_bytes=source_bytes, mode="files", workers=workers, rss_ceiling_mb=rss_ceiling_mb,
+        fts_columns=fts_columns,
+    )
+    return {'tables': tables, 'member_stats': member_stats}
@@ -0,0 +1,125 @@
+"""
+Cache persistente das respostas do Gemini.
+
+As respostas ficam na tabela llm_responses de um banco SQLite próprio (separado do
+banco de dados, como o de jobs). A chave é o SHA-256 do modelo, do template do prompt
+e dos valores usados para preenchê-lo (esquema/amostra da tabela, descrição, pergunta...),
+então mudar qualquer um deles, inclusive o texto do template, gera uma chave nova.
+As entradas expiram depois do TTL e, passado o limite de tamanho, as usadas há mais
+tempo são descartadas.
+"""
+import hashlib
+import json
+import sqlite3
+import time
+from typing import Any, Dict, Optional
+
+LLM_CACHE_TABLE = "llm_responses"
+
+
+def make_llm_cache_key(model: str, template: str, **fields: Any) -> str:
+    """Hash do modelo, do template e dos campos que preenchem o prompt."""
+    payload = json.dumps({'model': model, 'template': template, 'fields': fields},
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMResponseCache:
+    """Respostas de texto do modelo guardadas em SQLite, com TTL e limite de bytes."""
+
+    def __init__(self, db_file: str, ttl_seconds: float, max_bytes: int):
+        self._db_file = db_file
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {LLM_CACHE_TABLE} (
+                        key TEXT PRIMARY KEY,
+                        model TEXT,
+                        response TEXT NOT NULL,
+                        size_bytes INTEGER NOT NULL,
+                        created_at REAL NOT NULL,
+                        last_used_at REAL NOT NULL
+                    )
+                """)
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{LLM_CACHE_TABLE}_last_used "
+                             f"ON {LLM_CACHE_TABLE} (last_used_at)")
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self._db_file, timeout=30.0)
+
+    def get(self, key: str) -> Optional[str]:
+        """Resposta guardada para key, ou None se não houver ou tiver expirado."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                row = conn.execute(f"SELECT response, created_at FROM {LLM_CACHE_TABLE} WHERE key = ?",
+                                   (key,)).fetchone()
+                if row is None or now - row[1] > self.ttl_seconds:
+                    if row is not None:
+                        conn.execute(f"DELETE FROM {LLM_CACHE_TABLE} WHERE key = ?", (key,))
+                    self.misses += 1
+                    return None
+                conn.execute(f"UPDATE {LLM_CACHE_TABLE} SET last_used_at = ? WHERE key = ?", (now, key))
+        finally:
+            conn.close()
+        self.hits += 1
+        return row[0]
+
+    def put(self, key: str, model: str, response: str):
+        size = len(response.encode('utf-8'))
+        # Resposta maior que o limite inteiro não é guardada
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {LLM_CACHE_TABLE} (key, model, response, size_bytes, created_at, "
+                    f"last_used_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, model, response, size, now, now),
+                )
+                self._evict(conn, now)
+        finally:
+            conn.close()
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """Remove as entradas expiradas e, passado o limite de bytes, as usadas há mais tempo."""
+        conn.execute(f"DELETE FROM {LLM_CACHE_TABLE} WHERE created_at < ?", (now - self.ttl_seconds,))
+        total = conn.execute(f"SELECT COALESCE(SUM(size_bytes), 0) FROM {LLM_CACHE_TABLE}").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        stale = []
+        for key, size in conn.execute(f"SELECT key, size_bytes FROM {LLM_CACHE_TABLE} ORDER BY last_used_at"):
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        conn.executemany(f"DELETE FROM {LLM_CACHE_TABLE} WHERE key = ?", stale)
+
+    def clear(self):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(f"DELETE FROM {LLM_CACHE_TABLE}")
+        finally:
+            conn.close()
+
+    def stats(self) -> Dict[str, int]:
+        conn = self._connect()
+        try:
+            entries, bytes_used = conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM {LLM_CACHE_TABLE}").fetchone()
+        finally:
+            conn.close()
+        return {'entries': entries, 'bytes_used': bytes_used, 'max_bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses}
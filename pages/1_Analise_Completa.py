@@ -5,12 +5,105 @@ import os
 import requests
 import json
 import re
-from typing import List
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import gemini_client
+from chart_data import CHART_MAX_POINTS, aggregation_sql, chart_spec, downsample, finish_aggregated, needs_reduction
+from column_stats import format_profile_for_prompt
+from db_pool import READ_POOL_SIZE, ConnectionPool, PoolTimeout, get_pool
+from fts_index import format_fts_for_prompt
+from gemini_client import GeminiClient, GeminiError
+from index_advisor import (QueryLog, advisor_indexes, create_index, drop_unused_indexes, log_cache_hit,
+                           propose_indexes, run_logged)
+from ingest_cache import get_table_versions
+from ingest_metrics import append_metrics_record
+from llm_cache import LLMResponseCache, make_llm_cache_key
+from query_cache import QueryResultCache, is_cacheable, referenced_tables
+from query_guard import MAX_ESTIMATED_ROWS, QUERY_TIME_BUDGET_SECONDS, QueryAborted, check_cost, guarded
+from query_results import fetch_bounded, summarize_result
+from schema_cache import SchemaCache
 
 # ----------------------------------------------------------------------
 # CONFIGURAÇÕES
 # ----------------------------------------------------------------------
 DB_FILE = "db.sqlite"
+
+# Orçamento de memória padrão do cache de resultados das consultas (ajustável na barra lateral)
+QUERY_CACHE_MAX_MB = 128
+
+# Máximo de linhas lidas de um resultado (ajustável na barra lateral) e linhas por página na
+# exibição. As páginas são fatias do resultado já lido (ver mostrar_resultado_paginado), então
+# o limite também é o quanto do resultado fica em memória
+RESULT_MAX_ROWS = 20_000
+RESULT_PAGE_ROWS = 1_000
+
+# Log das consultas executadas (plano e tempo), lido pelo assistente de índices
+QUERY_LOG_FILE = "query_log.sqlite"
+
+# Consultas executadas em outra thread: intervalo de atualização do andamento na página e
+# espera, na execução seguinte, pelo fim de uma consulta cancelada
+QUERY_POLL_SECONDS = 0.2
+QUERY_CANCEL_WAIT_SECONDS = 5
+
+# Consultas abortadas (custo, tempo, cancelamento), uma linha JSON por consulta
+QUERY_ABORTS_FILE = "query_aborts.jsonl"
+
+# Tempo de geração de cada execução da página (e dos metadados das tabelas), uma linha JSON por execução
+PAGE_METRICS_FILE = "page_render_metrics.jsonl"
+
+# Espera pela conexão de escrita ao criar/remover índices (uma carga pode estar gravando)
+INDEX_WRITER_TIMEOUT_SECONDS = 5
+
+# Gemini: modelo e endereço da API (GEMINI_API_BASE permite apontar para um servidor local de testes)
+GEMINI_MODEL = "gemini-2.5-flash"
+GEMINI_API_BASE = os.environ.get("GEMINI_API_BASE", gemini_client.GEMINI_API_BASE)
+
+# Latência de cada chamada ao Gemini (tempo até o primeiro token, total, tentativas), uma linha JSON por chamada
+GEMINI_METRICS_FILE = "gemini_metrics.jsonl"
+
+# Cache persistente das respostas do Gemini (banco separado do banco de dados)
+LLM_CACHE_FILE = "llm_cache.sqlite"
+LLM_CACHE_TTL_HOURS = 24
+LLM_CACHE_MAX_MB = 50
+
+# Templates dos prompts (o texto do template faz parte da chave do cache de respostas)
+SQL_PROMPT_TEMPLATE = """
+Você deve gerar um comando SQL **apenas usando a tabela '{tabela}'**.
+Não use nenhuma outra tabela, apenas esta (e o índice de busca textual dela, se houver).
+
+Aqui está uma amostra do conteúdo da tabela que vamos analisar (incluindo nomes das colunas):
+{amostra}
+
+Estatísticas das colunas da tabela inteira (calculadas na carga):
+{estatisticas}
+
+Índice de busca textual: {busca_textual}
+
+O breve descritivo sobre os dados é: {descricao}
+
+Responder com o comando SQL para sqlite que reúne os dados que precisa para responder a pergunta no formato:
+{{"comandosql":"..."}}
+
+Pergunta do usuário: {pergunta}
+"""
+
+EXPLICACAO_PROMPT_TEMPLATE = """
+Na pergunta original, o usuário pediu: "{pergunta}".
+
+O comando SQL executado foi:
+{comando_sql}
+
+O resultado retornado pelo SQLite foi (inteiro, se pequeno, ou resumido por coluna):
+{resultado}
+
+Explique em linguagem clara o que esse resultado significa,
+faça considerações sobre os dados e sugira (ou descreva) um gráfico adequado para representar essas informações.
+"""
+page_start = time.perf_counter()
 st.set_page_config(layout="wide")
 st.title("Análise SQL via Gemini com Explicações e Gráficos")
 st.markdown("Pergunte em linguagem natural → IA irá gerar o SQL → SQL será executado no SQLite → Gemini explica o resultado.")
@@ -19,20 +112,244 @@ st.markdown("Pergunte em linguagem natural → IA irá gerar o SQL → SQL será
 # FUNÇÕES SQLITE
 # ----------------------------------------------------------------------
 @st.cache_resource
-def get_sqlite_connection_analysis():
+def get_db_pool() -> ConnectionPool:
+    """
+    Pool compartilhado com a página de carga: cada leitura pega uma conexão somente
+    leitura (mode=ro) e a devolve ao fim do bloco; escritas usam o escritor único.
+    """
     if not os.path.exists(DB_FILE):
         st.error(f"O banco de dados '{DB_FILE}' não foi encontrado. Execute uma carga de CSV na tela inicial.")
         st.stop()
-    return sqlite3.connect(DB_FILE, timeout=30.0, check_same_thread=False)
+    return get_pool(DB_FILE)
+
+@st.cache_resource
+def get_schema_cache() -> SchemaCache:
+    """
+    Lista de tabelas e colunas, amostra e estatísticas de cada tabela, compartilhadas
+    pelas sessões e relidas só quando o esquema ou os dados da tabela mudam.
+    """
+    return SchemaCache()
+
+# ----------------------------------------------------------------------
+# CACHE DE RESULTADOS DAS CONSULTAS
+# ----------------------------------------------------------------------
+@st.cache_resource
+def get_query_cache() -> QueryResultCache:
+    """Cache de resultados compartilhado por todas as sessões."""
+    return QueryResultCache(QUERY_CACHE_MAX_MB * 1024 * 1024)
 
-def get_table_list(conn: sqlite3.Connection) -> List[str]:
-    query = "SELECT name FROM sqlite_master WHERE type='table';"
-    tables = pd.read_sql_query(query, conn)['name'].tolist()
-    return [t for t in tables if not t.startswith('sqlite_')]
+@st.cache_resource
+def get_query_log() -> QueryLog:
+    return QueryLog(QUERY_LOG_FILE)
 
-def get_table_sample(conn: sqlite3.Connection, table: str) -> pd.DataFrame:
-    q = f"SELECT * FROM {table} LIMIT 3;"
-    return pd.read_sql_query(q, conn)
+def run_query_cached(conn: sqlite3.Connection, sql: str, tables: List[str], max_rows: int,
+                     time_budget: float, max_estimated_rows: int,
+                     cancel_event: Optional[threading.Event] = None) -> Tuple[pd.DataFrame, bool, bool]:
+    """
+    Executa a consulta (lendo no máximo max_rows linhas, com registro no log de
+    consultas) ou devolve o resultado do cache (também registrado no log, como acerto do cache). A chave inclui a versão de dados das tabelas citadas, então uma nova carga
+    nelas invalida o resultado. Antes de executar, o custo estimado é conferido; durante a
+    execução valem o orçamento de tempo e o cancelamento (QueryAborted).
+    Retorna (resultado, truncado, veio do cache).
+    """
+    if not is_cacheable(sql):
+        check_cost(conn, sql, max_estimated_rows)
+        with guarded(conn, time_budget, cancel_event):
+            return (*fetch_bounded(conn, sql, max_rows), False)
+
+    cache = get_query_cache()
+    key = cache.make_key(sql, get_table_versions(conn.cursor(), referenced_tables(sql, tables))) + (max_rows,)
+    df = cache.get(key)
+    if df is not None:
+        log_cache_hit(conn, get_query_log(), sql, referenced_tables(sql, tables), len(df))
+        return df, df.attrs['truncated'], True
+    check_cost(conn, sql, max_estimated_rows)
+    with guarded(conn, time_budget, cancel_event):
+        df, truncated = run_logged(conn, get_query_log(), sql, referenced_tables(sql, tables), max_rows)
+    df.attrs['truncated'] = truncated
+    cache.put(key, df)
+    return df, truncated, False
+
+@st.cache_resource
+def get_query_executor() -> ThreadPoolExecutor:
+    """Threads das consultas: a do script fica livre para mostrar o andamento e o botão de cancelar."""
+    return ThreadPoolExecutor(max_workers=READ_POOL_SIZE, thread_name_prefix="consulta")
+
+def executar_consulta(pool: ConnectionPool, sql: str, tables: List[str], max_rows: int, time_budget: float,
+                      max_estimated_rows: int, chave: str = "cancelar_consulta") -> Tuple[pd.DataFrame, bool, bool]:
+    """
+    run_query_cached em outra thread, com o tempo decorrido e um botão de cancelar na
+    página (chave: key do botão, única por consulta da execução). O clique (em qualquer
+    widget) reinicia o script: a consulta em andamento é cancelada e o motivo aparece na
+    execução seguinte.
+    """
+    cancelar = threading.Event()
+
+    def tarefa():
+        with pool.reader() as conn:
+            return run_query_cached(conn, sql, tables, max_rows, time_budget, max_estimated_rows, cancelar)
+
+    futuro = get_query_executor().submit(tarefa)
+    botao, andamento = st.empty(), st.empty()
+    botao.button("Cancelar consulta", key=chave)
+    inicio = time.perf_counter()
+    try:
+        while True:
+            try:
+                return futuro.result(timeout=QUERY_POLL_SECONDS)
+            except FuturesTimeout:
+                andamento.caption(f"Executando a consulta... {time.perf_counter() - inicio:.1f} s")
+    finally:
+        if not futuro.done():
+            cancelar.set()
+            st.session_state['consulta_cancelada'] = (futuro, sql)
+        botao.empty()
+        andamento.empty()
+
+def reportar_consulta_abortada(erro: QueryAborted, sql: str):
+    """Mostra o motivo e o tempo gasto e grava a consulta abortada no arquivo de métricas."""
+    append_metrics_record(QUERY_ABORTS_FILE, {
+        'timestamp': datetime.now().isoformat(timespec='seconds'), 'reason': erro.reason,
+        'elapsed_seconds': round(erro.elapsed_seconds, 3), 'detail': erro.detail, 'sql': sql,
+    })
+    if erro.reason == 'cancelada':
+        st.warning(str(erro))
+    else:
+        st.error(f"{erro} Ajuste os limites na barra lateral ou refine a pergunta.")
+
+def criar_indices_sugeridos(pool: ConnectionPool, propostas: List[dict]):
+    """
+    Cria os índices sugeridos com a conexão de escrita, mostrando o tempo da consulta de
+    exemplo antes e depois. Com uma carga em andamento, a criação fica para depois.
+    """
+    medicoes = []
+    for proposta in propostas:
+        with st.spinner(f"Criando índice em {proposta['table']} ({', '.join(proposta['columns'])})..."):
+            try:
+                with pool.writer(timeout=INDEX_WRITER_TIMEOUT_SECONDS) as conn:
+                    medicoes.append(create_index(conn, proposta))
+            except PoolTimeout as e:
+                st.warning(f"Índices não criados: {e}")
+                break
+    if not medicoes:
+        return
+    st.dataframe(pd.DataFrame(medicoes), use_container_width=True)
+    descartados = [m['index'] for m in medicoes if not m['kept']]
+    if descartados:
+        st.caption(f"Índice(s) sem ganho suficiente, removido(s): {', '.join(descartados)}")
+
+@st.fragment
+def mostrar_grafico(pool: ConnectionPool, sql: str, df: pd.DataFrame, truncado: bool, tables: List[str],
+                    time_budget: float, max_estimated_rows: int):
+    """
+    Gráfico automático do resultado com no máximo CHART_MAX_POINTS pontos: resultados
+    maiores (ou truncados) são agregados no SQLite sobre a consulta inteira; se não der,
+    reduzidos em memória (chart_data.downsample).
+    """
+    spec = chart_spec(df)
+    if spec is None:
+        st.info("Não há colunas numéricas para gerar gráfico automaticamente.")
+        return
+
+    st.subheader("Visualização sugerida")
+    dados = df
+    if needs_reduction(df, truncado):
+        inicio = time.perf_counter()
+        try:
+            agregado, _, _ = executar_consulta(pool, aggregation_sql(sql, spec), tables, 2 * CHART_MAX_POINTS,
+                                               time_budget, max_estimated_rows, chave="cancelar_grafico")
+            dados = finish_aggregated(agregado, spec)
+            origem = f"{int(agregado['linhas'].sum()):,} linhas agregadas no SQLite"
+            metodo_linha = "mínimo e máximo por faixa de linhas"
+        except Exception as e:
+            # Comando que não é SELECT, consulta abortada ou erro: reduz o que já foi lido
+            dados = downsample(df, spec)
+            origem = (f"as {len(df):,} linhas {'lidas ' if truncado else ''}reduzidas em memória "
+                      f"(agregação no SQLite indisponível: {e})")
+            metodo_linha = "LTTB"
+        if spec['kind'] == 'bar':
+            metodo = f"soma de {spec['y']} em {len(dados):,} faixas de {spec['x']}"
+        else:
+            metodo = f"{dados.size:,} pontos por {metodo_linha}"
+        st.caption(f"Gráfico: {origem}; {metodo} ({time.perf_counter() - inicio:.2f} s).")
+
+    if spec['kind'] == 'bar':
+        st.bar_chart(dados, x=spec['x'], y=spec['y'])
+    else:
+        st.line_chart(dados)
+
+@st.fragment
+def mostrar_resultado_paginado(df: pd.DataFrame):
+    """
+    Tabela do resultado em páginas (trocar de página só reexecuta este fragmento). As
+    páginas são fatias do resultado já lido por fetch_bounded, limitado a
+    result_max_rows linhas, e não consultas WHERE chave > ? LIMIT ?: o SQL gerado é
+    arbitrário (junções, agregações, ORDER BY do modelo), sem uma chave única para a
+    paginação por chave, e cada página reexecutaria a consulta inteira.
+    """
+    n_pages = max(1, -(-len(df) // RESULT_PAGE_ROWS))
+    page = 1
+    if n_pages > 1:
+        page = st.number_input(f"Página (de {n_pages}, {RESULT_PAGE_ROWS} linhas cada)",
+                               min_value=1, max_value=n_pages, value=1, step=1)
+    start = (page - 1) * RESULT_PAGE_ROWS
+    st.dataframe(df.iloc[start:start + RESULT_PAGE_ROWS], use_container_width=True)
+
+# ----------------------------------------------------------------------
+# CHAMADA AO GEMINI (COM CACHE DE RESPOSTAS)
+# ----------------------------------------------------------------------
+@st.cache_resource
+def get_llm_cache() -> LLMResponseCache:
+    return LLMResponseCache(LLM_CACHE_FILE, LLM_CACHE_TTL_HOURS * 3600, LLM_CACHE_MAX_MB * 1024 * 1024)
+
+@st.cache_resource
+def get_gemini_client() -> GeminiClient:
+    """Cliente compartilhado: a sessão HTTP (keep-alive) é reaproveitada entre as análises."""
+    return GeminiClient(GEMINI_MODEL, GEMINI_API_BASE)
+
+def consultar_gemini(api_key: str, template: str, ignorar_cache: bool = False, streaming: bool = False,
+                     **campos) -> Tuple[Optional[str], Optional[str], bool]:
+    """
+    Preenche o template com os campos e consulta o Gemini, usando o cache de respostas
+    (a chave não inclui a API key). Com ignorar_cache a API é sempre chamada e a
+    resposta nova substitui a guardada. Com streaming o texto é escrito na página
+    conforme chega. Retorna (texto, erro, veio do cache).
+    """
+    cache = get_llm_cache()
+    key = make_llm_cache_key(GEMINI_MODEL, template, **campos)
+    if not ignorar_cache:
+        texto = cache.get(key)
+        if texto is not None:
+            return texto, None, True
+
+    client = get_gemini_client()
+    prompt = template.format(**campos)
+    latencia = {}
+    try:
+        if streaming:
+            texto = st.write_stream(client.stream(api_key, prompt, latencia))
+        else:
+            texto = client.generate(api_key, prompt, latencia)
+    except (GeminiError, requests.RequestException) as e:
+        return None, str(e), False
+    finally:
+        registrar_latencia(latencia, streaming)
+    cache.put(key, GEMINI_MODEL, texto)
+    return texto, None, False
+
+def registrar_latencia(latencia: dict, streaming: bool):
+    """Grava a latência da chamada no arquivo de métricas e mostra um resumo."""
+    registro = {'timestamp': datetime.now().isoformat(timespec='seconds'), 'model': GEMINI_MODEL,
+                'streaming': streaming, **latencia}
+    for campo in ('ttft_seconds', 'total_seconds'):
+        if campo in registro:
+            registro[campo] = round(registro[campo], 3)
+    append_metrics_record(GEMINI_METRICS_FILE, registro)
+    if 'total_seconds' in registro:
+        st.caption(
+            f"Gemini: primeiro token em {registro.get('ttft_seconds', registro['total_seconds']):.2f} s, "
+            f"total {registro['total_seconds']:.2f} s ({registro.get('attempts', 1)} tentativa(s))."
+        )
 
 # ----------------------------------------------------------------------
 # FUNÇÃO PARA PARSE DO JSON GERADO PELO GEMINI
@@ -70,64 +387,103 @@ def escape_column_names(sql: str, df_columns: list) -> str:
 st.sidebar.header("Configuração do Gemini")
 gemini_api_key = st.sidebar.text_input("Gemini API Key", type="password")
 
+st.sidebar.header("Cache de consultas")
+query_cache_mb = st.sidebar.number_input("Memória máxima (MB)", min_value=0, value=QUERY_CACHE_MAX_MB, step=16)
+get_query_cache().resize(int(query_cache_mb) * 1024 * 1024)
+
+st.sidebar.header("Limites das consultas")
+result_max_rows = int(st.sidebar.number_input("Máximo de linhas lidas por consulta", min_value=1,
+                                              value=RESULT_MAX_ROWS, step=10_000))
+query_time_budget = float(st.sidebar.number_input(
+    "Tempo máximo por consulta (s, 0 = sem limite)", min_value=0, value=QUERY_TIME_BUDGET_SECONDS, step=10
+))
+max_estimated_rows = int(st.sidebar.number_input(
+    "Máximo de linhas examinadas estimadas (0 = sem limite)", min_value=0, value=MAX_ESTIMATED_ROWS,
+    step=100_000_000, help="Estimativa pelo EXPLAIN QUERY PLAN; acima dela a consulta nem é executada."
+))
+
+st.sidebar.header("Cache de respostas do Gemini")
+ignorar_cache_llm = st.sidebar.checkbox(
+    "Ignorar cache (sempre consultar o Gemini)", value=False,
+    help=f"Respostas guardadas por {LLM_CACHE_TTL_HOURS} h para o mesmo modelo, prompt, tabela, descrição e pergunta."
+)
+if st.sidebar.button("Limpar cache de respostas"):
+    get_llm_cache().clear()
+
+st.sidebar.header("Assistente de índices")
+criar_indices_auto = st.sidebar.checkbox(
+    "Criar índices sugeridos automaticamente", value=False,
+    help="Depois de cada consulta, cria os índices para varreduras completas repetidas no log de consultas."
+)
+
 # ----------------------------------------------------------------------
 # INTERFACE
 # ----------------------------------------------------------------------
+metadata_start = time.perf_counter()
 try:
-    conn = get_sqlite_connection_analysis()
-    available_tables = get_table_list(conn)
+    pool = get_db_pool()
+    with pool.reader() as conn:
+        available_tables = get_schema_cache().tables(conn)
 except Exception:
     available_tables = []
+metadata_seconds = time.perf_counter() - metadata_start
+analise_executada = False
 
 if available_tables and gemini_api_key:
     st.markdown("---")
 
+    # Consulta cancelada na execução anterior (botão Cancelar ou outro widget clicado durante ela)
+    if 'consulta_cancelada' in st.session_state:
+        futuro, sql_cancelado = st.session_state.pop('consulta_cancelada')
+        try:
+            erro = futuro.exception(timeout=QUERY_CANCEL_WAIT_SECONDS)
+        except FuturesTimeout:
+            erro = None
+        if isinstance(erro, QueryAborted):
+            reportar_consulta_abortada(erro, sql_cancelado)
+
     selected_table = st.selectbox("Selecione uma Tabela", available_tables, index=0)
+
+    # Catálogo de estatísticas gravado na carga: esquema e perfil sem varrer a tabela
+    metadata_start = time.perf_counter()
+    with pool.reader() as conn:
+        table_metadata = get_schema_cache().table_metadata(conn, selected_table)
+    metadata_seconds += time.perf_counter() - metadata_start
+    column_profile = table_metadata['profile']
+    with st.expander("Esquema e estatísticas das colunas"):
+        if column_profile:
+            st.dataframe(pd.DataFrame(column_profile).drop(columns=['updated_at']), use_container_width=True)
+            st.caption(f"Calculadas na carga (atualizadas em {column_profile[0]['updated_at']}); "
+                       f"distintos estimados por HyperLogLog.")
+        else:
+            st.caption("Tabela sem estatísticas no catálogo (carregada antes dele ou em uma tabela já existente).")
     descricao_breve = st.text_area("Breve descrição sobre os dados", "Exemplo: Dados de vendas por cliente e produto.")
     pergunta = st.text_input("Digite sua pergunta em linguagem natural")
 
     if st.button("Gerar SQL, Executar e Analisar com Gemini"):
+        analise_executada = True
         # -----------------------------
-        # Pega sample real da tabela (3 linhas)
+        # Sample real da tabela (3 linhas), do cache de metadados
         # -----------------------------
-        sample_df = get_table_sample(conn, selected_table)
+        sample_df = table_metadata['sample']
         sample_str = sample_df.to_string(index=False)
 
         # -----------------------------
-        # Prompt para gerar SQL (usando somente a tabela selecionada)
-        # -----------------------------
-        prompt = f"""
-Você deve gerar um comando SQL **apenas usando a tabela '{selected_table}'**.
-Não use nenhuma outra tabela, apenas esta.
-
-Aqui está uma amostra do conteúdo da tabela que vamos analisar (incluindo nomes das colunas):
-{sample_str}
-
-O breve descritivo sobre os dados é: {descricao_breve}
-
-Responder com o comando SQL para sqlite que reúne os dados que precisa para responder a pergunta no formato:
-{{"comandosql":"..."}}
-
-Pergunta do usuário: {pergunta}
-"""
-
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent?key={gemini_api_key}"
-
-        # -----------------------------
-        # Consulta Gemini para gerar SQL
+        # Consulta Gemini para gerar SQL (usando somente a tabela selecionada)
         # -----------------------------
         with st.spinner("Consultando Gemini para gerar SQL..."):
-            response = requests.post(
-                url,
-                headers={"Content-Type": "application/json"},
-                json={"contents": [{"parts": [{"text": prompt}]}]},
-                timeout=60
+            gemini_reply, erro_gemini, sql_do_cache = consultar_gemini(
+                gemini_api_key, SQL_PROMPT_TEMPLATE, ignorar_cache_llm,
+                tabela=selected_table, amostra=sample_str,
+                estatisticas=format_profile_for_prompt(column_profile) or "indisponíveis",
+                busca_textual=format_fts_for_prompt(selected_table, table_metadata['fts']),
+                descricao=descricao_breve, pergunta=pergunta
             )
 
-        if response.status_code == 200:
-            result = response.json()
-            gemini_reply = result["candidates"][0]["content"]["parts"][0]["text"]
+        if erro_gemini is None:
             st.subheader("Resposta do Gemini (Bruta)")
+            if sql_do_cache:
+                st.caption("Resposta vinda do cache (mesma pergunta, descrição e tabela).")
             st.text_area("Resposta Completa", gemini_reply, height=150)
 
             # -----------------------------
@@ -142,63 +498,120 @@ Pergunta do usuário: {pergunta}
                 st.success(f"SQL extraído (escapado): {comando_sql_escaped}")
                 with st.spinner("Executando consulta no SQLite..."):
                     try:
-                        df_result = pd.read_sql_query(comando_sql_escaped, conn)
+                        df_result, truncado, from_cache = executar_consulta(
+                            pool, comando_sql_escaped, available_tables, result_max_rows, query_time_budget,
+                            max_estimated_rows
+                        )
                         st.subheader("Resultado da Consulta SQL")
-                        st.dataframe(df_result, use_container_width=True)
+                        if from_cache:
+                            st.caption("Resultado vindo do cache (mesma consulta, dados inalterados).")
+                        if truncado:
+                            st.warning(f"A consulta retornou mais de {result_max_rows} linhas; só as primeiras "
+                                       f"{result_max_rows} foram lidas (ajuste o limite na barra lateral).")
+                        mostrar_resultado_paginado(df_result)
+                        if criar_indices_auto and not from_cache:
+                            with pool.reader() as conn:
+                                propostas = propose_indexes(conn, get_query_log())
+                            if propostas:
+                                st.subheader("Índices criados pelo assistente")
+                                criar_indices_sugeridos(pool, propostas)
 
                         # -----------------------------
-                        # Prompt para explicação do resultado
+                        # Consulta Gemini para explicar o resultado (escrita conforme chega)
                         # -----------------------------
-                        explicacao_prompt = f"""
-Na pergunta original, o usuário pediu: "{pergunta}".
-
-O comando SQL executado foi:
-{comando_sql_escaped}
-
-O resultado retornado pelo SQLite foi:
-{df_result.to_string(index=False)}
-
-Explique em linguagem clara o que esse resultado significa,
-faça considerações sobre os dados e sugira (ou descreva) um gráfico adequado para representar essas informações.
-"""
-
-                        with st.spinner("Consultando Gemini para explicar os resultados..."):
-                            response2 = requests.post(
-                                url,
-                                headers={"Content-Type": "application/json"},
-                                json={"contents": [{"parts": [{"text": explicacao_prompt}]}]},
-                                timeout=60
-                            )
-
-                        if response2.status_code == 200:
-                            result2 = response2.json()
-                            explicacao = result2["candidates"][0]["content"]["parts"][0]["text"]
-                            st.subheader("Considerações do Gemini sobre os resultados")
-                            st.markdown(explicacao)
+                        st.subheader("Considerações do Gemini sobre os resultados")
+                        explicacao, erro_explicacao, explicacao_do_cache = consultar_gemini(
+                            gemini_api_key, EXPLICACAO_PROMPT_TEMPLATE, ignorar_cache_llm, streaming=True,
+                            pergunta=pergunta, comando_sql=comando_sql_escaped,
+                            resultado=summarize_result(df_result, truncado)
+                        )
+
+                        if erro_explicacao is None:
+                            if explicacao_do_cache:
+                                st.caption("Explicação vinda do cache (mesma pergunta e mesmo resultado).")
+                                st.markdown(explicacao)
 
                             # -----------------------------
-                            # Gráfico automático (duas primeiras colunas numéricas)
+                            # Gráfico automático (duas primeiras colunas numéricas), com pontos limitados
                             # -----------------------------
-                            num_cols = df_result.select_dtypes(include='number').columns.tolist()
-                            if len(num_cols) >= 2:
-                                st.subheader("Visualização sugerida")
-                                st.bar_chart(df_result, x=num_cols[0], y=num_cols[1])
-                            elif len(num_cols) == 1:
-                                st.subheader("Visualização sugerida")
-                                st.line_chart(df_result[num_cols[0]])
-                            else:
-                                st.info("Não há colunas numéricas para gerar gráfico automaticamente.")
+                            mostrar_grafico(pool, comando_sql_escaped, df_result, truncado, available_tables,
+                                            query_time_budget, max_estimated_rows)
 
                         else:
-                            st.error(f"Erro na análise do Gemini: {response2.status_code} - {response2.text}")
+                            st.error(f"Erro na análise do Gemini: {erro_explicacao}")
 
+                    except QueryAborted as e:
+                        reportar_consulta_abortada(e, comando_sql_escaped)
                     except Exception as e:
                         st.error(f"Erro ao executar SQL: {e}")
 
             else:
                 st.error("Não foi possível extrair um comando SQL válido da resposta do Gemini.")
         else:
-            st.error(f"Erro na API Gemini: {response.status_code} - {response.text}")
+            st.error(f"Erro na API Gemini: {erro_gemini}")
 
 else:
     st.warning("Nenhuma tabela encontrada no banco de dados ou Gemini API Key não informada.")
+
+# ----------------------------------------------------------------------
+# ASSISTENTE DE ÍNDICES
+# ----------------------------------------------------------------------
+if available_tables:
+    with st.expander("Assistente de índices"):
+        with pool.reader() as conn:
+            propostas = propose_indexes(conn, get_query_log())
+            criados = advisor_indexes(conn)
+        if propostas:
+            st.markdown("Varreduras completas repetidas no log de consultas:")
+            st.dataframe(pd.DataFrame([{
+                'tabela': p['table'], 'colunas': ", ".join(p['columns']),
+                'cobertura': p['covering'], 'consultas': p['queries'], 'tempo total (ms)': round(p['total_ms'], 1),
+            } for p in propostas]), use_container_width=True)
+            if st.button("Criar índices sugeridos"):
+                criar_indices_sugeridos(pool, propostas)
+        else:
+            st.caption("Nenhum índice sugerido: o log não tem varreduras completas repetidas.")
+
+        if criados:
+            st.markdown("Índices criados pelo assistente:")
+            st.dataframe(pd.DataFrame(criados), use_container_width=True)
+            if st.button("Remover índices sem uso"):
+                try:
+                    with pool.writer(timeout=INDEX_WRITER_TIMEOUT_SECONDS) as conn:
+                        removidos = drop_unused_indexes(conn, get_query_log())
+                    st.info(f"Removido(s): {', '.join(removidos)}" if removidos else "Todos os índices tiveram uso.")
+                except PoolTimeout as e:
+                    st.warning(f"Índices não removidos: {e}")
+
+# Estatísticas do cache (depois da consulta desta execução)
+cache_stats = get_query_cache().stats()
+st.sidebar.caption(
+    f"Consultas: {cache_stats['hits']} acerto(s), {cache_stats['misses']} falha(s), "
+    f"{cache_stats['evictions']} descarte(s) por memória; {cache_stats['entries']} resultado(s) em "
+    f"{cache_stats['bytes_used'] / (1024 * 1024):.1f} de {cache_stats['max_bytes'] / (1024 * 1024):.0f} MB."
+)
+if available_tables:
+    pool_stats = pool.stats()
+    st.sidebar.caption(
+        f"Conexões de leitura: {pool_stats['readers_in_use']} em uso, {pool_stats['readers_open']} aberta(s) "
+        f"de {pool_stats['max_readers']}; escritor {'ocupado (carga em andamento?)' if pool_stats['writer_busy'] else 'livre'}."
+    )
+llm_stats = get_llm_cache().stats()
+st.sidebar.caption(
+    f"Respostas do Gemini: {llm_stats['hits']} acerto(s), {llm_stats['misses']} falha(s); "
+    f"{llm_stats['entries']} resposta(s) em {llm_stats['bytes_used'] / 1024:.0f} KB."
+)
+
+# Tempo de geração desta execução da página (widgets, metadados e, se houve, a análise)
+render_seconds = time.perf_counter() - page_start
+append_metrics_record(PAGE_METRICS_FILE, {
+    'timestamp': datetime.now().isoformat(timespec='seconds'), 'page': "analise",
+    'render_seconds': round(render_seconds, 4), 'metadata_seconds': round(metadata_seconds, 4),
+    'tables': len(available_tables), 'analysis': analise_executada,
+})
+schema_stats = get_schema_cache().stats()
+st.sidebar.caption(
+    f"Página gerada em {render_seconds * 1000:.0f} ms (metadados das tabelas: {metadata_seconds * 1000:.1f} ms). "
+    f"Cache de metadados: {schema_stats['hits']} acerto(s), {schema_stats['misses']} leitura(s) do banco, "
+    f"{schema_stats['invalidations']} invalidação(ões) por mudança de esquema ou carga."
+)
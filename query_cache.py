@@ -0,0 +1,114 @@
+"""
+Cache de resultados de consultas da página de análise.
+
+A chave é o SQL normalizado mais a versão de dados de cada tabela citada na
+consulta (ingest_cache.get_table_versions): uma carga que altera a tabela muda a
+versão e as entradas antigas deixam de ser encontradas. As entradas ficam em LRU,
+limitadas a um orçamento de memória (tamanho dos DataFrames).
+"""
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+# Literais e identificadores entre aspas (preservados na normalização) e comentários
+_SQL_TOKEN = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`|\[[^\]]*\])|(--[^\n]*|/\*.*?\*/)", re.S)
+
+# Só consultas de leitura são cacheadas
+_READ_ONLY_SQL = re.compile(r"^\s*(SELECT|WITH)\b", re.I)
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    SQL sem comentários, com espaços colapsados, ';' final removido e em minúsculas
+    fora dos literais e identificadores entre aspas.
+    """
+    parts = []
+    code = ""  # trecho fora de literais ainda não normalizado
+    last = 0
+    for match in _SQL_TOKEN.finditer(sql):
+        code += sql[last:match.start()]
+        last = match.end()
+        if match.group(1) is None:
+            code += " "  # comentário
+            continue
+        parts.append(re.sub(r"\s+", " ", code.lower()))
+        parts.append(match.group(1))
+        code = ""
+    parts.append(re.sub(r"\s+", " ", (code + sql[last:]).lower()))
+    return "".join(parts).strip().rstrip(";").strip()
+
+
+def is_cacheable(sql: str) -> bool:
+    return bool(_READ_ONLY_SQL.match(sql))
+
+
+def referenced_tables(sql: str, tables: Iterable[str]) -> List[str]:
+    """Tabelas de tables citadas em sql (comparação por palavra, sem diferenciar maiúsculas)."""
+    return sorted(
+        table for table in tables
+        if re.search(rf"(?<![\w]){re.escape(table)}(?![\w])", sql, re.I)
+    )
+
+
+class QueryResultCache:
+    """LRU de DataFrames com orçamento de memória, seguro para várias sessões (threads)."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple, Tuple[pd.DataFrame, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(sql: str, table_versions: Dict[str, int]) -> Tuple:
+        return normalize_sql(sql), tuple(sorted(table_versions.items()))
+
+    def get(self, key: Tuple) -> Optional[pd.DataFrame]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Tuple, df: pd.DataFrame):
+        size = int(df.memory_usage(index=True, deep=True).sum())
+        with self._lock:
+            if key in self._entries:
+                self.bytes_used -= self._entries.pop(key)[1]
+            # Resultado maior que o orçamento inteiro não é guardado
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (df, size)
+            self.bytes_used += size
+            self._evict()
+
+    def resize(self, max_bytes: int):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def _evict(self):
+        while self.bytes_used > self.max_bytes and self._entries:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.bytes_used -= size
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes_used': self.bytes_used,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,186 @@
+"""
+Execução protegida do SQL gerado pelo Gemini.
+
+Antes de executar, estimate_cost lê o EXPLAIN QUERY PLAN e estima as linhas
+examinadas: cada varredura completa vale as linhas da tabela, cada busca por índice
+uma fração delas (ou a média por chave do sqlite_stat1), e tabelas do mesmo laço
+(junções) se multiplicam. Uma junção cruzada acidental passa do limite e nem chega a
+rodar. Durante a execução, guarded instala um progress handler na conexão que
+interrompe a consulta quando o orçamento de tempo acaba ou quando alguém a cancela.
+O limite de linhas continua com o fetch_bounded. Consultas abortadas levantam
+QueryAborted com o motivo e o tempo gasto.
+"""
+import contextlib
+import math
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+# Orçamento de tempo padrão de uma consulta (segundos)
+QUERY_TIME_BUDGET_SECONDS = 30
+
+# Linhas examinadas estimadas acima das quais a consulta não é executada
+MAX_ESTIMATED_ROWS = 1_000_000_000
+
+# Instruções da VM do SQLite entre duas verificações do prazo/cancelamento (~1 ms)
+PROGRESS_HANDLER_OPS = 10_000
+
+# Fração da tabela lida por uma busca por índice sem estatística do ANALYZE
+SEARCH_EQ_FRACTION = 0.01
+SEARCH_RANGE_FRACTION = 0.25
+
+# Plano: "SCAN t", "SEARCH t USING INDEX i (a=? AND b>?)", "SEARCH t USING INTEGER PRIMARY KEY (rowid=?)"
+_PLAN_STEP = re.compile(r'^(SCAN|SEARCH) (?:TABLE )?("[^"]+"|\S+)(?: AS \S+)?'
+                        r'(?: USING (?:(INTEGER PRIMARY KEY)|(?:COVERING |AUTOMATIC (?:PARTIAL )?COVERING )?'
+                        r'INDEX ("[^"]+"|\S+)))?(?: \((.*)\))?')
+
+# Apelidos de tabela em FROM/JOIN/listas com vírgula ("FROM vendas v", "JOIN clientes AS c")
+_TABLE_ALIAS = re.compile(r'(?:\bFROM|\bJOIN|,)\s+("[^"]+"|[A-Za-z_]\w*)\s+(?:AS\s+)?("[^"]+"|[A-Za-z_]\w*)',
+                          re.IGNORECASE)
+_NOT_ALIASES = {'on', 'using', 'where', 'group', 'order', 'limit', 'having', 'join', 'inner', 'left', 'right',
+                'full', 'cross', 'natural', 'outer', 'union', 'except', 'intersect', 'window', 'from', 'as'}
+
+ABORT_REASONS = {
+    'custo': "custo estimado acima do limite",
+    'tempo': "orçamento de tempo esgotado",
+    'cancelada': "cancelada pelo usuário",
+}
+
+
+class QueryAborted(Exception):
+    """Consulta não executada ou interrompida (motivo: custo, tempo ou cancelada)."""
+
+    def __init__(self, reason: str, elapsed_seconds: float, detail: str = ""):
+        message = ABORT_REASONS[reason]
+        if detail:
+            message += f" ({detail})"
+        super().__init__(f"Consulta abortada: {message}, após {elapsed_seconds:.2f} s.")
+        self.reason = reason
+        self.elapsed_seconds = elapsed_seconds
+        self.detail = detail
+
+
+def _aliases(sql: str) -> Dict[str, str]:
+    """Apelido -> tabela (o plano das versões recentes do SQLite mostra só o apelido)."""
+    aliases = {}
+    for table, alias in _TABLE_ALIAS.findall(sql):
+        if alias.lower() not in _NOT_ALIASES:
+            aliases[alias.strip('"')] = table.strip('"')
+    return aliases
+
+
+def _table_rows(conn: sqlite3.Connection, name: str, aliases: Dict[str, str]) -> int:
+    """Linhas da tabela (ou do apelido) pelo maior rowid: uma busca na árvore, sem contar."""
+    for table in (name, aliases.get(name)):
+        if table is None:
+            continue
+        try:
+            row = conn.execute(f'SELECT max(rowid) FROM "{table}"').fetchone()
+        except sqlite3.Error:
+            continue
+        return max(1, row[0] or 0)
+    # CTE, subconsulta materializada ou tabela WITHOUT ROWID
+    return 1
+
+
+def _rows_per_key(conn: sqlite3.Connection, index: str) -> Optional[float]:
+    """Média de linhas por valor da primeira coluna do índice (sqlite_stat1), se houver ANALYZE."""
+    try:
+        row = conn.execute("SELECT stat FROM sqlite_stat1 WHERE idx = ?", (index,)).fetchone()
+    except sqlite3.Error:
+        return None
+    if row is None:
+        return None
+    parts = row[0].split()
+    return float(parts[1]) if len(parts) > 1 else None
+
+
+def _step_rows(conn: sqlite3.Connection, detail: str, aliases: Dict[str, str],
+               rows_cache: Dict[str, int]) -> Optional[float]:
+    match = _PLAN_STEP.match(detail)
+    if match is None:
+        return None
+    kind, table, rowid_key, index, constraint = match.groups()
+    table = table.strip('"')
+    if table not in rows_cache:
+        rows_cache[table] = _table_rows(conn, table, aliases)
+    rows = rows_cache[table]
+    if kind == 'SCAN':
+        return float(rows)
+    constraint = constraint or ""
+    if rowid_key and '=' in constraint and not re.search(r'[<>]', constraint):
+        return 1.0
+    if index and '=' in constraint.split(' AND ')[0]:
+        per_key = _rows_per_key(conn, index.strip('"'))
+        return per_key if per_key is not None else max(1.0, rows * SEARCH_EQ_FRACTION)
+    return max(1.0, rows * SEARCH_RANGE_FRACTION)
+
+
+def estimate_cost(conn: sqlite3.Connection, sql: str) -> Dict[str, Any]:
+    """
+    Plano e linhas examinadas estimadas. Os passos de um mesmo nó do plano formam um
+    laço aninhado (multiplicam); subconsultas e partes de um UNION somam. Subconsultas
+    correlacionadas ficam subestimadas: o orçamento de tempo cobre o resto.
+    """
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    aliases = _aliases(sql)
+    rows_cache: Dict[str, int] = {}
+    loops: Dict[int, float] = {}
+    full_scans: List[str] = []
+    for _, parent, _, detail in plan:
+        rows = _step_rows(conn, detail, aliases, rows_cache)
+        if rows is None:
+            continue
+        if detail.startswith('SCAN'):
+            full_scans.append(detail)
+        loops[parent] = loops.get(parent, 1.0) * rows
+    estimated = sum(loops.values())
+    return {
+        'plan': [row[3] for row in plan],
+        'estimated_rows': int(min(estimated, 1e18)) if math.isfinite(estimated) else int(1e18),
+        'full_scans': full_scans,
+    }
+
+
+def check_cost(conn: sqlite3.Connection, sql: str, max_estimated_rows: int = MAX_ESTIMATED_ROWS) -> Dict[str, Any]:
+    """Estimativa do custo; levanta QueryAborted('custo') se passar do limite (0 desliga o limite)."""
+    start = time.perf_counter()
+    cost = estimate_cost(conn, sql)
+    if max_estimated_rows and cost['estimated_rows'] > max_estimated_rows:
+        raise QueryAborted('custo', time.perf_counter() - start,
+                           f"~{cost['estimated_rows']:,} linhas examinadas; limite {max_estimated_rows:,}")
+    return cost
+
+
+@contextlib.contextmanager
+def guarded(conn: sqlite3.Connection, time_budget_seconds: Optional[float] = QUERY_TIME_BUDGET_SECONDS,
+            cancel_event: Optional[threading.Event] = None) -> Iterator[None]:
+    """
+    Executa o bloco com o prazo e o cancelamento verificados pelo progress handler. Uma
+    consulta interrompida vira QueryAborted ('tempo' ou 'cancelada').
+    """
+    start = time.monotonic()
+    deadline = None if not time_budget_seconds else start + time_budget_seconds
+    stopped: List[str] = []
+
+    def progress() -> int:
+        if cancel_event is not None and cancel_event.is_set():
+            stopped.append('cancelada')
+            return 1
+        if deadline is not None and time.monotonic() > deadline:
+            stopped.append('tempo')
+            return 1
+        return 0
+
+    conn.set_progress_handler(progress, PROGRESS_HANDLER_OPS)
+    try:
+        yield
+    except sqlite3.OperationalError as e:
+        if not stopped:
+            raise
+        detail = f"limite de {time_budget_seconds:g} s" if stopped[0] == 'tempo' else ""
+        raise QueryAborted(stopped[0], time.monotonic() - start, detail) from e
+    finally:
+        conn.set_progress_handler(None, 0)
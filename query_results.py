@@ -0,0 +1,93 @@
+"""
+Materialização limitada dos resultados das consultas da página de análise.
+
+fetch_bounded lê o resultado em blocos (fetchmany) e para no limite de linhas, sem
+nunca montar o resultado inteiro em memória. summarize_result gera o texto enviado
+ao Gemini no lugar do resultado: a tabela inteira se for pequena; se não, estatísticas
+por coluna (mín/máx/média, nulos, valores mais frequentes) e as primeiras/últimas linhas.
+"""
+import sqlite3
+from typing import List, Tuple
+
+import pandas as pd
+
+# Linhas lidas do cursor por vez
+FETCH_CHUNK_ROWS = 10_000
+
+# Resultados com até esta quantidade de linhas vão inteiros para o prompt
+SUMMARY_FULL_ROWS = 50
+
+# Valores mais frequentes por coluna e linhas do início/fim incluídas no resumo
+SUMMARY_TOP_K = 5
+SUMMARY_HEAD_ROWS = 5
+SUMMARY_TAIL_ROWS = 5
+
+
+def fetch_bounded(conn: sqlite3.Connection, sql: str, max_rows: int,
+                  chunk_rows: int = FETCH_CHUNK_ROWS) -> Tuple[pd.DataFrame, bool]:
+    """
+    Executa sql e lê no máximo max_rows linhas, em blocos de chunk_rows.
+    Retorna (resultado, truncado), truncado indicando que a consulta tinha mais linhas.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql)
+        if cursor.description is None:
+            # Comando sem resultado (ex.: PRAGMA de escrita)
+            return pd.DataFrame(), False
+        columns = [d[0] for d in cursor.description]
+        rows: List[tuple] = []
+        truncated = False
+        while len(rows) < max_rows:
+            chunk = cursor.fetchmany(min(chunk_rows, max_rows - len(rows)))
+            if not chunk:
+                break
+            rows.extend(chunk)
+        else:
+            # Atingiu o limite: basta uma linha a mais para saber se havia mais
+            truncated = cursor.fetchone() is not None
+    finally:
+        cursor.close()
+    return pd.DataFrame.from_records(rows, columns=columns), truncated
+
+
+def summarize_result(df: pd.DataFrame, truncated: bool = False) -> str:
+    """Texto que descreve o resultado para o prompt (inteiro se pequeno, resumido se grande)."""
+    n_rows = len(df)
+    header = f"{n_rows} linha(s)"
+    if truncated:
+        header += f" (limitado às primeiras {n_rows} linhas; a consulta retornou mais)"
+
+    if n_rows <= SUMMARY_FULL_ROWS:
+        return f"{header}:\n{df.to_string(index=False)}"
+
+    lines = [f"{header}. Resumo por coluna:"]
+    for column in df.columns:
+        lines.append(f"- {_summarize_column(df[column])}")
+    lines.append(f"\nPrimeiras {SUMMARY_HEAD_ROWS} linhas:")
+    lines.append(df.head(SUMMARY_HEAD_ROWS).to_string(index=False))
+    lines.append(f"\nÚltimas {SUMMARY_TAIL_ROWS} linhas:")
+    lines.append(df.tail(SUMMARY_TAIL_ROWS).to_string(index=False))
+    return "\n".join(lines)
+
+
+def _summarize_column(series: pd.Series) -> str:
+    nulls = int(series.isna().sum())
+    values = series.dropna()
+    if values.empty:
+        return f"{series.name}: todos os valores nulos"
+
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        return (f"{series.name} (numérica): mín {_fmt(values.min())}, máx {_fmt(values.max())}, "
+                f"média {_fmt(values.mean())}, nulos {nulls}")
+
+    counts = values.astype(str).value_counts()
+    top = ", ".join(f"{value} ({count})" for value, count in counts.head(SUMMARY_TOP_K).items())
+    # Texto: mín/máx lexicográficos (úteis para datas ISO)
+    text = values.astype(str)
+    return (f"{series.name} (texto): {len(counts)} distinto(s), mín {text.min()}, máx {text.max()}, "
+            f"nulos {nulls}; mais frequentes: {top}")
+
+
+def _fmt(value) -> str:
+    return f"{value:.6g}" if isinstance(value, float) else str(value)
@@ -0,0 +1,120 @@
+"""
+Cache dos metadados do banco usados pela página de análise: a lista de tabelas e, de
+cada tabela, as colunas com os tipos declarados, a amostra mostrada ao Gemini, as
+estatísticas do catálogo (column_stats) e o índice de busca textual (fts_index).
+
+Os metadados só são lidos de novo quando mudam. A lista de tabelas e as colunas
+dependem de PRAGMA schema_version, que o SQLite incrementa a cada DDL (inclusive de
+outros processos, como a CLI de carga). A amostra e as estatísticas de uma tabela
+dependem também da versão de dados dela (ingest_cache.get_table_versions), incrementada
+por toda carga na mesma transação. PRAGMA data_version não serve aqui: o valor é de
+cada conexão e as leituras da página vêm de um pool de conexões.
+
+Validar o cache custa duas leituras pequenas por execução da página, em vez da leitura
+do sqlite_master e das amostras com pandas a cada interação.
+"""
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from column_stats import STATS_TABLE, get_table_profile
+from fts_index import FTS_REGISTRY_TABLE, fts_table_name, get_fts_index
+from index_advisor import ADVISOR_INDEXES_TABLE
+from ingest_cache import INGEST_CACHE_TABLE, TABLE_VERSIONS_TABLE, get_table_versions
+
+# Linhas da amostra de cada tabela (vão para o prompt do Gemini)
+SAMPLE_ROWS = 3
+
+# Tabelas internas da aplicação, fora da lista de tabelas do usuário. Só estes nomes e
+# prefixos: uma tabela carregada pelo usuário pode começar com "_" (ex.: _vendas)
+INTERNAL_TABLES = {STATS_TABLE, INGEST_CACHE_TABLE, TABLE_VERSIONS_TABLE, FTS_REGISTRY_TABLE, ADVISOR_INDEXES_TABLE}
+# sqlite_* (sqlite_sequence, sqlite_stat1...) e os índices FTS5 com as tabelas auxiliares
+# deles (_fts_<tabela>_data, _idx, _docsize, _config)
+INTERNAL_PREFIXES = ('sqlite_', fts_table_name(''))
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA schema_version").fetchone()[0]
+
+
+def list_user_tables(conn: sqlite3.Connection) -> List[str]:
+    """Tabelas de dados do usuário (sem as internas: INTERNAL_TABLES e INTERNAL_PREFIXES)."""
+    rows = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+    return [name for (name,) in rows if name not in INTERNAL_TABLES and not name.startswith(INTERNAL_PREFIXES)]
+
+
+def read_table_metadata(conn: sqlite3.Connection, table: str) -> Dict[str, Any]:
+    """Colunas (nome e tipo declarado), amostra, estatísticas e índice FTS5 de uma tabela, lidos do banco."""
+    cursor = conn.cursor()
+    columns = [(row[1], row[2]) for row in cursor.execute(f"PRAGMA table_info(\"{table}\")").fetchall()]
+    return {
+        'columns': columns,
+        'sample': pd.read_sql_query(f"SELECT * FROM \"{table}\" LIMIT {SAMPLE_ROWS}", conn),
+        'profile': get_table_profile(cursor, table),
+        'fts': get_fts_index(cursor, table),
+    }
+
+
+class SchemaCache:
+    """Metadados de um banco, compartilhados por todas as sessões (threads)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._schema_version: Optional[int] = None
+        self._tables: List[str] = []
+        self._tables_metadata: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def tables(self, conn: sqlite3.Connection) -> List[str]:
+        """Lista de tabelas do usuário; relida só quando o esquema muda."""
+        version = schema_version(conn)
+        with self._lock:
+            if version == self._schema_version:
+                self.hits += 1
+                return list(self._tables)
+
+        tables = list_user_tables(conn)
+        with self._lock:
+            self.misses += 1
+            if self._schema_version is not None:
+                self.invalidations += 1
+            self._schema_version = version
+            self._tables = tables
+            # Colunas de tabelas alteradas ou recriadas também mudaram
+            self._tables_metadata.clear()
+        return list(tables)
+
+    def table_metadata(self, conn: sqlite3.Connection, table: str) -> Dict[str, Any]:
+        """
+        Colunas, amostra ('sample', DataFrame compartilhado: não alterar), estatísticas
+        ('profile') e índice de busca textual ('fts') da tabela; relidos quando o esquema
+        ou a versão de dados dela mudam.
+        """
+        key = (schema_version(conn), get_table_versions(conn.cursor(), [table])[table])
+        with self._lock:
+            entry = self._tables_metadata.get(table)
+            if entry is not None and entry[0] == key:
+                self.hits += 1
+                return entry[1]
+
+        metadata = read_table_metadata(conn, table)
+        with self._lock:
+            self.misses += 1
+            if entry is not None:
+                self.invalidations += 1
+            self._tables_metadata[table] = (key, metadata)
+        return metadata
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'tables': len(self._tables),
+                'tables_cached': len(self._tables_metadata),
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+            }
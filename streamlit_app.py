@@ -1,15 +1,19 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
-import os
-import uuid
 import zipfile
 import re
-import io
-import numpy as np  # <--- ADICIONE ESTA LINHA!
-import csv
+import uuid
+from functools import partial
 from pathlib import Path
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any
+
+from batch_sizing import RSS_CEILING_MB
+from db_pool import get_pool
+from ingest_core import UploadSource, normalize_header
+from ingest_input import detect_format, list_csv_members, supported_suffixes
+from ingest_jobs import FINAL_STATUSES, IngestReporter, JobManager
+from ingest_pipeline import MAX_WORKERS, PARALLEL_CSV_MIN_BYTES, ingest_source
+from type_inference import SAMPLING_STRATEGIES
 
 # ----------------------------------------------------------------------
 # CONFIGURAÇÕES E INICIALIZAÇÃO
@@ -31,61 +35,34 @@ st.markdown(f"**{repo_text}:** [{github_link}]({github_link})")
 # Para um botão, se preferir:
 st.link_button("Acessar", github_link)
 
-# Pasta de dados para salvar temporariamente o arquivo (necessário para zip e segurança)
+# Pasta dos arquivos temporários (uploads grandes e entradas dos pools de processos)
 DATA_DIR = Path("./dados_temp")
 DATA_DIR.mkdir(exist_ok=True)
 
 # Arquivo do banco de dados SQLite local
 DB_FILE = "db.sqlite"
 
-# Tamanho do lote de inserção e chunking
-CHUNK_SIZE = 50000 
-BATCH_SIZE = 5000 
+# Fila de jobs de ingestão, compartilhada pelas sessões. Um job por vez: o SQLite tem um
+# único escritor, e mais threads só ficariam esperando a trava de escrita.
+JOBS_DB_FILE = "jobs.sqlite"
+JOB_WORKERS = 1
+JOB_STATUS_LABELS = {
+    'queued': "Na fila",
+    'running': "Em andamento",
+    'done': "Concluído",
+    'failed': "Falhou",
+    'cancelled': "Cancelado",
+    'interrupted': "Interrompido",
+}
 
 # ----------------------------------------------------------------------
 # FUNÇÕES DE BANCO DE DADOS E PROCESSAMENTO
 # ----------------------------------------------------------------------
 
 @st.cache_resource
-def get_sqlite_connection():
-    """Retorna uma conexão SQLite segura e cached."""
-    # CORREÇÃO: Adicione check_same_thread=False para evitar o erro de thread do Streamlit
-    return sqlite3.connect(DB_FILE, timeout=30.0, check_same_thread=False)
-
-def execute_batch_insert_sqlite(cursor: sqlite3.Cursor, table_name: str, columns: List[str], batch_data: List[Tuple]):
-    """Executa um INSERT em lote usando executemany."""
-    column_names = ', '.join(f'"{col}"' for col in columns)
-    placeholders = ', '.join(['?'] * len(columns))
-    insert_query_str = f"INSERT INTO \"{table_name}\" ({column_names}) VALUES ({placeholders})"
-    cursor.executemany(insert_query_str, batch_data)
-
-def execute_select_limit(conn: sqlite3.Connection, table_name: str, limit: int = 50) -> List[Dict[str, Any]]:
-    """Seleciona as primeiras N linhas da tabela para verificação."""
-    query = f"SELECT * FROM \"{table_name}\" LIMIT {limit}"
-    
-    conn.row_factory = sqlite3.Row 
-    cursor = conn.cursor()
-    cursor.execute(query)
-    
-    rows = cursor.fetchall()
-    return [dict(row) for row in rows]
-
-
-def get_csv_stream(file_path: Path):
-    """Retorna o stream de texto para o CSV, seja ele solto ou dentro de um ZIP."""
-    if file_path.suffix == ".zip":
-        with zipfile.ZipFile(file_path, "r") as z:
-            csv_files = [f for f in z.namelist() if f.endswith(".csv")]
-            if not csv_files: raise ValueError("ZIP não contém arquivos CSV.")
-            
-            # Nota: Retornamos o stream aberto, quem chama é responsável por fechar o ZIP
-            return z.open(csv_files[0], 'r')
-    
-    elif file_path.suffix == ".csv":
-        return open(file_path, 'r', encoding='utf-8')
-        
-    else:
-        raise ValueError("Formato inválido. Apenas .csv ou .zip.")
+def get_job_manager() -> JobManager:
+    """Fila de jobs de ingestão do servidor (a mesma para todas as sessões)."""
+    return JobManager(JOBS_DB_FILE, workers=JOB_WORKERS)
 
 # ----------------------------------------------------------------------
 # FUNÇÃO DE ANÁLISE E INSERÇÃO COMPLETA
@@ -101,179 +78,125 @@ js_code = f"""
 st.markdown(js_code, unsafe_allow_html=True)
 
 
-def process_full_workflow(file_path: Path, table_name: str):
-    """Gerencia DDL, criação de tabela e inserção em lote."""
-    
-    conn = get_sqlite_connection()
-    row_count = 0
-    ddl_query = ""
+def run_ingest_job(report: IngestReporter, source: UploadSource, table_name: str, sampling_strategy: str,
+                   bulk_load: bool, index_columns: List[str], merge_matching_headers: bool, parallel: bool,
+                   preserve_order: bool, rss_ceiling_mb: float, fts_columns: List[str]) -> Dict[str, Any]:
+    """
+    Executa a carga (ingest_pipeline.ingest_source, a mesma da CLI) como job do
+    JobManager, fora da thread do script, com a conexão de escrita do pool (as leituras
+    da página de análise continuam durante a carga). Retorna o resultado exibido pela
+    interface.
+    """
+    with get_pool(DB_FILE).writer(timeout=None) as conn:
+        return ingest_source(conn, source, table_name, sampling_strategy, bulk_load, index_columns,
+                             merge_matching_headers, parallel, preserve_order, report=report,
+                             rss_ceiling_mb=rss_ceiling_mb, fts_columns=fts_columns)
+
+
+def show_job_result(job: Dict[str, Any]):
+    """Resultado de um job concluído: DDL e verificação, ou membros e tabelas do ZIP."""
+    result = job['result']
+    if 'tables' in result:
+        if result['member_stats']:
+            st.header("Arquivos do ZIP")
+            st.dataframe(pd.DataFrame(result['member_stats']), use_container_width=True)
+            for stats in result['member_stats']:
+                if stats['erro']:
+                    st.error(f"{stats['membro']}: {stats['erro']}")
+
+        for table in result['tables']:
+            st.header(f"Tabela {table['table']} ({table['rows']} linhas)")
+            st.code(table['ddl'], language='sql')
+            st.dataframe(pd.DataFrame(table['verification']), use_container_width=True)
+        total_rows = sum(table['rows'] for table in result['tables'])
+    else:
+        if result['verification']:
+            st.header("1. DDL SQL (CREATE TABLE)")
+            st.code(result['ddl'], language='sql')
+
+            st.header("2. Verificação (Primeiras 50 Linhas)")
+            df_verification = pd.DataFrame(result['verification'])
+            st.dataframe(df_verification, use_container_width=True)
+        elif result['ddl'] is not None:
+            st.warning("A tabela foi criada, mas 0 linhas foram inseridas. Verifique o arquivo CSV.")
+        total_rows = result['rows']
+
+    # Os balões só na primeira vez que o resultado aparece
+    if total_rows > 0 and job['id'] not in st.session_state.celebrated_jobs:
+        st.session_state.celebrated_jobs.add(job['id'])
+        st.balloons()
+
+
+def session_jobs_active() -> bool:
+    """Se algum job desta sessão ainda está na fila ou em andamento."""
+    manager = get_job_manager()
+    return any(
+        job is not None and job['status'] not in FINAL_STATUSES
+        for job in map(manager.get, st.session_state.ingest_jobs)
+    )
+
+
+def show_ingest_jobs():
+    """Jobs de ingestão desta sessão, do mais recente ao mais antigo."""
+    manager = get_job_manager()
+    jobs = [manager.get(job_id) for job_id in reversed(st.session_state.ingest_jobs)]
+    jobs = [job for job in jobs if job is not None]
+    if not jobs:
+        return
+
+    st.markdown("---")
+    st.subheader("Cargas desta sessão")
+    for job in jobs:
+        with st.container(border=True):
+            st.markdown(f"**{job['source_name']}** → tabela `{job['table_name']}`: {JOB_STATUS_LABELS[job['status']]}")
+            processed = f"{job['rows_processed']} linhas, {job['bytes_processed'] / (1024 * 1024):.1f} MB lidos"
+            if job['status'] not in FINAL_STATUSES:
+                st.progress(job['fraction'] or 0.0, text=processed)
+                if st.button("Cancelar", key=f"cancel_{job['id']}"):
+                    manager.cancel(job['id'])
+            else:
+                st.caption(processed)
+
+            for level, message in job['messages']:
+                getattr(st, level)(message)
+            for title, records in job['tables']:
+                st.caption(title)
+                st.dataframe(pd.DataFrame(records), use_container_width=True)
+            for title, data in job['details']:
+                with st.expander(title):
+                    st.json(data)
+            if job['status'] == 'done' and job['result']:
+                show_job_result(job)
 
-    # 1. ANÁLISE DA ESTRUTURA E GERAÇÃO DO DDL
-    st.info("Passo 1/4: Analisando a estrutura do arquivo em chunks para gerar o DDL...")
-    
-    # Esta função usa o chunking para inferir os tipos e nomes das colunas
-    # (Adaptado da lógica anterior de análise)
-    def generate_schema_from_chunks(file_path: Path):
-        summary = {}
-        
-        # Leitura e Processamento em Chunks para inferir tipos
-        with get_csv_stream(file_path) as f:
-            # Envolve o stream binário em um stream de texto se for de um ZIP
-            text_stream = io.TextIOWrapper(f, encoding='utf-8') if file_path.suffix == ".zip" else f
-            
-            for chunk in pd.read_csv(text_stream, chunksize=CHUNK_SIZE, encoding='utf-8', engine='python'):
-                # Limpa e formata os nomes das colunas
-                chunk.columns = [str(col).strip().replace(' ', '_').replace('.', '_') for col in chunk.columns]
-
-                for col in chunk.columns:
-                    data = chunk[col]
-                    col = col.lower()
-
-                    if col not in summary:
-                        summary[col] = {'is_numeric': True, 'has_text': False} 
-
-                    is_numeric_chunk = pd.api.types.is_numeric_dtype(data)
-                    if summary[col]['has_text']: continue
-
-                    if not is_numeric_chunk or data.dtype == np.dtype('object'):
-                        # Tenta forçar conversão para float para determinar se a coluna é REAL
-                        try:
-                            data.astype(float)
-                        except:
-                            summary[col]['is_numeric'] = False
-                            summary[col]['has_text'] = True
-        
-        # Monta DDL e lista final de colunas
-        columns_for_insert = []
-        create_table = f"CREATE TABLE IF NOT EXISTS \"{table_name}\" (\n"
-        
-        for col, info in summary.items():
-            col_name_safe = col.replace('-', '_')
-            columns_for_insert.append(col_name_safe)
-            
-            ddl_type = "REAL" if info['is_numeric'] and not info['has_text'] else "TEXT"
-            create_table += f"    \"{col_name_safe}\" {ddl_type},\n"
-        
-        create_table = create_table.rstrip(",\n") + "\n);"
-
-        return create_table, columns_for_insert
-
-    try:
-        ddl_query, columns_to_insert = generate_schema_from_chunks(file_path)
-        
-        if not columns_to_insert:
-            st.error("O arquivo CSV não contém colunas válidas. Abortando.")
-            return
-
-        # 2. CRIAÇÃO DA TABELA
-        st.info("Passo 2/4: Executando DDL para criar a tabela...")
-        with conn: # 'with conn' garante o commit/rollback
-            cursor = conn.cursor()
-            cursor.execute(ddl_query)
-        st.success("Tabela criada/verificada com sucesso.")
-        
-        
-        # 3. INSERÇÃO DE DADOS EM LOTE
-        st.info("Passo 3/4: Iniciando inserção de dados em lote (otimizado por stream)...")
-        
-        # Abertura do arquivo para a inserção (deve ser reaberto)
-        with get_csv_stream(file_path) as f:
-            text_stream = io.TextIOWrapper(f, encoding='utf-8') if file_path.suffix == ".zip" else f
-            reader = csv.reader(text_stream)
-            
-            try:
-                next(reader) # Pular o cabeçalho
-            except StopIteration:
-                st.warning("O arquivo CSV está vazio após o cabeçalho. Nada para inserir.")
-                return ddl_query, 0, []
-            
-            batch_data = []
-            
-            # O processo de inserção precisa de uma transação ativa
-            with conn: 
-                cursor = conn.cursor()
-                
-                for row in reader:
-                    if not row: continue
-                    
-                    if len(row) != len(columns_to_insert):
-                        # Pula linhas com número incorreto de colunas
-                        continue
-                        
-                    row_values = []
-                    for value in row:
-                        stripped_value = str(value).strip()
-                        
-                        if not stripped_value or stripped_value.upper() in ('NAN', 'NULL', '#N/A', 'N/A', 'NONE'):
-                            row_values.append(None)
-                            continue
-                        
-                        try:
-                            # Tenta converter para numérico
-                            num_value = float(stripped_value)
-                            row_values.append(int(num_value) if num_value == int(num_value) else num_value)
-                        except ValueError:
-                            row_values.append(value)
-                    
-                    batch_data.append(tuple(row_values))
-                    
-                    if len(batch_data) >= BATCH_SIZE:
-                        execute_batch_insert_sqlite(cursor, table_name, columns_to_insert, batch_data)
-                        batch_data = []
-                        
-                    row_count += 1
-                
-                # Inserir lote restante
-                if batch_data:
-                    execute_batch_insert_sqlite(cursor, table_name, columns_to_insert, batch_data)
-
-        st.success(f"Inserção em lote concluída! Total de {row_count} linhas inseridas.")
-
-
-        # 4. VERIFICAÇÃO FINAL
-        st.info("Passo 4/4: Selecionando as primeiras 50 linhas para verificação...")
-        verification_rows = execute_select_limit(conn, table_name)
-        
-        return ddl_query, row_count, verification_rows
-
-    except sqlite3.Error as db_error:
-        st.error(f"Erro de Banco de Dados SQLite: {str(db_error)}")
-        return None, 0, []
-    except Exception as e:
-        st.error(f"Erro Crítico durante o processamento: {str(e)}")
-        return None, 0, []
-    finally:
-        # 5. LIMPEZA
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            st.caption(f"Arquivo temporário removido do disco: {file_path.name}")
 
 # ----------------------------------------------------------------------
 # INTERFACE DO USUÁRIO
 # ----------------------------------------------------------------------
 
-uploaded_file = st.file_uploader("Escolha um arquivo (.csv ou .zip)", type=["csv", "zip"])
-unique_filename = None
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+    st.session_state.ingest_jobs = []
+    st.session_state.celebrated_jobs = set()
+
+uploaded_file = st.file_uploader(
+    "Escolha um arquivo (.csv, .zip, .gz, .bz2, .xz ou .tar)", type=supported_suffixes()
+)
+upload_source = None
 
 if uploaded_file is not None:
-    # 1. Salva o arquivo temporariamente no disco
-    file_ext = uploaded_file.name.split('.')[-1].lower()
-    unique_filename = f"{uuid.uuid4()}.{file_ext}"
-    file_path = DATA_DIR / unique_filename
+    # 1. Lê o arquivo direto do buffer do upload (sem cópia e sem gravar em disco)
+    input_format = detect_format(uploaded_file.name)
+    upload_source = UploadSource(uploaded_file.name, uploaded_file.getbuffer(), DATA_DIR)
     
     suggested_table_name = re.sub(r'[^a-zA-Z0-9_]', '_', uploaded_file.name.split('.')[0]).lower()
     if not suggested_table_name: suggested_table_name = "dados_csv"
 
-    try:
-        with open(file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        st.success(f"Arquivo salvo temporariamente para processamento: **{unique_filename}**")
-
-    except Exception as e:
-        st.error(f"Falha ao salvar o arquivo no disco: {e}")
-        unique_filename = None
+    st.success(
+        f"Arquivo recebido para processamento: **{uploaded_file.name}** "
+        f"({upload_source.size / (1024 * 1024):.1f} MB)"
+    )
 
-if unique_filename:
+if upload_source is not None:
     st.markdown("---")
     
     table_name = st.text_input(
@@ -282,24 +205,98 @@ if unique_filename:
         key="table_name_input"
     )
     
+    sampling_strategy = st.selectbox(
+        "Amostragem para inferência de tipos",
+        SAMPLING_STRATEGIES,
+        format_func=lambda s: {
+            "head": "Primeiras linhas (leitura única do arquivo)",
+            "reservoir": "Amostra de todo o arquivo (leitura extra)",
+        }[s],
+    )
+
+    # Listar um TAR compactado exige descompactá-lo inteiro: uma vez por arquivo enviado
+    if st.session_state.get('csv_members_of') != uploaded_file.file_id:
+        st.session_state.csv_members = list_csv_members(upload_source)
+        st.session_state.csv_members_of = uploaded_file.file_id
+    csv_members = st.session_state.csv_members
+    zip_members = csv_members if input_format.name == "zip" else []
+    merge_matching_headers = True
+    if input_format.name == "tar" and len(csv_members) > 1:
+        st.warning(f"O TAR contém {len(csv_members)} arquivos CSV; só o primeiro ({csv_members[0]}) será carregado.")
+    if len(zip_members) > 1:
+        st.caption(f"O ZIP contém {len(zip_members)} arquivos CSV; todos serão carregados em paralelo.")
+        merge_matching_headers = st.radio(
+            "Tabelas de destino",
+            (True, False),
+            format_func=lambda merge: (
+                "Uma tabela para os CSVs com o mesmo cabeçalho" if merge
+                else "Uma tabela por CSV (tabela_<nome do arquivo>)"
+            ),
+        )
+
+    parallel = False
+    preserve_order = True
+    if input_format.name == "csv":
+        parallel = st.checkbox(
+            f"Leitura paralela ({MAX_WORKERS} processos; indicada para arquivos grandes)",
+            value=upload_source.size >= PARALLEL_CSV_MIN_BYTES,
+        )
+        if parallel:
+            preserve_order = st.checkbox("Manter a ordem das linhas do arquivo", value=True)
+
+    bulk_load = st.checkbox("Modo de carga em massa (PRAGMAs otimizados para a carga)", value=True)
+    rss_ceiling_mb = st.number_input(
+        "Teto de memória da carga (MB)", min_value=128, value=RSS_CEILING_MB, step=128,
+        help="Os lotes de inserção, a amostra da inferência e o cache do SQLite são dimensionados para "
+             "ficar abaixo deste teto (somando os processos da leitura paralela).",
+    )
+    index_columns_input = st.text_input("Colunas para indexar após a carga (opcional, separadas por vírgula)")
+    index_columns = normalize_header([c.strip() for c in index_columns_input.split(',') if c.strip()])
+    fts_columns_input = st.text_input(
+        "Colunas para busca textual (FTS5; opcional, separadas por vírgula)",
+        help="Cria um índice de busca por palavras nessas colunas, mantido nas cargas seguintes; "
+             "as perguntas ao Gemini passam a usar MATCH em vez de LIKE. Use * para detectar "
+             "as colunas de texto livre.",
+    )
+    fts_columns = normalize_header([c.strip() for c in fts_columns_input.split(',') if c.strip()])
+
     # Botão processar
     if st.button("Criar Tabela, Inserir Dados e Verificar"):
         if not table_name:
             st.warning("O nome da tabela não pode ser vazio.")
         else:
-            # INÍCIO DO PROCESSO PRINCIPAL
-            # O st.spinner é crucial para indicar ao usuário que a aplicação está ocupada
-            with st.spinner("⚠️ **Processando...** O aplicativo ficará bloqueado durante a análise e inserção (não feche a aba)"):
-                ddl, total_rows, verification_rows = process_full_workflow(file_path, table_name)
-            
-            # EXIBIÇÃO DOS RESULTADOS
-            if total_rows > 0:
-                st.balloons()
-                st.header("1. DDL SQL (CREATE TABLE)")
-                st.code(ddl, language='sql')
-                
-                st.header("2. Verificação (Primeiras 50 Linhas)")
-                df_verification = pd.DataFrame(verification_rows)
-                st.dataframe(df_verification, use_container_width=True)
-            elif ddl is not None:
-                st.warning("A tabela foi criada, mas 0 linhas foram inseridas. Verifique o arquivo CSV.")
+            # A carga entra na fila de jobs e roda em segundo plano: a sessão (e as demais)
+            # continua respondendo enquanto o progresso é acompanhado abaixo
+            if input_format.name == "csv":
+                total_bytes = upload_source.size
+            elif len(zip_members) == 1:
+                with zipfile.ZipFile(upload_source.open(), "r") as z:
+                    total_bytes = z.getinfo(zip_members[0]).file_size
+            else:
+                # ZIP com vários CSVs: progresso por membro concluído; nos formatos
+                # compactados o tamanho descompactado só se conhece no fim
+                total_bytes = None
+
+            job_id = get_job_manager().submit(
+                st.session_state.session_id, uploaded_file.name, table_name, total_bytes,
+                partial(
+                    run_ingest_job, source=upload_source, table_name=table_name,
+                    sampling_strategy=sampling_strategy, bulk_load=bulk_load, index_columns=index_columns,
+                    merge_matching_headers=merge_matching_headers,
+                    parallel=parallel, preserve_order=preserve_order, rss_ceiling_mb=rss_ceiling_mb,
+                    fts_columns=fts_columns,
+                ),
+            )
+            st.session_state.ingest_jobs.append(job_id)
+
+# Enquanto houver job ativo, só o painel de jobs é atualizado a cada segundo
+jobs_active = session_jobs_active()
+
+@st.fragment(run_every=1 if jobs_active else None)
+def ingest_jobs_panel():
+    show_ingest_jobs()
+    if jobs_active and not session_jobs_active():
+        # Todos terminaram: uma última execução completa desliga o polling
+        st.rerun()
+
+ingest_jobs_panel()
@@ -0,0 +1,47 @@
+"""Fixtures da carga: CSVs de teste e carga em um banco temporário (sem métricas em disco)."""
+import csv
+import sqlite3
+
+import pytest
+
+from ingest_jobs import CallbackReporter
+from ingest_pipeline import ingest_files
+
+
+@pytest.fixture
+def write_csv(tmp_path):
+    """write_csv(nome, cabeçalho, linhas) grava um CSV em tmp_path e retorna o caminho."""
+    def write(name, header, rows):
+        path = tmp_path / name
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+        return path
+    return write
+
+
+@pytest.fixture
+def db(tmp_path):
+    conn = sqlite3.connect(tmp_path / "db.sqlite")
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def ingest(db):
+    """ingest(caminhos, tabela, **opções) carrega com ingest_files; retorna (resultado, mensagens)."""
+    def load(paths, table_name, **kwargs):
+        messages = []
+        report = CallbackReporter(on_message=lambda level, message: messages.append((level, message)))
+        result = ingest_files(db, paths, table_name, report=report, metrics_file=None, **kwargs)
+        return result, messages
+    return load
+
+
+def table_rows(conn, table_name):
+    return [tuple(row) for row in conn.execute(f"SELECT * FROM \"{table_name}\" ORDER BY rowid")]
+
+
+def declared_types(conn, table_name):
+    return [(row[1], row[2]) for row in conn.execute(f"PRAGMA table_info(\"{table_name}\")")]
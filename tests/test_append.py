@@ -0,0 +1,52 @@
+from ingest_cache import get_previous_load
+from tests.conftest import declared_types, table_rows
+
+
+def test_appended_tail_promotes_the_table(write_csv, ingest, db):
+    # A cauda com um valor que não cabe no tipo reescreve a tabela: tabela, cache e DDL concordam
+    rows = [[i, f"nome {i}"] for i in range(100)]
+    ingest([write_csv("base.csv", ["id", "nome"], rows)], "clientes")
+    result, _ = ingest([write_csv("base.csv", ["id", "nome"], rows + [["2.5", "novo"]])], "clientes")
+
+    assert result['rows'] == 1
+    assert declared_types(db, "clientes") == [('id', 'REAL'), ('nome', 'TEXT')]
+    assert [column_type['type'] for column_type in get_previous_load(db.cursor(), "clientes")['column_types']] \
+        == ['REAL', 'TEXT']
+    assert '"id" REAL' in result['ddl']
+    assert table_rows(db, "clientes") == [(float(i), f"nome {i}") for i in range(100)] + [(2.5, "novo")]
+
+
+def test_appended_tail_does_not_turn_booleans_into_text(write_csv, ingest, db):
+    rows = [["sim" if i % 2 else "não"] for i in range(100)]
+    ingest([write_csv("base.csv", ["ativo"], rows)], "flags")
+    before = table_rows(db, "flags")
+    result, messages = ingest([write_csv("base.csv", ["ativo"], rows + [["talvez"]])], "flags")
+
+    assert result['rows'] == 0
+    assert any(level == 'error' and "nova tabela" in message for level, message in messages)
+    assert declared_types(db, "flags") == [('ativo', 'BOOLEAN')]
+    assert table_rows(db, "flags") == before
+
+
+def write_bytes(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return path
+
+
+def test_previous_load_without_final_line_break_only_appends_the_tail(tmp_path, ingest, db):
+    ingest([write_bytes(tmp_path, "base.csv", b"id,nome\n1,a\n2,b")], "letras")
+    result, _ = ingest([write_bytes(tmp_path, "base.csv", b"id,nome\n1,a\n2,b\r\n3,c\n")], "letras")
+
+    assert result['rows'] == 1
+    assert table_rows(db, "letras") == [(1, 'a'), (2, 'b'), (3, 'c')]
+    assert get_previous_load(db.cursor(), "letras")['row_count'] == 3
+
+
+def test_upload_changing_the_unterminated_last_line_is_rejected(tmp_path, ingest, db):
+    ingest([write_bytes(tmp_path, "base.csv", b"id,nome\n1,a\n2,b")], "letras")
+    result, messages = ingest([write_bytes(tmp_path, "base.csv", b"id,nome\n1,a\n2,bb\n3,c\n")], "letras")
+
+    assert result['rows'] == 0
+    assert any(level == 'error' and "nova tabela" in message for level, message in messages)
+    assert table_rows(db, "letras") == [(1, 'a'), (2, 'b')]
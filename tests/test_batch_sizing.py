@@ -0,0 +1,58 @@
+import pytest
+
+import batch_sizing
+from batch_sizing import BATCH_MEMORY_TARGET_BYTES, INITIAL_BATCH_ROWS, MIN_BATCH_ROWS, BatchSizer
+
+
+@pytest.fixture
+def rss(monkeypatch):
+    """RSS medido pelo controlador, em MB."""
+    state = {'mb': 100.0}
+    monkeypatch.setattr(batch_sizing, 'current_rss_mb', lambda: state['mb'])
+    return state
+
+
+def rows(n_columns, width=4):
+    return [["x" * width] * n_columns for _ in range(10)]
+
+
+def test_batches_shrink_near_the_rss_ceiling_and_grow_back(rss):
+    sizer = BatchSizer(n_columns=4, rss_ceiling_mb=1000)
+    sizer.observe_rows(rows(4))
+    assert sizer.batch_rows == 2 * INITIAL_BATCH_ROWS
+
+    rss['mb'] = 900
+    sizes = []
+    for _ in range(6):
+        sizer.observe_rows(rows(4))
+        sizes.append(sizer.batch_rows)
+    assert sizes == [5000, 2500, 1250, 625, MIN_BATCH_ROWS, MIN_BATCH_ROWS]
+    assert sizer.summary()['adjustments']['rss'] == 5
+    assert sizer.summary()['peak_rss_mb'] == 900
+
+    rss['mb'] = 500
+    sizer.observe_rows(rows(4))
+    assert sizer.batch_rows == 2 * MIN_BATCH_ROWS
+
+
+def test_wide_rows_get_smaller_batches(rss):
+    narrow, wide = BatchSizer(n_columns=3), BatchSizer(n_columns=300)
+    for _ in range(8):
+        narrow.observe_rows(rows(3))
+        wide.observe_rows(rows(300, width=50))
+    assert wide.batch_rows < narrow.batch_rows
+    assert wide.batch_rows * wide.row_bytes <= BATCH_MEMORY_TARGET_BYTES
+
+
+def test_slow_inserts_limit_the_batch(rss):
+    sizer = BatchSizer(n_columns=3)
+    sizer.observe_insert(sizer.batch_rows, seconds=1.0)
+    assert sizer.batch_rows < INITIAL_BATCH_ROWS
+    assert sizer.summary()['adjustments'] == {'latencia': 1}
+
+
+def test_inference_sample_and_page_cache_fit_the_ceiling():
+    sizer = BatchSizer(n_columns=100, rss_ceiling_mb=100)
+    assert sizer.sample_rows(100_000) == 100 * 1024 * 1024 // 4 // (100 * batch_sizing.FIELD_OVERHEAD_BYTES)
+    assert sizer.page_cache_kib(262144) == 25 * 1024
+    assert BatchSizer(n_columns=1).sample_rows(10) == MIN_BATCH_ROWS
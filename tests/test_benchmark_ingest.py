@@ -0,0 +1,56 @@
+import csv
+import gzip
+import zipfile
+
+import benchmark_ingest
+from benchmark_ingest import SCENARIO_DEFAULTS, column_kinds, compare, generate_scenario, run_once
+
+
+def spec(**fields):
+    return {**SCENARIO_DEFAULTS, 'rows': 200, 'columns': 6, **fields}
+
+
+def test_generated_csv_is_deterministic(tmp_path):
+    first = tmp_path / "a.csv"
+    second = tmp_path / "b.csv"
+    benchmark_ingest.write_csv(first, spec(null_density=0.2, quoted_newlines=0.1), 200, seed=7)
+    benchmark_ingest.write_csv(second, spec(null_density=0.2, quoted_newlines=0.1), 200, seed=7)
+
+    assert first.read_bytes() == second.read_bytes()
+    with open(first, newline='', encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["integer_0", "real_1", "integer_2", "text_3", "date_4", "boolean_5"]
+    assert len(rows) == 201
+    assert column_kinds(4, 0.5) == ["integer", "real", "text", "date"]
+
+
+def test_packaged_scenarios(tmp_path):
+    zip_path = generate_scenario(tmp_path, "zip_varios", spec(packaging='zip', files=4))
+    with zipfile.ZipFile(zip_path) as z:
+        assert z.namelist() == [f"zip_varios_{i}.csv" for i in range(4)]
+    assert generate_scenario(tmp_path, "zip_varios", spec(packaging='zip', files=4)) == zip_path
+
+    gz_path = generate_scenario(tmp_path, "gz", spec(packaging='gz'))
+    assert gz_path.name.endswith(".csv.gz")
+    with gzip.open(gz_path, 'rt', encoding='utf-8') as f:
+        assert sum(1 for _ in f) == 201
+    assert sorted(path.suffix for path in tmp_path.iterdir()) == [".gz", ".zip"]
+
+
+def test_run_once_returns_the_load_metrics(tmp_path):
+    record = run_once(generate_scenario(tmp_path, "misto", spec(null_density=0.05)), spec())
+    assert record['rows_inserted'] == 200
+    assert record['table'] == "bench"
+
+
+def test_regressions_past_the_threshold_are_reported():
+    baseline = {'scenarios': {'misto': {'rows_per_second': 1000, 'peak_rss_mb': 100},
+                              'zip': {'rows_per_second': 1000, 'peak_rss_mb': 100}}}
+    results = {'misto': {'rows_per_second': 900, 'peak_rss_mb': 110},
+               'zip': {'rows_per_second': 800, 'peak_rss_mb': 130},
+               'novo': {'rows_per_second': 1, 'peak_rss_mb': None}}
+
+    assert compare(results, baseline, threshold=0.15) == [
+        "zip: vazão caiu 20.0% (limite 15%)",
+        "zip: pico de RSS subiu 30.0% (limite 15%)",
+    ]
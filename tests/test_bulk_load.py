@@ -0,0 +1,33 @@
+from ingest_pipeline import BULK_LOAD_PAGE_SIZE, bulk_load_mode, read_pragmas
+from tests.conftest import table_rows
+
+
+def test_bulk_load_mode_restores_the_safe_pragmas(db):
+    before = read_pragmas(db, ("synchronous", "cache_size", "temp_store"))
+    with bulk_load_mode(db, cache_kib=1024) as pragmas:
+        assert pragmas['journal_mode'] == "wal"
+        assert pragmas['synchronous'] == 0
+        assert pragmas['cache_size'] == -1024
+        assert pragmas['page_size'] == BULK_LOAD_PAGE_SIZE
+        db.execute("CREATE TABLE t (n INTEGER)")
+
+    assert read_pragmas(db, ("synchronous", "cache_size", "temp_store")) == before
+    assert read_pragmas(db, ("journal_mode",))['journal_mode'] == "wal"
+
+
+def test_page_size_is_kept_on_a_database_with_tables(db):
+    db.execute("CREATE TABLE t (n INTEGER)")
+    page_size = read_pragmas(db, ("page_size",))['page_size']
+    with bulk_load_mode(db) as pragmas:
+        assert pragmas['page_size'] == page_size
+
+
+def test_indexes_are_created_after_the_load_followed_by_analyze(write_csv, ingest, db):
+    path = write_csv("vendas.csv", ["id", "cidade"], [[i, f"cidade {i % 4}"] for i in range(20)])
+    ingest([path], "vendas", index_columns=["cidade", "inexistente"])
+
+    indexes = db.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'vendas'")
+    assert [tuple(row) for row in indexes] == [("idx_vendas_cidade",)]
+    stat = db.execute("SELECT stat FROM sqlite_stat1 WHERE idx = 'idx_vendas_cidade'").fetchone()
+    assert tuple(stat) == ("20 5",)
+    assert len(table_rows(db, "vendas")) == 20
@@ -0,0 +1,55 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from chart_data import aggregation_sql, chart_spec, downsample, finish_aggregated, lttb_indices
+
+
+def test_lttb_keeps_the_endpoints_and_the_requested_size():
+    x = np.arange(10_000, dtype=float)
+    y = np.sin(x / 50)
+    y[4321] = 10.0
+    keep = lttb_indices(x, y, 100)
+
+    assert len(keep) == 100
+    assert keep[0] == 0 and keep[-1] == 9_999
+    assert (np.diff(keep) > 0).all()
+    # O pico isolado forma o maior triângulo da faixa dele
+    assert 4321 in keep
+    assert lttb_indices(x[:50], y[:50], 100).tolist() == list(range(50))
+
+
+@pytest.fixture
+def pontos():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE pontos (x INTEGER, y REAL)")
+    conn.executemany("INSERT INTO pontos VALUES (?, ?)", [(i, float(i % 7)) for i in range(10_000)])
+    yield conn
+    conn.close()
+
+
+def test_bar_aggregation_in_sqlite_matches_the_in_memory_fallback(pontos):
+    sql = "SELECT x, y FROM pontos;"
+    df = pd.read_sql_query(sql, pontos)
+    spec = chart_spec(df)
+    assert spec == {'kind': 'bar', 'x': "x", 'y': "y"}
+
+    aggregated = finish_aggregated(pd.read_sql_query(aggregation_sql(sql, spec, 100), pontos), spec)
+    in_memory = downsample(df, spec, 100)
+    assert len(aggregated) == 100 and aggregated.columns.tolist() == ["x", "y"]
+    assert aggregated['y'].sum() == df['y'].sum()
+    assert aggregated['x'].tolist() == in_memory['x'].tolist()
+    assert aggregated['y'].tolist() == in_memory['y'].tolist()
+
+
+def test_line_aggregation_keeps_the_extremes_of_each_range(pontos):
+    sql = "SELECT y AS x FROM pontos ORDER BY x DESC"
+    spec = chart_spec(pd.read_sql_query(f"{sql} LIMIT 1", pontos))
+    assert spec == {'kind': 'line', 'x': None, 'y': "x"}
+
+    aggregated = finish_aggregated(pd.read_sql_query(aggregation_sql(sql, spec, 200), pontos), spec)
+    assert len(aggregated) == 100
+    assert aggregated.columns.tolist() == ["x (mín)", "x (máx)"]
+    assert aggregated.index[0] == 0 and aggregated["x (máx)"].max() == 6 and aggregated["x (mín)"].min() == 0
@@ -0,0 +1,19 @@
+import ingest_pipeline
+from column_stats import get_table_profile
+
+
+def test_column_promoted_to_text_is_profiled_over_all_rows(monkeypatch, write_csv, ingest, db):
+    # As linhas gravadas como número antes da promoção entram nas estatísticas de texto
+    rows = [[i] for i in range(3000)] + [["código-longo"]]
+    path = write_csv("codigos.csv", ["codigo"], rows)
+    monkeypatch.setattr(ingest_pipeline, 'INFERENCE_SAMPLE_SIZE', 10)
+    ingest([path], "codigos")
+
+    stats, = get_table_profile(db.cursor(), "codigos")
+    assert stats['type'] == 'TEXT'
+    assert (stats['row_count'], stats['null_count']) == (3001, 0)
+    assert (stats['min'], stats['max']) == ('0', 'código-longo')
+    assert (stats['min_length'], stats['max_length']) == (1, len('código-longo'))
+    assert stats['mean'] is None
+    assert abs(stats['distinct'] - 3001) < 0.05 * 3001
+    assert all(isinstance(value, str) for value, _ in stats['top_values'])
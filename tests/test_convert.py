@@ -0,0 +1,43 @@
+from ingest_core import convert_batch
+from type_inference import TypeInferenceEngine
+
+NULL_TOKENS = ('NAN', 'NULL', '#N/A', 'N/A', 'NONE')
+
+
+def baseline_convert(row):
+    """Conversão célula a célula do caminho original (antes da conversão vetorizada)."""
+    values = []
+    for value in row:
+        stripped_value = str(value).strip()
+        if not stripped_value or stripped_value.upper() in NULL_TOKENS:
+            values.append(None)
+            continue
+        try:
+            num_value = float(stripped_value)
+            values.append(int(num_value) if num_value == int(num_value) else num_value)
+        except ValueError:
+            values.append(value)
+    return values
+
+
+def test_numeric_columns_store_the_baseline_values():
+    # Inteiros, reais, formas que float() aceita e os tokens de nulo em várias grafias
+    quantidade = [' 1 ', '2', '-4', '3.0', '1e3', '1_000', '007', 'NULL', '', ' nan ', 'n/a']
+    preco = ['2.5', '0.1', ' -3.75', '1E-3', '10', '4.', 'None', '#N/A', '9.99', '1_000.5', '0']
+    nome = ['ana', ' bia ', 'NULL', '', 'carlos', 'N/A', 'duda', 'eva', 'none', 'fábio', 'gil']
+    rows = [list(values) for values in zip(quantidade, preco, nome)]
+
+    engine = TypeInferenceEngine(3)
+    engine.observe(rows)
+    column_types = engine.column_types()
+    converted, final_types = convert_batch(rows, column_types)
+
+    assert [t['type'] for t in final_types] == ['INTEGER', 'REAL', 'TEXT']
+    for row, ours in zip(rows, converted):
+        expected = baseline_convert(row)
+        # Colunas numéricas: mesmos números (5 e 5.0 são o mesmo valor numa coluna REAL)
+        assert ours[:2] == expected[:2]
+        assert ours[0] is None or type(ours[0]) is int
+        assert ours[1] is None or type(ours[1]) is float
+        # Texto: mesmos nulos; o valor original é mantido
+        assert ours[2] == (None if expected[2] is None else row[2])
@@ -0,0 +1,93 @@
+import sqlite3
+import threading
+
+import pytest
+
+from db_pool import ConnectionPool, PoolTimeout
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "db.sqlite"), max_readers=2)
+    with pool.writer() as conn:
+        conn.execute("CREATE TABLE t (n INTEGER)")
+        conn.execute("INSERT INTO t VALUES (1)")
+        conn.commit()
+    yield pool
+    pool.close()
+
+
+def test_readers_are_read_only_and_reentrant(pool):
+    with pool.reader() as conn:
+        with pool.reader() as nested:
+            assert nested is conn
+        assert pool.stats()['readers_in_use'] == 1
+        with pytest.raises(sqlite3.OperationalError, match="readonly"):
+            conn.execute("INSERT INTO t VALUES (2)")
+    assert pool.stats()['readers_in_use'] == 0
+
+
+def test_each_thread_gets_its_own_reader_up_to_the_limit(pool):
+    held, release = threading.Barrier(3), threading.Event()
+    connections = []
+
+    def read():
+        with pool.reader() as conn:
+            connections.append(conn)
+            held.wait(5)
+            release.wait(5)
+
+    threads = [threading.Thread(target=read) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    held.wait(5)
+    assert connections[0] is not connections[1]
+    with pytest.raises(PoolTimeout):
+        with pool.reader(timeout=0.05):
+            pass
+
+    release.set()
+    for thread in threads:
+        thread.join()
+    with pool.reader(timeout=0.05) as conn:
+        assert conn in connections
+    assert pool.stats()['readers_open'] == 2 and pool.stats()['waits'] == 1
+
+
+def test_writer_is_exclusive_between_threads(pool):
+    entered, release = threading.Event(), threading.Event()
+
+    def write():
+        with pool.writer() as conn:
+            conn.execute("INSERT INTO t VALUES (2)")
+            entered.set()
+            release.wait(5)
+            conn.commit()
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    assert entered.wait(5)
+    assert pool.stats()['writer_busy']
+    with pytest.raises(PoolTimeout):
+        with pool.writer(timeout=0.05):
+            pass
+    # WAL: a leitura continua durante a escrita e vê só o que já foi confirmado
+    with pool.reader() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone() == (1,)
+
+    release.set()
+    thread.join()
+    with pool.writer(timeout=0.05) as conn:
+        with pool.writer() as nested:
+            assert nested is conn
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone() == (2,)
+
+
+def test_reader_is_reset_before_returning_to_the_pool(pool):
+    with pool.reader() as conn:
+        conn.row_factory = sqlite3.Row
+        conn.execute("BEGIN")
+        conn.execute("SELECT * FROM t").fetchall()
+    with pool.reader() as again:
+        assert again is conn
+        assert again.row_factory is None and not again.in_transaction
@@ -0,0 +1,46 @@
+from fts_index import fts_table_name, get_fts_index
+
+HEADER = ["id", "descricao"]
+ROWS = [[1, "entrega atrasada pela transportadora"], [2, "produto chegou com defeito"]]
+
+
+def search(db, table, term):
+    fts_table = fts_table_name(table)
+    return [row[0] for row in db.execute(
+        f'SELECT "{table}".id FROM "{fts_table}" JOIN "{table}" ON "{table}".rowid = "{fts_table}".rowid '
+        f'WHERE "{fts_table}" MATCH ? ORDER BY "{table}".id', (term,))]
+
+
+def test_appended_rows_are_indexed(write_csv, ingest, db):
+    ingest([write_csv("chamados.csv", HEADER, ROWS)], "chamados", fts_columns=["descricao"])
+    assert search(db, "chamados", "defeito") == [2]
+
+    # Upload com as mesmas linhas e mais uma: só a cauda é carregada, e indexada
+    result, messages = ingest([write_csv("chamados.csv", HEADER, ROWS + [[3, "Ação judicial por defeito"]])],
+                              "chamados")
+    assert result['rows'] == 1
+    assert ("caption", "Busca textual (FTS5) em 'chamados': 1 linha(s) indexada(s) nas colunas descricao.") \
+        in messages
+    assert search(db, "chamados", "defeito") == [2, 3]
+    # Sem diferenciar acentos
+    assert search(db, "chamados", "acao") == [3]
+    assert get_fts_index(db.cursor(), "chamados")['indexed_rowid'] == 3
+
+
+def test_rewritten_table_is_indexed_again(write_csv, ingest, db):
+    ingest([write_csv("chamados.csv", HEADER, ROWS)], "chamados", fts_columns=["descricao"])
+    # A cauda promove id para REAL: a tabela é reescrita e o índice refeito inteiro
+    ingest([write_csv("chamados.csv", HEADER, ROWS + [["2.5", "defeito de fábrica"]])], "chamados")
+
+    assert search(db, "chamados", "defeito") == [2.0, 2.5]
+    # Uma entrada por linha no índice, sem as da tabela anterior
+    assert tuple(db.execute(f'SELECT COUNT(*) FROM "{fts_table_name("chamados")}_docsize"').fetchone()) == (3,)
+
+
+def test_free_text_columns_are_detected(write_csv, ingest, db):
+    rows = [[i, "ABC" if i % 2 else "XYZ", f"descrição número {i} de um chamado aberto pelo cliente"]
+            for i in range(50)]
+    ingest([write_csv("chamados.csv", ["id", "codigo", "descricao"], rows)], "chamados", fts_columns=["*"])
+
+    assert get_fts_index(db.cursor(), "chamados")['columns'] == ["descricao"]
+    assert search(db, "chamados", "numero") == list(range(50))
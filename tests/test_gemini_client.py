@@ -0,0 +1,112 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+import gemini_client
+from gemini_client import BACKOFF_BASE_SECONDS, GeminiClient, GeminiError
+
+
+def candidate(text):
+    return {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Responde na ordem as respostas (status, cabeçalhos, corpo) de server.responses."""
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.requests.append((self.path, body))
+        status, headers, payload = self.server.responses.pop(0)
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.responses, server.requests = [], []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Esperas do backoff registradas em vez de dormidas."""
+    sleeps = []
+    monkeypatch.setattr(gemini_client, 'time', SimpleNamespace(sleep=sleeps.append, perf_counter=time.perf_counter))
+    return sleeps
+
+
+def make_client(server, **kwargs):
+    return GeminiClient("modelo-teste", api_base=f"http://127.0.0.1:{server.server_port}/v1beta", **kwargs)
+
+
+def test_transient_errors_are_retried_with_backoff(stub, sleeps):
+    stub.responses = [(503, {}, {"error": "ocupado"}), (500, {}, {"error": "falha"}), (200, {}, candidate("SELECT 1"))]
+    latency = {}
+    assert make_client(stub).generate("chave", "pergunta", latency) == "SELECT 1"
+
+    assert latency['attempts'] == 3 and latency['status_code'] == 200
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= BACKOFF_BASE_SECONDS and 0 <= sleeps[1] <= 2 * BACKOFF_BASE_SECONDS
+    path, body = stub.requests[0]
+    assert path == "/v1beta/models/modelo-teste:generateContent?key=chave"
+    assert body == {"contents": [{"parts": [{"text": "pergunta"}]}]}
+
+
+def test_retry_after_sets_the_wait(stub, sleeps):
+    stub.responses = [(429, {'Retry-After': '2'}, {"error": "limite"}), (200, {}, candidate("ok"))]
+    assert make_client(stub).generate("chave", "pergunta") == "ok"
+    assert sleeps == [2.0]
+
+
+def test_client_errors_are_not_retried(stub, sleeps):
+    stub.responses = [(400, {}, {"error": "pedido inválido"})]
+    with pytest.raises(GeminiError) as error:
+        make_client(stub).generate("chave", "pergunta")
+
+    assert error.value.status_code == 400
+    assert len(stub.requests) == 1 and sleeps == []
+
+
+def test_retries_are_bounded(stub, sleeps):
+    stub.responses = [(503, {}, {"error": "ocupado"})] * 3
+    with pytest.raises(GeminiError) as error:
+        make_client(stub, max_retries=2).generate("chave", "pergunta")
+
+    assert error.value.status_code == 503
+    assert len(stub.requests) == 3 and len(sleeps) == 2
+
+
+def test_stream_yields_the_text_of_each_event(stub, sleeps):
+    events = b"".join([
+        b": comentario\r\n\r\n",
+        b"data: " + json.dumps(candidate("SELECT ")).encode() + b"\r\n\r\n",
+        b"data: " + json.dumps({"candidates": []}).encode() + b"\r\n\r\n",
+        b"data: " + json.dumps(candidate("ação")).encode('utf-8') + b"\r\n\r\n",
+    ])
+    stub.responses = [(503, {}, {"error": "ocupado"}),
+                      (200, {'Content-Type': 'text/event-stream'}, events)]
+    latency = {}
+    chunks = list(make_client(stub).stream("chave", "pergunta", latency))
+
+    assert chunks == ["SELECT ", "ação"]
+    assert latency['attempts'] == 2 and latency['response_chars'] == len("SELECT ação")
+    assert 0 <= latency['ttft_seconds'] <= latency['total_seconds']
+    assert stub.requests[1][0] == "/v1beta/models/modelo-teste:streamGenerateContent?alt=sse&key=chave"
@@ -0,0 +1,77 @@
+import sqlite3
+import time
+
+import pandas as pd
+import pytest
+
+import index_advisor
+from index_advisor import (
+    ADVISOR_INDEXES_TABLE, ADVISOR_MIN_QUERIES, UNUSED_MIN_QUERIES, QueryLog, create_index, drop_unused_indexes,
+    log_cache_hit, propose_indexes, run_logged,
+)
+
+SQL = "SELECT cidade, valor FROM vendas WHERE cidade = 'Recife'"
+
+
+@pytest.fixture
+def vendas(tmp_path):
+    conn = sqlite3.connect(tmp_path / "db.sqlite")
+    conn.execute("CREATE TABLE vendas (id INTEGER, cidade TEXT, valor REAL)")
+    conn.executemany("INSERT INTO vendas VALUES (?, ?, ?)", [(i, f"cidade {i % 50}", i * 1.5) for i in range(2000)])
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def log(tmp_path):
+    return QueryLog(str(tmp_path / "query_log.sqlite"))
+
+
+def test_cache_hits_are_logged_and_count_toward_proposals(vendas, log):
+    run_logged(vendas, log, SQL, ["vendas"], 100)
+    assert propose_indexes(vendas, log) == []
+
+    for _ in range(ADVISOR_MIN_QUERIES - 1):
+        log_cache_hit(vendas, log, SQL, ["vendas"], 0)
+
+    entries = log.entries()
+    assert [entry['from_cache'] for entry in entries] == [False] + [True] * (ADVISOR_MIN_QUERIES - 1)
+    assert entries[-1]['elapsed_ms'] is None
+    proposal, = propose_indexes(vendas, log)
+    assert (proposal['table'], proposal['columns'][0], proposal['queries']) == ("vendas", "cidade", ADVISOR_MIN_QUERIES)
+
+
+def test_index_used_only_by_cache_hits_is_not_dropped(vendas, log):
+    vendas.execute("CREATE INDEX idx_auto_vendas_cidade ON vendas (cidade)")
+    vendas.execute(f"CREATE TABLE {ADVISOR_INDEXES_TABLE} (index_name TEXT PRIMARY KEY, table_name TEXT NOT NULL, "
+                   f"columns TEXT NOT NULL, sample_sql TEXT, before_ms REAL, after_ms REAL, created_at TEXT NOT NULL)")
+    vendas.execute(f"INSERT INTO {ADVISOR_INDEXES_TABLE} VALUES ('idx_auto_vendas_cidade', 'vendas', 'cidade', ?, "
+                   f"1, 1, '2000-01-01T00:00:00')", (SQL,))
+    vendas.commit()
+
+    run_logged(vendas, log, "SELECT COUNT(*) FROM vendas WHERE valor > 10", ["vendas"], 100)
+    for _ in range(UNUSED_MIN_QUERIES):
+        log_cache_hit(vendas, log, SQL, ["vendas"], 40)
+
+    assert drop_unused_indexes(vendas, log) == []
+    assert vendas.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_auto_vendas_cidade'").fetchone()
+
+
+def test_speedup_is_measured_on_a_warm_query(monkeypatch, vendas):
+    # Só a primeira execução é lenta (cache de páginas frio): sem aquecimento, o índice
+    # pareceria acelerar a consulta e seria mantido
+    calls = []
+
+    def fake_fetch(conn, sql, max_rows):
+        calls.append(sql)
+        time.sleep(0.05 if len(calls) == 1 else 0.002)
+        return pd.DataFrame(), False
+
+    monkeypatch.setattr(index_advisor, 'fetch_bounded', fake_fetch)
+    result = create_index(vendas, {'table': "vendas", 'columns': ["cidade"], 'sample_sql': SQL})
+
+    assert len(calls) == 2 * (1 + index_advisor.MEASURE_RUNS)
+    assert result['before_ms'] < 25
+    assert not result['kept']
+    assert vendas.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (result['index'],)).fetchone() is None
@@ -0,0 +1,48 @@
+import zipfile
+
+from ingest_cache import get_previous_load
+from tests.conftest import table_rows
+
+HEADER = ["id", "nome"]
+
+
+def test_identical_multi_file_upload_is_not_loaded_again(write_csv, ingest, db):
+    paths = [write_csv("a.csv", HEADER, [[1, "a"], [2, "b"]]), write_csv("b.csv", HEADER, [[3, "c"]])]
+    ingest(paths, "letras")
+    result, messages = ingest(paths, "letras")
+
+    assert [table['rows'] for table in result['tables']] == [0]
+    assert any("Conteúdo idêntico" in message for _, message in messages)
+    assert table_rows(db, "letras") == [(1, "a"), (2, "b"), (3, "c")]
+    assert get_previous_load(db.cursor(), "letras")['row_count'] == 3
+
+
+def test_identical_zip_upload_is_not_loaded_again(tmp_path, write_csv, ingest, db):
+    zip_path = tmp_path / "letras.zip"
+    with zipfile.ZipFile(zip_path, "w") as z:
+        z.write(write_csv("a.csv", HEADER, [[1, "a"]]), "a.csv")
+        z.write(write_csv("b.csv", ["codigo"], [["x"], ["y"]]), "b.csv")
+    ingest([zip_path], "zip")
+    result, _ = ingest([zip_path], "zip")
+
+    assert sorted((table['table'], table['rows']) for table in result['tables']) == [("zip", 0), ("zip_b", 0)]
+    assert table_rows(db, "zip") == [(1, "a")]
+    assert table_rows(db, "zip_b") == [("x",), ("y",)]
+
+
+def test_changed_multi_file_upload_is_loaded(write_csv, ingest, db):
+    ingest([write_csv("a.csv", HEADER, [[1, "a"]]), write_csv("b.csv", HEADER, [[2, "b"]])], "letras")
+    result, _ = ingest([write_csv("a.csv", HEADER, [[1, "a"]]), write_csv("b.csv", HEADER, [[3, "c"]])], "letras")
+
+    assert [table['rows'] for table in result['tables']] == [2]
+    assert get_previous_load(db.cursor(), "letras")['row_count'] == 2
+
+
+def test_single_csv_table_recognises_the_same_csv_inside_a_multi_file_load(write_csv, ingest, db):
+    # Um grupo de um CSV só tem o mesmo hash da carga do arquivo sozinho
+    path = write_csv("a.csv", HEADER, [[1, "a"]])
+    ingest([path], "letras")
+    result, _ = ingest([path, write_csv("outro.csv", ["codigo"], [["x"]])], "letras")
+
+    assert sorted((table['table'], table['rows']) for table in result['tables']) == [("letras", 0), ("letras_outro", 1)]
+    assert table_rows(db, "letras") == [(1, "a")]
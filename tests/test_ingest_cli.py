@@ -0,0 +1,51 @@
+import json
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from ingest_cli import default_table_name, main
+
+
+def test_loads_a_file_and_prints_the_result_as_json(tmp_path, write_csv, capsys):
+    path = write_csv("Vendas 2024.csv", ["id", "nome"], [[1, "a"], [2, "b"]])
+    db_file = tmp_path / "cli.sqlite"
+
+    assert main([str(path), "--db", str(db_file), "--no-metrics", "--quiet", "--json", "--index", "nome"]) == 0
+    result = json.loads(capsys.readouterr().out)
+    assert result['rows'] == 2
+    with sqlite3.connect(db_file) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM vendas_2024").fetchone() == (2,)
+        indexes = conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'vendas_2024'")
+        assert indexes.fetchall() == [("idx_vendas_2024_nome",)]
+
+
+def test_separate_tables_summary(tmp_path, write_csv, capsys):
+    paths = [str(write_csv("a.csv", ["id"], [[1]])), str(write_csv("b.csv", ["id"], [[2], [3]]))]
+    code = main([*paths, "--db", str(tmp_path / "cli.sqlite"), "--table", "t", "--separate-tables",
+                 "--workers", "2", "--no-metrics", "--quiet"])
+
+    assert code == 0
+    assert sorted(capsys.readouterr().out.splitlines()) == ["t_a: 1 linhas", "t_b: 2 linhas"]
+
+
+def test_failed_member_sets_the_exit_code(tmp_path, write_csv, capsys):
+    empty = tmp_path / "vazio.csv"
+    empty.write_text("")
+    code = main([str(write_csv("a.csv", ["id"], [[1]])), str(empty), "--db", str(tmp_path / "cli.sqlite"),
+                 "--no-metrics", "--quiet"])
+
+    assert code == 1
+    assert "vazio.csv: ERRO o CSV não contém colunas válidas" in capsys.readouterr().out
+
+
+def test_missing_files_are_a_usage_error(tmp_path, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        main([str(tmp_path / "nao_existe.csv")])
+    assert exit_info.value.code == 2
+    assert "arquivos não encontrados" in capsys.readouterr().err
+
+
+def test_default_table_name():
+    assert default_table_name(Path("dados/Vendas-Jan.csv.gz")) == "vendas_jan"
+    assert default_table_name(Path(".csv")) == "dados_csv"
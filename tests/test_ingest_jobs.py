@@ -0,0 +1,81 @@
+import sqlite3
+import threading
+
+import pytest
+
+from ingest_jobs import CallbackReporter, JobCancelled, JobManager
+from ingest_pipeline import ingest_files
+from tests.conftest import table_rows
+
+
+def wait(manager, job_id):
+    manager._futures[job_id].result(timeout=10)
+    return manager.get(job_id)
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = JobManager(str(tmp_path / "jobs.sqlite"))
+    yield manager
+    manager._executor.shutdown(wait=True)
+
+
+def test_cancelled_load_rolls_back_the_transaction(write_csv, ingest, db):
+    ingest([write_csv("inicial.csv", ["id", "nome"], [[1, "a"]])], "t")
+    path = write_csv("grande.csv", ["id", "nome"], [[i, "x" * 20] for i in range(30000)])
+
+    cancel_event = threading.Event()
+    report = CallbackReporter(on_progress=lambda rows, bytes_done, fraction: cancel_event.set(),
+                              cancel_event=cancel_event)
+    with pytest.raises(JobCancelled):
+        ingest_files(db, [path], "t", report=report, metrics_file=None)
+
+    assert table_rows(db, "t") == [(1, "a")]
+
+
+def test_job_cancelled_while_running(manager, tmp_path):
+    started, release = threading.Event(), threading.Event()
+
+    def run(reporter):
+        reporter.progress(rows=10)
+        started.set()
+        release.wait(5)
+        reporter.progress(rows=20)
+        return {'rows': 20}
+
+    job_id = manager.submit("sessao", "a.csv", "t", 100, run)
+    assert started.wait(5)
+    assert manager.cancel(job_id)
+    release.set()
+    job = wait(manager, job_id)
+
+    assert (job['status'], job['rows_processed'], job['result']) == ("cancelled", 10, None)
+    assert job['messages'][-1][0] == "warning"
+    assert not manager.cancel(job_id)
+    with sqlite3.connect(tmp_path / "jobs.sqlite") as conn:
+        assert conn.execute("SELECT status FROM ingest_jobs WHERE id = ?", (job_id,)).fetchone() == ("cancelled",)
+
+
+def test_queued_job_is_cancelled_before_it_starts(manager):
+    release = threading.Event()
+    first = manager.submit("sessao", "a.csv", "t", None, lambda reporter: release.wait(5))
+    queued = manager.submit("sessao", "b.csv", "t", None, lambda reporter: {'rows': 1})
+
+    assert manager.cancel(queued)
+    assert manager.get(queued)['status'] == "cancelled"
+    release.set()
+    assert wait(manager, first)['status'] == "done"
+
+
+def test_reported_error_fails_the_job_and_restart_interrupts_running_jobs(manager, tmp_path):
+    def run(reporter):
+        reporter.error("CSV inválido")
+        return None
+
+    assert wait(manager, manager.submit("sessao", "a.csv", "t", None, run))['status'] == "failed"
+
+    with sqlite3.connect(tmp_path / "jobs.sqlite") as conn:
+        conn.execute("INSERT INTO ingest_jobs (id, status) VALUES ('antigo', 'running')")
+    JobManager(str(tmp_path / "jobs.sqlite"))._executor.shutdown()
+    with sqlite3.connect(tmp_path / "jobs.sqlite") as conn:
+        assert conn.execute("SELECT status FROM ingest_jobs WHERE id = 'antigo'").fetchone() == ("interrupted",)
@@ -0,0 +1,39 @@
+import json
+
+from ingest_jobs import CallbackReporter
+from ingest_metrics import STAGES, IngestMetrics
+from ingest_pipeline import ingest_files
+
+
+def test_load_appends_a_metrics_record(tmp_path, write_csv, db):
+    path = write_csv("vendas.csv", ["id", "nome"], [[1, "a"], [2, "b", "extra"], [3, "c"]])
+    metrics_file = tmp_path / "ingest_metrics.jsonl"
+    records, messages = [], []
+    report = CallbackReporter(on_message=lambda level, message: messages.append((level, message)),
+                              on_metrics=records.append)
+    ingest_files(db, [path], "vendas", report=report, metrics_file=str(metrics_file))
+    ingest_files(db, [write_csv("outra.csv", ["id"], [[1]])], "outra", report=report, metrics_file=str(metrics_file))
+
+    lines = [json.loads(line) for line in metrics_file.read_text(encoding="utf-8").splitlines()]
+    assert [record['table'] for record in lines] == ["vendas", "outra"]
+    record = lines[0]
+    assert (record['source'], record['rows_inserted'], record['bytes_read']) == ("vendas.csv", 2, path.stat().st_size)
+    assert record['rejected_rows'] == {'wrong_column_count': 1}
+    assert list(record['stage_seconds']) == list(STAGES)
+    assert records[0]['rows_inserted'] == 2
+    assert ("warning", "1 linha(s) descartada(s): 1 com número de colunas diferente do cabeçalho.") in messages
+
+
+def test_worker_metrics_are_summed():
+    writer, worker = IngestMetrics(), IngestMetrics()
+    writer.stage_seconds['insert'] = 1.0
+    worker.stage_seconds['parse'] = 0.5
+    worker.rejected['wrong_column_count'] += 2
+    with worker.stage('convert'):
+        pass
+
+    writer.merge(worker.to_stats())
+    writer.merge(None)
+    assert writer.stage_seconds['parse'] == 0.5 and writer.stage_seconds['insert'] == 1.0
+    assert writer.stage_seconds['convert'] > 0
+    assert writer.rejected == {'wrong_column_count': 2}
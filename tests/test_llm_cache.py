@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+
+import pytest
+
+import llm_cache
+from llm_cache import LLMResponseCache, make_llm_cache_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Relógio do cache controlado pelo teste: clock.now em segundos."""
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(llm_cache, 'time', SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+def test_entries_expire_after_the_ttl(tmp_path, clock):
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite"), ttl_seconds=60, max_bytes=1000)
+    cache.put("k", "modelo", "SELECT 1")
+
+    clock.now += 59
+    assert cache.get("k") == "SELECT 1"
+    clock.now += 2
+    assert cache.get("k") is None
+    assert cache.stats()['entries'] == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_entries_are_evicted_past_max_bytes(tmp_path, clock):
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite"), ttl_seconds=3600, max_bytes=10)
+    cache.put("a", "modelo", "aaaa")
+    clock.now += 1
+    cache.put("b", "modelo", "bbbb")
+    clock.now += 1
+    assert cache.get("a") == "aaaa"  # "b" passa a ser a usada há mais tempo
+    clock.now += 1
+    cache.put("c", "modelo", "cccc")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "aaaa"
+    assert cache.get("c") == "cccc"
+    assert cache.stats()['bytes_used'] == 8
+
+
+def test_response_larger_than_the_cache_is_not_stored(tmp_path, clock):
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite"), ttl_seconds=3600, max_bytes=10)
+    cache.put("a", "modelo", "aaaa")
+    cache.put("grande", "modelo", "x" * 11)
+
+    assert cache.get("grande") is None
+    assert cache.get("a") == "aaaa"
+
+
+def test_key_changes_with_model_template_and_fields():
+    key = make_llm_cache_key("modelo", "Pergunta: {pergunta}", pergunta="total?")
+    assert key == make_llm_cache_key("modelo", "Pergunta: {pergunta}", pergunta="total?")
+    assert key != make_llm_cache_key("outro", "Pergunta: {pergunta}", pergunta="total?")
+    assert key != make_llm_cache_key("modelo", "Questão: {pergunta}", pergunta="total?")
+    assert key != make_llm_cache_key("modelo", "Pergunta: {pergunta}", pergunta="média?")
@@ -0,0 +1,24 @@
+import ingest_pipeline
+from tests.conftest import declared_types, table_rows
+
+
+def test_parallel_ranges_match_the_serial_load(monkeypatch, write_csv, ingest, db):
+    # Campos entre aspas com quebras de linha e vírgulas atravessam os limites dos trechos
+    rows = [
+        [i, i / 4, f"linha {i}\n{i},\"falso\",registro\n" * (i % 5) + "fim", f"cidade {i % 7}"]
+        for i in range(2000)
+    ]
+    path = write_csv("multilinha.csv", ["id", "valor", "texto", "cidade"], rows)
+    monkeypatch.setattr(ingest_pipeline, 'PARALLEL_RANGE_BYTES', 4096)
+
+    ingest([path], "serial")
+    _, messages = ingest([path], "paralela", parallel=True, preserve_order=True)
+
+    captions = [message for _, message in messages if message.startswith("Leitura paralela")]
+    assert captions and not captions[0].startswith("Leitura paralela: 1 trechos")
+    assert not any("Carga paralela desfeita" in message for _, message in messages)
+    assert declared_types(db, "paralela") == declared_types(db, "serial") == [
+        ('id', 'INTEGER'), ('valor', 'REAL'), ('texto', 'TEXT'), ('cidade', 'TEXT'),
+    ]
+    assert table_rows(db, "paralela") == table_rows(db, "serial")
+    assert table_rows(db, "serial")[3] == (3, 0.75, "linha 3\n3,\"falso\",registro\n" * 3 + "fim", "cidade 3")
@@ -0,0 +1,37 @@
+import ingest_pipeline
+from tests.conftest import declared_types, table_rows
+
+HEADER = ["ativo", "data"]
+ROWS = [["sim" if i % 2 else "não", f"{i % 28 + 1:02d}/01/2024"] for i in range(3000)]
+LATE_ROW = ["talvez", "algum dia"]
+
+
+def test_boolean_and_date_promoted_to_text_keep_the_original_text(monkeypatch, write_csv, ingest, db):
+    # Linhas já gravadas como 1/0 e datas ISO não podem ficar misturadas ao texto das seguintes
+    path = write_csv("tarde.csv", HEADER, ROWS + [LATE_ROW])
+    monkeypatch.setattr(ingest_pipeline, 'INFERENCE_SAMPLE_SIZE', 10)
+    result, _ = ingest([path], "tarde")
+
+    assert result['rows'] == 3001
+    assert declared_types(db, "tarde") == [('ativo', 'TEXT'), ('data', 'TEXT')]
+    assert table_rows(db, "tarde") == [tuple(row) for row in ROWS + [LATE_ROW]]
+
+
+def test_merging_csvs_with_boolean_and_text_keeps_the_original_text(monkeypatch, write_csv, ingest, db):
+    # Um CSV promove no meio da leitura; o outro só vira TEXT na união dos tipos
+    late = write_csv("a.csv", HEADER, ROWS + [LATE_ROW])
+    clean = write_csv("b.csv", HEADER, ROWS[:100])
+    monkeypatch.setattr(ingest_pipeline, 'INFERENCE_SAMPLE_SIZE', 10)
+    result, _ = ingest([late, clean], "unida", workers=2)
+
+    assert [table['rows'] for table in result['tables']] == [3101]
+    assert declared_types(db, "unida") == [('ativo', 'TEXT'), ('data', 'TEXT')]
+    assert table_rows(db, "unida") == [tuple(row) for row in ROWS + [LATE_ROW] + ROWS[:100]]
+
+
+def test_single_letter_codes_are_not_booleans(write_csv, ingest, db):
+    path = write_csv("codigos.csv", ["codigo"], [["s"], ["n"], ["t"], ["f"], ["y"]])
+    ingest([path], "codigos")
+
+    assert declared_types(db, "codigos") == [('codigo', 'TEXT')]
+    assert table_rows(db, "codigos") == [("s",), ("n",), ("t",), ("f",), ("y",)]
@@ -0,0 +1,52 @@
+import pandas as pd
+
+from ingest_cache import get_table_versions
+from query_cache import QueryResultCache, is_cacheable, normalize_sql, referenced_tables
+
+SQL = "SELECT nome FROM clientes WHERE cidade = 'Recife'"
+
+
+def cache_key(db, sql, tables):
+    return QueryResultCache.make_key(sql, get_table_versions(db.cursor(), referenced_tables(sql, tables)))
+
+
+def test_load_into_a_table_invalidates_its_cached_results(write_csv, ingest, db):
+    ingest([write_csv("clientes.csv", ["nome", "cidade"], [["Ana", "Recife"]])], "clientes")
+    ingest([write_csv("vendas.csv", ["id"], [[1]])], "vendas")
+    cache = QueryResultCache(max_bytes=1 << 20)
+    key = cache_key(db, SQL, ["clientes", "vendas"])
+    cache.put(key, pd.DataFrame({'nome': ["Ana"]}))
+
+    # Carga em outra tabela: a chave da consulta não muda
+    ingest([write_csv("vendas.csv", ["id"], [[1], [2]])], "vendas")
+    same_sql = "select nome\nfrom clientes where cidade = 'Recife';"
+    assert cache.get(cache_key(db, same_sql, ["clientes", "vendas"])) is not None
+
+    ingest([write_csv("clientes.csv", ["nome", "cidade"], [["Ana", "Recife"], ["Bia", "Recife"]])], "clientes")
+    new_key = cache_key(db, SQL, ["clientes", "vendas"])
+    assert new_key != key
+    assert cache.get(new_key) is None
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_normalization_keeps_literals_and_quoted_identifiers():
+    assert normalize_sql("SELECT  \"Nome\"\n FROM T -- comentário\nWHERE x = 'Ana  B';") == \
+        "select \"Nome\" from t where x = 'Ana  B'"
+    assert is_cacheable("  with t as (select 1) select * from t") and not is_cacheable("DELETE FROM t")
+    assert referenced_tables("SELECT * FROM vendas_2024 JOIN Vendas", ["vendas", "vendas_2024", "clientes"]) == \
+        ["vendas", "vendas_2024"]
+
+
+def test_least_recently_used_results_are_evicted_past_the_budget():
+    df = pd.DataFrame({'n': range(100)})
+    size = int(df.memory_usage(index=True, deep=True).sum())
+    cache = QueryResultCache(max_bytes=2 * size)
+    for name in ("a", "b"):
+        cache.put((name, ()), df)
+    cache.get(("a", ()))
+    cache.put(("c", ()), df)
+
+    assert cache.get(("b", ())) is None
+    assert cache.get(("a", ())) is not None and cache.get(("c", ())) is not None
+    cache.put(("grande", ()), pd.DataFrame({'n': range(1000)}))
+    assert cache.get(("grande", ())) is None and cache.stats()['evictions'] == 1
@@ -0,0 +1,61 @@
+import sqlite3
+import threading
+
+import pytest
+
+from query_guard import QueryAborted, check_cost, estimate_cost, guarded
+
+CROSS_JOIN = "SELECT COUNT(*) FROM vendas a, vendas b, vendas c"
+
+
+@pytest.fixture
+def vendas():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE vendas (id INTEGER PRIMARY KEY, cidade TEXT, valor REAL)")
+    conn.executemany("INSERT INTO vendas VALUES (?, ?, ?)", [(i, f"cidade {i % 10}", i) for i in range(1, 2001)])
+    conn.execute("CREATE INDEX idx_vendas_cidade ON vendas (cidade)")
+    yield conn
+    conn.close()
+
+
+def test_accidental_cross_join_is_rejected_before_running(vendas):
+    with pytest.raises(QueryAborted) as aborted:
+        check_cost(vendas, CROSS_JOIN, max_estimated_rows=1_000_000)
+
+    assert aborted.value.reason == "custo"
+    assert "8,000,000,000 linhas examinadas" in str(aborted.value)
+    assert check_cost(vendas, CROSS_JOIN, max_estimated_rows=0)['estimated_rows'] == 2000 ** 3
+
+
+def test_index_searches_cost_less_than_a_scan(vendas):
+    assert estimate_cost(vendas, "SELECT * FROM vendas WHERE valor > 10")['estimated_rows'] == 2000
+    assert estimate_cost(vendas, "SELECT * FROM vendas WHERE id = 5")['estimated_rows'] == 1
+    assert estimate_cost(vendas, "SELECT * FROM vendas WHERE cidade = 'x'")['estimated_rows'] == 20
+
+    vendas.execute("ANALYZE")
+    cost = check_cost(vendas, "SELECT * FROM vendas v WHERE v.cidade = 'x'", max_estimated_rows=1000)
+    assert cost['estimated_rows'] == 200 and cost['full_scans'] == []
+
+
+def test_time_budget_interrupts_the_query(vendas):
+    with pytest.raises(QueryAborted) as aborted:
+        with guarded(vendas, time_budget_seconds=0.05):
+            vendas.execute(CROSS_JOIN).fetchone()
+    assert aborted.value.reason == "tempo"
+    # O progress handler é removido ao sair
+    assert vendas.execute("SELECT COUNT(*) FROM vendas").fetchone() == (2000,)
+
+
+def test_cancelled_query_is_interrupted(vendas):
+    cancel_event = threading.Event()
+    threading.Timer(0.05, cancel_event.set).start()
+    with pytest.raises(QueryAborted) as aborted:
+        with guarded(vendas, time_budget_seconds=None, cancel_event=cancel_event):
+            vendas.execute(CROSS_JOIN).fetchone()
+    assert aborted.value.reason == "cancelada"
+
+
+def test_other_errors_are_not_reported_as_aborts(vendas):
+    with pytest.raises(sqlite3.OperationalError, match="no such table"):
+        with guarded(vendas):
+            vendas.execute("SELECT * FROM clientes")
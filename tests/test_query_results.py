@@ -0,0 +1,46 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from query_results import SUMMARY_FULL_ROWS, fetch_bounded, summarize_result
+
+
+@pytest.fixture
+def numbers():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (n INTEGER, nome TEXT)")
+    conn.executemany("INSERT INTO t VALUES (?, ?)", [(i, f"item {i % 3}") for i in range(25)])
+    yield conn
+    conn.close()
+
+
+def test_fetch_bounded_stops_at_max_rows_and_flags_truncation(numbers):
+    df, truncated = fetch_bounded(numbers, "SELECT n, nome FROM t ORDER BY n", max_rows=10, chunk_rows=4)
+
+    assert truncated
+    assert df.columns.tolist() == ["n", "nome"]
+    assert df['n'].tolist() == list(range(10))
+
+
+def test_fetch_bounded_is_not_truncated_when_the_result_fits(numbers):
+    df, truncated = fetch_bounded(numbers, "SELECT n FROM t", max_rows=25, chunk_rows=4)
+    assert not truncated and len(df) == 25
+
+    df, truncated = fetch_bounded(numbers, "SELECT n FROM t WHERE n < 3", max_rows=10)
+    assert not truncated and df['n'].tolist() == [0, 1, 2]
+
+
+def test_fetch_bounded_handles_statements_without_result(numbers):
+    df, truncated = fetch_bounded(numbers, "PRAGMA user_version = 3", max_rows=10)
+    assert df.empty and not truncated
+
+
+def test_large_results_are_summarized_instead_of_sent_whole():
+    df = pd.DataFrame({'n': range(1000), 'nome': [f"item {i % 3}" for i in range(1000)]})
+    summary = summarize_result(df, truncated=True)
+
+    assert "limitado às primeiras 1000 linhas" in summary
+    assert "n (numérica): mín 0, máx 999, média 499.5, nulos 0" in summary
+    assert "nome (texto): 3 distinto(s)" in summary
+    assert "500 item 2" not in summary and len(summary.splitlines()) < SUMMARY_FULL_ROWS
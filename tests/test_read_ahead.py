@@ -0,0 +1,67 @@
+import gzip
+import io
+import tarfile
+
+import pytest
+
+from ingest_core import FileSource
+from ingest_input import ReadAheadReader, open_csv_stream
+from tests.conftest import table_rows
+
+CONTENT = b"".join(b"%d,linha %d\n" % (i, i) for i in range(1000))
+
+
+class FailingStream(io.RawIOBase):
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        raise OSError("arquivo corrompido")
+
+
+def test_reads_the_whole_stream_across_buffers_and_stays_at_eof():
+    closed = []
+    reader = ReadAheadReader(io.BytesIO(CONTENT), on_close=lambda: closed.append(True), chunk_bytes=1000, depth=2)
+    with io.BufferedReader(reader, 300) as stream:
+        assert stream.read() == CONTENT
+        assert stream.read() == b"" and reader.readinto(bytearray(10)) == 0
+        assert reader.bytes_read == len(CONTENT)
+    assert closed == [True]
+
+
+def test_close_before_the_end_stops_the_thread():
+    closed = []
+    reader = ReadAheadReader(io.BytesIO(CONTENT), on_close=lambda: closed.append(True), chunk_bytes=100, depth=2)
+    assert reader.read(10) == CONTENT[:10]
+    reader.close()
+    reader.close()
+
+    assert not reader._thread.is_alive()
+    assert closed == [True]
+
+
+def test_read_errors_reach_the_consumer():
+    reader = ReadAheadReader(FailingStream(), chunk_bytes=100)
+    with pytest.raises(OSError, match="arquivo corrompido"):
+        reader.read(10)
+    assert reader.read(10) == b""
+    reader.close()
+
+
+def test_compressed_inputs_are_read_through_the_read_ahead(tmp_path, ingest, db):
+    gz_path = tmp_path / "vendas.csv.gz"
+    with gzip.open(gz_path, "wb") as f:
+        f.write(b"id,nome\n" + CONTENT)
+    tar_path = tmp_path / "vendas.tar.gz"
+    with tarfile.open(tar_path, "w:gz") as tar:
+        info = tarfile.TarInfo("dados/vendas.csv")
+        info.size = len(CONTENT)
+        tar.addfile(info, io.BytesIO(CONTENT))
+
+    with open_csv_stream(FileSource(tar_path)) as stream:
+        assert isinstance(stream.raw, ReadAheadReader)
+        assert stream.read() == CONTENT
+
+    result, _ = ingest([gz_path], "vendas")
+    assert result['rows'] == 1000
+    assert table_rows(db, "vendas")[-1] == (999, "linha 999")
@@ -0,0 +1,59 @@
+import sqlite3
+
+import pytest
+
+from ingest_cache import bump_table_version
+from schema_cache import SchemaCache, list_user_tables
+from tests.conftest import table_rows
+
+
+def test_only_internal_tables_are_hidden(write_csv, ingest, db):
+    path = write_csv("vendas.csv", ["id", "descricao"], [[1, "entrega no prazo"], [2, "produto com defeito"]])
+    ingest([path], "vendas", fts_columns=["descricao"])
+    ingest([path], "_vendas")
+    db.execute("CREATE TABLE _advisor_indexes (index_name TEXT)")
+    db.execute("CREATE TABLE t (id INTEGER PRIMARY KEY AUTOINCREMENT)")
+    db.execute("ANALYZE")
+
+    names = {name for (name,) in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert {"_column_stats", "_ingest_cache", "_table_versions", "_fts_indexes", "_fts_vendas",
+            "_fts_vendas_data", "sqlite_sequence", "sqlite_stat1"} <= names
+    assert sorted(list_user_tables(db)) == ["_vendas", "t", "vendas"]
+    assert table_rows(db, "_vendas") == [(1, "entrega no prazo"), (2, "produto com defeito")]
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / "db.sqlite")
+    conn.execute("CREATE TABLE vendas (id INTEGER, cidade TEXT)")
+    conn.execute("INSERT INTO vendas VALUES (1, 'Recife')")
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def test_tables_are_read_again_only_after_ddl(conn):
+    cache = SchemaCache()
+    assert cache.tables(conn) == ["vendas"]
+    assert cache.tables(conn) == ["vendas"]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    conn.execute("CREATE TABLE clientes (id INTEGER)")
+    assert sorted(cache.tables(conn)) == ["clientes", "vendas"]
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_table_metadata_follows_the_data_version(conn):
+    cache = SchemaCache()
+    first = cache.table_metadata(conn, "vendas")
+    assert first['columns'] == [("id", "INTEGER"), ("cidade", "TEXT")]
+    assert cache.table_metadata(conn, "vendas") is first
+
+    # Uma carga incrementa a versão de dados na mesma transação das linhas
+    conn.execute("INSERT INTO vendas VALUES (2, 'Natal')")
+    bump_table_version(conn.cursor(), "vendas")
+    conn.commit()
+    second = cache.table_metadata(conn, "vendas")
+    assert second is not first
+    assert second['sample']['cidade'].tolist() == ["Recife", "Natal"]
+
@@ -0,0 +1,37 @@
+import ingest_pipeline
+from tests.conftest import declared_types, table_rows
+
+
+def test_late_value_promotes_like_a_full_scan(monkeypatch, write_csv, ingest, db):
+    # Um valor depois da amostra contradiz o tipo inferido: o resultado deve ser o de
+    # uma inferência sobre o arquivo inteiro (a antiga análise em duas passadas)
+    rows = [[i, i * 2, f"item {i}"] for i in range(3000)] + [["x9", "2.5", "fim"]]
+    path = write_csv("late.csv", ["id", "valor", "nome"], rows)
+
+    monkeypatch.setattr(ingest_pipeline, 'INFERENCE_SAMPLE_SIZE', 10)
+    result, _ = ingest([path], "amostra")
+    monkeypatch.setattr(ingest_pipeline, 'INFERENCE_SAMPLE_SIZE', 10**6)
+    ingest([path], "inteiro")
+
+    assert result['rows'] == 3001
+    assert declared_types(db, "amostra") == declared_types(db, "inteiro") == [
+        ('id', 'TEXT'), ('valor', 'REAL'), ('nome', 'TEXT'),
+    ]
+    assert table_rows(db, "amostra") == table_rows(db, "inteiro")
+    assert table_rows(db, "amostra")[5] == ('5', 10.0, 'item 5')
+
+
+def test_numbers_promoted_to_text_keep_the_original_text(monkeypatch, write_csv, ingest, db):
+    # '007' e '3.0' já gravados como 7 e 3.0 não podem virar '7' e '3' na coluna TEXT
+    rows = [["007", "3.0"], ["3.0", "1"]] + [[i, i] for i in range(3000)] + [["x9", "fim"]]
+    path = write_csv("zeros.csv", ["codigo", "valor"], rows)
+
+    monkeypatch.setattr(ingest_pipeline, 'INFERENCE_SAMPLE_SIZE', 10)
+    _, messages = ingest([path], "amostra")
+    monkeypatch.setattr(ingest_pipeline, 'INFERENCE_SAMPLE_SIZE', 10**6)
+    ingest([path], "inteiro")
+
+    assert any("relendo o arquivo" in message for _, message in messages)
+    assert declared_types(db, "amostra") == declared_types(db, "inteiro") == [('codigo', 'TEXT'), ('valor', 'TEXT')]
+    assert table_rows(db, "amostra") == table_rows(db, "inteiro")
+    assert table_rows(db, "amostra")[:2] == [("007", "3.0"), ("3.0", "1")]
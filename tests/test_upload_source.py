@@ -0,0 +1,40 @@
+import io
+
+from ingest_core import UploadSource
+from ingest_pipeline import ingest_source
+from tests.conftest import table_rows
+
+CONTENT = b"id,nome\n1,Ana\n2,Bia\n"
+
+
+def test_upload_is_read_from_the_buffer_without_touching_the_disk(tmp_path):
+    source = UploadSource("vendas.csv", bytearray(CONTENT), tmp_path)
+    with source.open() as stream:
+        assert stream.read(8) == b"id,nome\n"
+        stream.seek(0, io.SEEK_SET)
+        assert stream.read() == CONTENT
+    assert (source.size, source.suffix, source.path) == (len(CONTENT), ".csv", None)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_spill_writes_the_content_once_and_close_removes_it(tmp_path):
+    source = UploadSource("vendas.csv", CONTENT, tmp_path)
+    path = source.spill()
+    assert source.spill() == path and path.read_bytes() == CONTENT
+    with source.open() as stream:
+        assert stream.read() == CONTENT
+
+    assert source.close() == path
+    assert not path.exists() and source.close() is None
+
+
+def test_upload_is_loaded_from_the_buffer(tmp_path, db):
+    spill_dir = tmp_path / "dados_temp"
+    spill_dir.mkdir()
+    source = UploadSource("vendas.csv", CONTENT, spill_dir)
+    result = ingest_source(db, source, "vendas", metrics_file=None)
+    source.close()
+
+    assert result['rows'] == 2
+    assert table_rows(db, "vendas") == [(1, "Ana"), (2, "Bia")]
+    assert list(spill_dir.iterdir()) == []
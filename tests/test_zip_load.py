@@ -0,0 +1,40 @@
+import zipfile
+
+from ingest_pipeline import zip_member_table_names
+from tests.conftest import declared_types, table_rows
+
+
+def write_zip(tmp_path, members):
+    path = tmp_path / "carga.zip"
+    with zipfile.ZipFile(path, "w") as z:
+        for name, text in members.items():
+            z.writestr(name, text)
+    return path
+
+
+def test_csvs_with_the_same_header_are_merged(tmp_path, ingest, db):
+    path = write_zip(tmp_path, {
+        "jan.csv": "id,valor\n1,10\n2,20\n",
+        "fev.csv": "id,valor\n3,2.5\n",
+        "clientes.csv": "codigo,nome\nA,Ana\n",
+    })
+    result, _ = ingest([path], "vendas")
+
+    assert sorted((table['table'], table['rows']) for table in result['tables']) == [("vendas", 3), ("vendas_clientes", 1)]
+    # Tipos unidos entre os CSVs do grupo: INTEGER + REAL = REAL
+    assert declared_types(db, "vendas") == [("id", "INTEGER"), ("valor", "REAL")]
+    assert sorted(table_rows(db, "vendas")) == [(1, 10.0), (2, 20.0), (3, 2.5)]
+    assert table_rows(db, "vendas_clientes") == [("A", "Ana")]
+
+
+def test_each_csv_gets_its_own_table_without_merging(tmp_path, ingest, db):
+    path = write_zip(tmp_path, {"jan.csv": "id\n1\n", "dados/jan.csv": "id\n2\n"})
+    result, _ = ingest([path], "vendas", merge_matching_headers=False)
+
+    assert sorted(table['table'] for table in result['tables']) == ["vendas_jan", "vendas_jan_2"]
+    assert sorted(table_rows(db, "vendas_jan") + table_rows(db, "vendas_jan_2")) == [(1,), (2,)]
+
+
+def test_member_table_names_are_sanitized_and_unique():
+    names = zip_member_table_names("t", ["Vendas 2024.csv", "a/Vendas-2024.csv", "b.csv"])
+    assert names == {"Vendas 2024.csv": "t_vendas_2024", "a/Vendas-2024.csv": "t_vendas_2024_2", "b.csv": "t_b"}
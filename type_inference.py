@@ -0,0 +1,314 @@
+"""
+Motor de inferência de tipos por amostragem para colunas de CSV.
+
+Analisa uma amostra das linhas (as primeiras N ou uma amostra reservatório do
+arquivo inteiro), conta quantos valores de cada coluna são nulos, inteiros,
+reais, booleanos, datas ou texto e decide o tipo SQLite de cada coluna:
+INTEGER, REAL, BOOLEAN, DATE/DATETIME (com o formato de origem detectado) ou TEXT.
+Uma coluna comprovadamente TEXT deixa de ser analisada.
+"""
+import itertools
+import math
+import random
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# ----------------------------------------------------------------------
+# CONSTANTES
+# ----------------------------------------------------------------------
+
+# Tokens (após strip, sem diferenciar maiúsculas) gravados como NULL
+NULL_TOKENS = ('NAN', 'NULL', '#N/A', 'N/A', 'NONE')
+
+# Tokens booleanos (sem diferenciar maiúsculas). Letras isoladas (t/f, s/n, y/n) ficam de
+# fora: colunas de códigos de uma letra pareceriam booleanas
+TRUE_TOKENS = ('true', 'yes', 'sim', 'verdadeiro')
+FALSE_TOKENS = ('false', 'no', 'não', 'nao', 'falso')
+
+# Formatos de data testados, em ordem de preferência quando mais de um serve
+# (dd/mm antes de mm/dd: é o formato mais comum nos nossos arquivos)
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y', '%d-%m-%Y', '%Y/%m/%d', '%d.%m.%Y')
+DATETIME_FORMATS = (
+    '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S.%f',
+    '%Y-%m-%d %H:%M', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%m/%d/%Y %H:%M:%S', '%m/%d/%Y %H:%M',
+)
+
+SAMPLING_STRATEGIES = ('head', 'reservoir')
+
+STRING_DTYPE = np.dtypes.StringDType()
+
+# Palavras que float() aceita além dos números
+FLOAT_WORDS = ('inf', 'infinity', 'nan')
+
+KINDS = ('integer', 'real', 'boolean', 'date', 'text')
+
+# ----------------------------------------------------------------------
+# PRIMITIVAS VETORIZADAS
+# ----------------------------------------------------------------------
+
+def matches_any(values: np.ndarray, tokens) -> np.ndarray:
+    """Equivalente a np.isin para poucos tokens, comparando um a um (bem mais rápido em StringDType)."""
+    mask = np.zeros(len(values), dtype=bool)
+    for token in tokens:
+        mask |= values == token
+    return mask
+
+
+def matches_tokens(values: np.ndarray, tokens) -> np.ndarray:
+    """
+    Compara sem diferenciar maiúsculas. As grafias comuns (minúscula, MAIÚSCULA, Título)
+    são comparadas direto; só o restante passa pelo lower(), que é lento em StringDType.
+    """
+    spellings = {v for token in tokens for v in (token.lower(), token.upper(), token.title())}
+    mask = matches_any(values, spellings)
+    lengths = {len(token) for token in tokens}
+    unusual = ~mask & np.isin(np.strings.str_len(values), list(lengths))
+    if unusual.any():
+        mask[unusual] = matches_any(np.strings.lower(values[unusual]), [t.lower() for t in tokens])
+    return mask
+
+
+def strip_values(raw_values: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Retorna os valores brutos e sem espaços nas bordas, como arrays StringDType."""
+    raw = np.array(raw_values, dtype=STRING_DTYPE)
+    return raw, np.strings.strip(raw)
+
+
+def null_mask_of(stripped: np.ndarray) -> np.ndarray:
+    """Máscara dos valores vazios ou iguais a um dos NULL_TOKENS."""
+    lengths = np.strings.str_len(stripped)
+    mask = (lengths == 3) | (lengths == 4)
+    mask[mask] = matches_tokens(stripped[mask], NULL_TOKENS)
+    mask |= lengths == 0
+    return mask
+
+
+def parse_float_column(stripped: np.ndarray, candidates: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Converte para float64 os valores candidatos de uma coluna de strings (já sem espaços),
+    com o mesmo resultado de float(). Retorna os valores e a máscara dos que foram aceitos.
+    """
+    numbers = np.full(len(stripped), np.nan)
+    parsed = np.zeros(len(stripped), dtype=bool)
+
+    # Caminho rápido: todos os candidatos são numéricos (caso comum em colunas numéricas)
+    try:
+        numbers[candidates] = stripped[candidates].astype(np.float64)
+        parsed[candidates] = True
+        return numbers, parsed
+    except ValueError:
+        pass
+
+    # Inteiros puros convertem em bloco
+    decimal = candidates & np.strings.isdecimal(stripped)
+    numbers[decimal] = stripped[decimal].astype(np.float64)
+    parsed[decimal] = True
+
+    # Palavras só são numéricas se forem inf/infinity/nan
+    remaining = candidates & ~decimal
+    lengths = np.strings.str_len(stripped)
+    is_alpha = np.strings.isalpha(stripped)
+    alpha = remaining & is_alpha & (lengths >= 3) & (lengths <= 8)
+    alpha[alpha] = matches_tokens(stripped[alpha], FLOAT_WORDS)
+
+    # float() nunca aceita espaço interno, '/', ':' nem sinal fora do início/expoente
+    # (descarta textos e datas sem tentar a conversão)
+    remaining &= ~is_alpha
+    for char in (' ', '/', ':'):
+        remaining[remaining] = np.strings.find(stripped[remaining], char) < 0
+    if remaining.any():
+        unsigned_exponent = stripped[remaining]
+        for exponent in ('e-', 'E-', 'e+', 'E+'):
+            unsigned_exponent = np.strings.replace(unsigned_exponent, exponent, 'e')
+        remaining[remaining] = ((np.strings.find(unsigned_exponent, '-', 1) < 0)
+                                & (np.strings.find(unsigned_exponent, '+', 1) < 0))
+    remaining |= alpha
+
+    # O que sobra tenta float() em bloco e, se o bloco tiver algum texto, valor a valor
+    try:
+        numbers[remaining] = stripped[remaining].astype(np.float64)
+        parsed[remaining] = True
+    except ValueError:
+        for pos in np.flatnonzero(remaining):
+            try:
+                numbers[pos] = float(stripped[pos])
+            except ValueError:
+                continue
+            parsed[pos] = True
+    return numbers, parsed
+
+
+def integral_mask(numbers: np.ndarray, is_numeric: np.ndarray) -> np.ndarray:
+    """Máscara dos números inteiros que cabem em um INTEGER do SQLite (int64)."""
+    mask = is_numeric & np.isfinite(numbers)
+    mask[mask] = (numbers[mask] == np.floor(numbers[mask])) & (np.abs(numbers[mask]) < 2.0 ** 63)
+    return mask
+
+
+def parse_dates(values: np.ndarray, date_format: str) -> pd.Series:
+    """Converte strings para datetime com um formato exato (NaT quando não casa)."""
+    return pd.to_datetime(pd.Series(values.astype(object)), format=date_format, errors='coerce')
+
+
+def date_like_mask(values: np.ndarray) -> np.ndarray:
+    """Pré-filtro barato: só valores com tamanho e separadores de data passam pelo to_datetime."""
+    lengths = np.strings.str_len(values)
+    has_separator = ((np.strings.find(values, '-') >= 0) | (np.strings.find(values, '/') >= 0)
+                     | (np.strings.find(values, '.') >= 0))
+    return (lengths >= 8) & (lengths <= 26) & has_separator
+
+
+def date_storage_format(date_format: str) -> str:
+    """Formato ISO usado para gravar as datas de uma coluna DATE/DATETIME."""
+    if date_format in DATE_FORMATS:
+        return '%Y-%m-%d'
+    return '%Y-%m-%d %H:%M:%S.%f' if '%f' in date_format else '%Y-%m-%d %H:%M:%S'
+
+
+def join_types(current: Dict[str, Optional[str]], other: Dict[str, Optional[str]]) -> Dict[str, Optional[str]]:
+    """Menor tipo que acomoda os valores dos dois tipos (INTEGER + REAL = REAL; demais conflitos = TEXT)."""
+    if current == other:
+        return current
+    if {current['type'], other['type']} == {'INTEGER', 'REAL'}:
+        return {'type': 'REAL', 'format': None}
+    return {'type': 'TEXT', 'format': None}
+
+
+# ----------------------------------------------------------------------
+# MOTOR DE INFERÊNCIA
+# ----------------------------------------------------------------------
+
+class TypeInferenceEngine:
+    """
+    Infere os tipos das colunas a partir de uma amostra de linhas.
+
+    strategy='head' usa as primeiras sample_size linhas passadas a observe();
+    strategy='reservoir' usa sample_stream() para sortear sample_size linhas de todo
+    o arquivo (Algoritmo L: só sorteia nas linhas que entram na amostra).
+    """
+
+    def __init__(self, n_columns: int, sample_size: int = 50000, strategy: str = 'head',
+                 batch_size: int = 5000, seed: Optional[int] = None):
+        if strategy not in SAMPLING_STRATEGIES:
+            raise ValueError(f"Estratégia de amostragem inválida: {strategy}")
+        self.n_columns = n_columns
+        self.sample_size = sample_size
+        self.strategy = strategy
+        self.batch_size = batch_size
+        self.rows_sampled = 0
+        self._random = random.Random(seed)
+        self.columns = [
+            {
+                'counts': dict.fromkeys(('null',) + KINDS, 0),
+                'date_formats': list(DATE_FORMATS + DATETIME_FORMATS),
+                'done': False,
+            }
+            for _ in range(n_columns)
+        ]
+
+    @property
+    def finished(self) -> bool:
+        """Todas as colunas já são TEXT: não há o que analisar no resto da amostra."""
+        return all(state['done'] for state in self.columns)
+
+    def observe(self, rows: List[List[str]]):
+        """Analisa um lote de linhas completas (com n_columns valores cada)."""
+        if not rows:
+            return
+        self.rows_sampled += len(rows)
+        for state, raw_values in zip(self.columns, zip(*rows)):
+            if not state['done']:
+                self._observe_column(state, raw_values)
+
+    def sample_stream(self, rows: Iterable[List[str]]):
+        """Sorteia uma amostra reservatório de todo o stream e a analisa."""
+        rows = (row for row in rows if len(row) == self.n_columns)
+        reservoir = list(itertools.islice(rows, self.sample_size))
+        if len(reservoir) == self.sample_size and self.sample_size > 0:
+            k = self.sample_size
+            weight = math.exp(math.log(self._uniform()) / k)
+            while True:
+                skip = math.floor(math.log(self._uniform()) / math.log(1 - weight))
+                row = next(itertools.islice(rows, skip, None), None)
+                if row is None:
+                    break
+                reservoir[self._random.randrange(k)] = row
+                weight *= math.exp(math.log(self._uniform()) / k)
+
+        for start in range(0, len(reservoir), self.batch_size):
+            self.observe(reservoir[start:start + self.batch_size])
+            if self.finished:
+                break
+
+    def _uniform(self) -> float:
+        """Sorteio uniforme em (0, 1], seguro para log()."""
+        return 1.0 - self._random.random()
+
+    def _observe_column(self, state: Dict, raw_values: Tuple[str, ...]):
+        counts = state['counts']
+        _, stripped = strip_values(raw_values)
+        null_mask = null_mask_of(stripped)
+        counts['null'] += int(null_mask.sum())
+
+        numbers, parsed = parse_float_column(stripped, ~null_mask)
+        is_numeric = parsed & ~np.isnan(numbers)
+        is_integer = integral_mask(numbers, is_numeric)
+        counts['integer'] += int(is_integer.sum())
+        counts['real'] += int((is_numeric & ~is_integer).sum())
+
+        rest = ~null_mask & ~is_numeric
+        if rest.any():
+            is_boolean = matches_tokens(stripped[rest], TRUE_TOKENS + FALSE_TOKENS)
+            counts['boolean'] += int(is_boolean.sum())
+            rest[rest] = ~is_boolean
+
+        other_kinds = counts['integer'] or counts['real'] or counts['boolean'] or counts['text']
+        if rest.any() and not other_kinds and date_like_mask(stripped[rest]).all():
+            # Os formatos são testados primeiro em poucos valores: a maioria cai ali
+            values = stripped[rest]
+            for probe in (values[:64], values):
+                state['date_formats'] = [
+                    date_format for date_format in state['date_formats']
+                    if parse_dates(probe, date_format).notna().all()
+                ]
+            kind = 'date' if state['date_formats'] else 'text'
+            counts[kind] += len(values)
+        elif rest.any():
+            counts['text'] += int(rest.sum())
+
+        # Coluna comprovadamente TEXT: não é mais analisada
+        state['done'] = self.column_type(state)['type'] == 'TEXT'
+
+    @staticmethod
+    def column_type(state: Dict) -> Dict[str, Optional[str]]:
+        """Decide o tipo de uma coluna a partir dos contadores."""
+        counts = state['counts']
+        kinds = {kind for kind in KINDS if counts[kind]}
+        if kinds == {'integer'}:
+            return {'type': 'INTEGER', 'format': None}
+        if kinds == {'real'} or kinds == {'integer', 'real'}:
+            return {'type': 'REAL', 'format': None}
+        if kinds == {'boolean'}:
+            return {'type': 'BOOLEAN', 'format': None}
+        if kinds == {'date'} and state['date_formats']:
+            date_format = state['date_formats'][0]
+            return {'type': 'DATE' if date_format in DATE_FORMATS else 'DATETIME', 'format': date_format}
+        # Conflito de tipos, texto ou coluna só com nulos
+        return {'type': 'TEXT', 'format': None}
+
+    def column_types(self) -> List[Dict[str, Optional[str]]]:
+        """Tipos inferidos: um dict {'type', 'format'} por coluna."""
+        return [self.column_type(state) for state in self.columns]
+
+    def summary(self) -> List[Dict]:
+        """Contadores por coluna, com o tipo decidido e os formatos de data ainda possíveis."""
+        summary = []
+        for state, column_type in zip(self.columns, self.column_types()):
+            summary.append({
+                **column_type,
+                **state['counts'],
+                'ambiguous_formats': state['date_formats'] if column_type['format'] and len(state['date_formats']) > 1 else [],
+            })
+        return summary